@@ -0,0 +1,245 @@
+from ticker_extractor import TickerExtractor, get_ticker_extractor
+from polarity_scorer import get_polarity_scorer
+from word_counter import SpaceSaving, DEFAULT_WORD_CAPACITY, word_tokens, top_counts, frequency_entries
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from itertools import islice
+from typing import Dict, List, Any, Tuple, Optional, Iterable, Iterator
+import atexit
+import multiprocessing
+import os
+import threading
+import numpy as np
+
+MEASURES = ("tickers", "words", "sentiment")
+
+# Documents per shard sent to a worker process
+DEFAULT_SHARD_SIZE = 2000
+# Documents whose sentiment is scored together
+SCORING_BATCH_SIZE = 1000
+
+def content_text(content: Dict[str, Any]) -> str:
+    """The text of a post or comment counted for mentions and words: title and body"""
+    return f"{content.get('title', '')} {content.get('text', '')}"
+
+def content_sentiments(contents: List[Dict[str, Any]]) -> np.ndarray:
+    """TextBlob polarity of the body of every post or comment, scored as one batch"""
+    return get_polarity_scorer().score_texts([content.get('text', '') for content in contents])
+
+def exact_sum(values: np.ndarray) -> Fraction:
+    """
+    The exact sum of float values, as a Fraction
+    Every float is an integer mantissa times a power of two, so mantissas are
+    summed per exponent, in halves small enough for bincount to add exactly.
+    """
+    values = np.asarray(values, dtype=float)
+    if not values.size:
+        return Fraction(0)
+    mantissas, exponents = np.frexp(values)
+    mantissas = (mantissas * 2.0 ** 53).astype(np.int64)
+    exponents, groups = np.unique(exponents.astype(np.int64) - 53, return_inverse=True)
+    high = np.bincount(groups, weights=mantissas >> 26, minlength=len(exponents))
+    low = np.bincount(groups, weights=mantissas & (2 ** 26 - 1), minlength=len(exponents))
+    lowest = int(exponents[0])
+    numerator = sum(
+        ((int(h) << 26) + int(l)) << (int(exponent) - lowest) for exponent, h, l in zip(exponents, high, low)
+    )
+    return numerator * Fraction(2) ** lowest
+
+class MarketAggregate:
+    """
+    Mergeable running state of the market statistics over posts and comments
+
+    Holds ticker mention counts, word counts, and the sentiment sum and count,
+    so content can be added one document at a time from an iterator without
+    keeping it. Two aggregates over separate chunks merge into exactly the
+    aggregate of both: counts add, and the sentiment sum is kept as a
+    Fraction so no rounding depends on how the content was split. Words are
+    counted in a SpaceSaving summary of word_capacity words, so memory is
+    fixed; once more distinct words than that are seen, word counts are
+    approximate, within word_error_bound(), and may depend on how the
+    content was split. Memory otherwise grows with the number of
+    distinct symbols, not with the corpus.
+    """
+    def __init__(self, ticker_extractor: Optional[TickerExtractor] = None, measures: Iterable[str] = MEASURES,
+                 word_capacity: int = DEFAULT_WORD_CAPACITY):
+        self.ticker_extractor = ticker_extractor or get_ticker_extractor()
+        # Only the measures a caller needs are computed; sentiment is the costly one
+        self.measures = frozenset(measures)
+        self.tickers = Counter()
+        self.words = SpaceSaving(word_capacity)
+        self.sentiment_sum = Fraction(0)
+        self.sentiment_count = 0
+        self.documents = 0
+
+    def add(self, content: Dict[str, Any]) -> None:
+        """Add one post or comment"""
+        self.add_batch([content])
+
+    def add_batch(self, contents: List[Dict[str, Any]]) -> None:
+        """Add a list of posts or comments, scoring their sentiment together"""
+        # Words are counted exactly over the batch, then folded into the summary
+        words = Counter()
+        for content in contents:
+            text = content_text(content)
+            if "tickers" in self.measures:
+                self.ticker_extractor.extract(text, self.tickers)
+            if "words" in self.measures:
+                words.update(word_tokens(text))
+        if words:
+            self.words.update(words)
+        if "sentiment" in self.measures:
+            self.sentiment_sum += exact_sum(content_sentiments(contents))
+            self.sentiment_count += len(contents)
+        self.documents += len(contents)
+
+    def update(self, contents: Iterable[Dict[str, Any]]) -> "MarketAggregate":
+        """Add every post or comment of an iterable, SCORING_BATCH_SIZE at a time; returns self"""
+        contents = iter(contents)
+        while True:
+            batch = list(islice(contents, SCORING_BATCH_SIZE))
+            if not batch:
+                return self
+            self.add_batch(batch)
+
+    def consume(self, contents: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Add contents as they are passed through, for a consumer that needs them too"""
+        contents = iter(contents)
+        while True:
+            batch = list(islice(contents, SCORING_BATCH_SIZE))
+            if not batch:
+                return
+            self.add_batch(batch)
+            yield from batch
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Partials travel between processes without the extractor's tables
+        state = dict(self.__dict__)
+        state["ticker_extractor"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.ticker_extractor = get_ticker_extractor()
+
+    def merge(self, other: "MarketAggregate") -> "MarketAggregate":
+        """Fold another aggregate into this one; returns self"""
+        self.tickers.update(other.tickers)
+        self.words.merge(other.words)
+        self.sentiment_sum += other.sentiment_sum
+        self.sentiment_count += other.sentiment_count
+        self.documents += other.documents
+        return self
+
+    def stock_mentions(self) -> List[Tuple[str, int]]:
+        """(symbol, count) pairs, most mentioned first"""
+        return top_counts(self.tickers)
+
+    def word_frequencies(self, max_words: int = 100) -> List[Dict[str, Any]]:
+        """Most frequent words, for word cloud generation, as {"word", "frequency"} entries"""
+        return frequency_entries(self.words, max_words)
+
+    def word_error_bound(self) -> int:
+        """The most any word frequency overstates its true count; 0 while the vocabulary fits the summary"""
+        return self.words.error_bound()
+
+    def average_sentiment(self) -> float:
+        """Mean sentiment polarity, 0 without content"""
+        if not self.sentiment_count:
+            return 0.0
+        return float(self.sentiment_sum / self.sentiment_count)
+
+    def fear_greed_index(self) -> float:
+        """
+        Fear/greed index from the mean sentiment
+        Returns: Score between 0 (extreme fear) and 100 (extreme greed), 50 without content
+        """
+        if not self.sentiment_count:
+            return 50.0
+        return float((self.sentiment_sum / self.sentiment_count + 1) * 50)
+
+def _warm_worker() -> None:
+    """Load the ticker universe and the polarity lexicon once per worker process"""
+    get_ticker_extractor()
+    get_polarity_scorer()
+
+def _aggregate_shard(contents: List[Dict[str, Any]], measures: Tuple[str, ...],
+                     ticker_extractor: Optional[TickerExtractor]) -> MarketAggregate:
+    return MarketAggregate(ticker_extractor, measures).update(contents)
+
+class AnalysisPool:
+    """
+    Aggregate content across a pool of worker processes
+
+    Content is cut into shards of shard_size documents, each shard is
+    aggregated in a worker, and the partial aggregates are merged in shard
+    order, which gives exactly the serial result, but for word counts past
+    the word summary's capacity, which are within word_error_bound().
+    At most two shards per worker are in flight, so an iterator is read only
+    as fast as the workers keep up. The workers start on first use and are
+    reused by later calls, so each loads the ticker universe and the
+    polarity lexicon once. They are spawned rather than forked, as the
+    caller may be running threads.
+    """
+    def __init__(self, workers: Optional[int] = None, shard_size: int = DEFAULT_SHARD_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker
+                )
+                atexit.register(self.close)
+            return self.executor
+
+    def aggregate(self, contents: Iterable[Dict[str, Any]], measures: Iterable[str] = MEASURES,
+                  ticker_extractor: Optional[TickerExtractor] = None) -> MarketAggregate:
+        """Aggregate posts and comments in parallel; the same as MarketAggregate(...).update(contents)"""
+        executor = self._executor()
+        measures = tuple(measures)
+        # Workers have the default extractor already; only a custom one is shipped with each shard
+        shipped = ticker_extractor if ticker_extractor is not get_ticker_extractor() else None
+        # Only the fields the aggregate reads are pickled to the workers
+        documents = ({key: content[key] for key in ("title", "text") if key in content} for content in contents)
+
+        result = MarketAggregate(ticker_extractor, measures)
+        pending = deque()
+        while True:
+            shard = list(islice(documents, self.shard_size))
+            if shard:
+                pending.append(executor.submit(_aggregate_shard, shard, measures, shipped))
+            # Merge in shard order once enough shards are queued, or at the end
+            while pending and (not shard or len(pending) >= 2 * self.workers):
+                result.merge(pending.popleft().result())
+            if not shard:
+                return result
+
+    def close(self) -> None:
+        """Stop the worker processes; the next call starts new ones"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown()
+
+# One pool per process, configured with ANALYSIS_WORKERS and ANALYSIS_SHARD_SIZE
+_shared_pool: Optional[AnalysisPool] = None
+_shared_lock = threading.Lock()
+
+def get_analysis_pool() -> Optional[AnalysisPool]:
+    """Return the process-wide analysis pool, or None when ANALYSIS_WORKERS is unset or below 2"""
+    global _shared_pool
+
+    workers = int(os.getenv("ANALYSIS_WORKERS", "0"))
+    if workers < 2:
+        return None
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = AnalysisPool(workers, int(os.getenv("ANALYSIS_SHARD_SIZE", DEFAULT_SHARD_SIZE)))
+    return _shared_pool
@@ -1,16 +1,21 @@
 from http.server import BaseHTTPRequestHandler
 from daily_processor import process_daily_data
+from database import acquire_database
 import json
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
+        # Reported on every response so the first request a process serves can be told apart
+        process_state = "first-request"
         try:
-            # Process the daily data
-            process_daily_data()
+            # Process the daily data with the process-wide database
+            database, process_state = acquire_database()
+            process_daily_data(database)
             
             # Return success response
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
             self.wfile.write(json.dumps({
                 "status": "success",
@@ -21,6 +26,7 @@ class handler(BaseHTTPRequestHandler):
             # Return error response
             self.send_response(500)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
             self.wfile.write(json.dumps({
                 "status": "error",
@@ -1,20 +1,23 @@
 from http.server import BaseHTTPRequestHandler
 from sentiment_analyzer import SentimentAnalyzer
 import json
-import requests
 import re
+import time
 from datetime import datetime, timedelta
-from requests.exceptions import Timeout
-import os
-from supabase import create_client, Client
+from database import acquire_database, get_supabase_client
+from llm_client import LLMTimeout
+
+# Seconds the DeepSeek call may take in total, retries included, within the function's time limit
+LLM_DEADLINE = 25
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
+        # Reported on every response so the first request a process serves can be told apart
+        process_state = "first-request"
         try:
-            # Initialize Supabase client
-            supabase_url = os.environ.get('SUPABASE_URL')
-            supabase_key = os.environ.get('SUPABASE_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Reuse the process-wide Supabase client; market_analysis only exists there
+            _, process_state = acquire_database()
+            supabase = get_supabase_client()
             
             # Initialize sentiment analyzer
             analyzer = SentimentAnalyzer()
@@ -80,28 +83,16 @@ Respond in JSON format with these fields:
 - key_themes: list of strings
 - confidence: number between 0 and 1"""
 
-            # Make the API request with timeout
+            # Make the API request through the shared pooled client, bounded by the deadline
             try:
-                response = requests.post(
-                    analyzer.api_url,
-                    headers=analyzer.headers,
-                    json={
-                        "model": "deepseek-chat",
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.3
-                    },
-                    timeout=25  # 25 second timeout
+                content = analyzer.llm.chat(
+                    prompt,
+                    temperature=0.3,
+                    deadline=time.monotonic() + LLM_DEADLINE
                 )
-            except Timeout:
+            except LLMTimeout:
                 raise Exception("DeepSeek API request timed out")
             
-            if response.status_code != 200:
-                raise Exception(f"API request failed: {response.text}")
-            
-            # Parse the response
-            result = response.json()
-            content = result['choices'][0]['message']['content']
-            
             # Extract JSON from markdown code block
             json_match = re.search(r'```json\n(.*?)\n```', content, re.DOTALL)
             if json_match:
@@ -126,6 +117,7 @@ Respond in JSON format with these fields:
             # Send success response
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
             self.wfile.write(json.dumps({
                 "status": "success",
@@ -136,6 +128,7 @@ Respond in JSON format with these fields:
         except Exception as e:
             self.send_response(500)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
             error_message = str(e)
             if "API request failed" in error_message:
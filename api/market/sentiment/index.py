@@ -1,33 +1,36 @@
 from http.server import BaseHTTPRequestHandler
-from database import Database
+from database import acquire_database
+from market_responses import sentiment_response
+import json
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
+        # Reported on every response so the first request a process serves can be told apart
+        process_state = "first-request"
         try:
-            database = Database()
-            analysis = database.get_latest_market_analysis()
+            database, process_state = acquire_database()
             
-            if not analysis:
+            # Pre-serialised from the cached analysis; only misses touch the database
+            body = database.get_market_analysis_response("sentiment", sentiment_response)
+            
+            if body is None:
                 self.send_response(404)
                 self.send_header('Content-type', 'application/json')
+                self.send_header('X-Process-State', process_state)
                 self.end_headers()
-                self.wfile.write(str({
+                self.wfile.write(json.dumps({
                     "detail": "No market analysis available. Please try again later."
                 }).encode())
                 return
                 
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
-            self.wfile.write(str({
-                "fear_greed_index": analysis["fear_greed_index"],
-                "market_sentiment": analysis["market_sentiment"],
-                "risk_indicators": analysis["risk_indicators"],
-                "date": analysis["date"],
-                "last_updated": analysis["created_at"]
-            }).encode())
+            self.wfile.write(body)
         except Exception as e:
             self.send_response(500)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
-            self.wfile.write(str({"detail": str(e)}).encode()) 
\ No newline at end of file
+            self.wfile.write(json.dumps({"detail": str(e)}).encode())
\ No newline at end of file
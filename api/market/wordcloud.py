@@ -1,39 +1,36 @@
 from http.server import BaseHTTPRequestHandler
-from database import Database
-from datetime import datetime, timedelta
+from database import acquire_database
+from market_responses import wordcloud_response
+import json
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
+        # Reported on every response so the first request a process serves can be told apart
+        process_state = "first-request"
         try:
-            # Get posts and comments from the last 24 hours
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(hours=24)
+            database, process_state = acquire_database()
             
-            database = Database()
-            posts = database.get_posts_by_time_range(start_time, end_time)
-            comments = database.get_comments_by_time_range(start_time, end_time)
+            # Pre-serialised from the cached analysis; only misses touch the database
+            body = database.get_market_analysis_response("wordcloud", wordcloud_response)
             
-            # Get the latest analysis for word frequencies
-            analysis = database.get_latest_market_analysis()
-            
-            if not analysis:
+            if body is None:
                 self.send_response(404)
                 self.send_header('Content-type', 'application/json')
+                self.send_header('X-Process-State', process_state)
                 self.end_headers()
-                self.wfile.write(str({
+                self.wfile.write(json.dumps({
                     "detail": "No market analysis available. Please try again later."
                 }).encode())
                 return
                 
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
-            self.wfile.write(str({
-                "word_frequencies": analysis["word_frequencies"],
-                "timestamp": analysis["created_at"]
-            }).encode())
+            self.wfile.write(body)
         except Exception as e:
             self.send_response(500)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
-            self.wfile.write(str({"detail": str(e)}).encode()) 
\ No newline at end of file
+            self.wfile.write(json.dumps({"detail": str(e)}).encode())
\ No newline at end of file
@@ -1,16 +1,16 @@
 from http.server import BaseHTTPRequestHandler
 import json
-import os
 from datetime import datetime, timedelta
-from supabase import create_client, Client
+from database import acquire_database, get_supabase_client
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
+        # Reported on every response so the first request a process serves can be told apart
+        process_state = "first-request"
         try:
-            # Initialize Supabase client
-            supabase_url = os.environ.get('SUPABASE_URL')
-            supabase_key = os.environ.get('SUPABASE_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Reuse the process-wide Supabase client; market_analysis only exists there
+            _, process_state = acquire_database()
+            supabase = get_supabase_client()
             
             # Get the latest analysis from the database
             result = supabase.table('market_analysis')\
@@ -27,6 +27,7 @@ class handler(BaseHTTPRequestHandler):
             # Send response
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
             self.wfile.write(json.dumps({
                 "status": "success",
@@ -38,6 +39,7 @@ class handler(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_response(500)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-Process-State', process_state)
             self.end_headers()
             self.wfile.write(json.dumps({
                 "status": "error",
@@ -0,0 +1,165 @@
+"""
+Benchmark the LLM paths against the local DeepSeek stand-in
+
+Runs sentiment analysis (one request per text, batched, and through the
+cascade) and the market batch analysis over a synthetic corpus, and reports
+throughput, p50/p99 request latency as the client sees it (retries and
+waiting for a connection slot included), and LLM calls per analyzed item:
+
+    python -m benchmarks.llm_bench --items 2000 --latency 0.3 --throttle-rate 0.05
+
+Each scenario starts with an empty cache; --warm runs it a second time on
+the same analyzer. --url benchmarks a mock that is already running instead.
+"""
+from typing import Dict, List, Any, Callable
+import argparse
+import json
+import random
+import threading
+import time
+import numpy as np
+
+from llm_client import LLMClient, DEFAULT_MAX_CONCURRENCY
+from sentiment_analyzer import SentimentAnalyzer
+from sentiment_cascade import SentimentCascade
+from market_analyzer import MarketAnalyzer, MAX_ANALYSIS_CHUNKS
+from benchmarks.mock_deepseek import start_mock_server, config_arguments, config_from_arguments
+
+TICKERS = ["GME", "AMC", "TSLA", "NVDA", "AAPL", "SPY", "PLTR", "SOFI", "RIVN", "COIN"]
+TEMPLATES = [
+    "{ticker} to the moon 🚀 diamond hands, massive gains incoming",
+    "Bought more ${ticker} calls today, feeling bullish about earnings",
+    "{ticker} is overvalued, this bubble is going to crash hard",
+    "Lost so much on {ticker} puts, I'm a bagholder now",
+    "What do you all think about {ticker} after the news?",
+    "Not selling my {ticker}, not even after this red week",
+    "Anyone else watching the market today? Volume looks weird",
+    "Fed meeting tomorrow, expecting a selloff across tech",
+    "Great quarter for {ticker}, beat on revenue and guidance raised",
+    "This sub is wild lol",
+]
+
+class TimedLLMClient(LLMClient):
+    """LLMClient that records how long every chat() call takes"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+        self.latency_lock = threading.Lock()
+
+    def chat(self, *args, **kwargs) -> str:
+        started = time.perf_counter()
+        try:
+            return super().chat(*args, **kwargs)
+        finally:
+            with self.latency_lock:
+                self.latencies.append(time.perf_counter() - started)
+
+def make_corpus(items: int, duplicates: float, seed: int) -> List[Dict[str, Any]]:
+    """Synthetic comments; a duplicates fraction of them repeat an earlier text exactly"""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(items):
+        if corpus and rng.random() < duplicates:
+            text = rng.choice(corpus)["text"]
+        else:
+            # The suffix makes texts distinct, as real comments are
+            text = f"{rng.choice(TEMPLATES).format(ticker=rng.choice(TICKERS))} #{index}"
+        corpus.append({"id": f"c{index}", "title": "", "text": text})
+    return corpus
+
+def run_scenario(name: str, client: TimedLLMClient, items: int, run: Callable[[], Any]) -> Dict[str, Any]:
+    """Time one scenario and summarise the requests it made"""
+    client.latencies = []
+    before = client.get_stats()
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    after = client.get_stats()
+
+    latencies = np.array(client.latencies) if client.latencies else np.zeros(1)
+    calls = len(client.latencies)
+    return {
+        "scenario": name,
+        "items": items,
+        "seconds": round(elapsed, 3),
+        "items_per_second": round(items / elapsed, 1) if elapsed else None,
+        "llm_calls": calls,
+        "calls_per_item": round(calls / items, 4) if items else None,
+        "http_requests": after["requests"] - before["requests"],
+        "retries": after["retries"] - before["retries"],
+        "throttled": after["throttled"] - before["throttled"],
+        "p50_seconds": round(float(np.percentile(latencies, 50)), 3),
+        "p99_seconds": round(float(np.percentile(latencies, 99)), 3)
+    }
+
+def scenarios(client: TimedLLMClient, corpus: List[Dict[str, Any]], chunk_token_budget: int,
+              max_chunks: int = MAX_ANALYSIS_CHUNKS) -> Dict[str, Callable[[], Callable[[], Any]]]:
+    """Scenario name -> factory of the callables to time, with a fresh analyzer per scenario"""
+    texts = [item["text"] for item in corpus]
+
+    def single():
+        analyzer = SentimentAnalyzer(llm_client=client)
+        return lambda: client.map(analyzer.analyze_text, texts)
+
+    def batched():
+        analyzer = SentimentAnalyzer(llm_client=client)
+        return lambda: analyzer.analyze_texts(texts)
+
+    def cascade():
+        engine = SentimentCascade(SentimentAnalyzer(llm_client=client))
+        return lambda: engine.analyze_texts(texts)
+
+    def market():
+        analyzer = MarketAnalyzer(llm_client=client)
+        return lambda: analyzer.batch_analyze_content(corpus, chunk_token_budget=chunk_token_budget,
+                                                      max_chunks=max_chunks)
+
+    return {"sentiment_single": single, "sentiment_batched": batched,
+            "sentiment_cascade": cascade, "market_batch": market}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM paths against a local DeepSeek stand-in")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="fraction of texts that repeat an earlier one")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--chunk-token-budget", type=int, default=6000)
+    parser.add_argument("--max-chunks", type=int, default=MAX_ANALYSIS_CHUNKS)
+    parser.add_argument("--scenario", action="append", help="run only these scenarios")
+    parser.add_argument("--warm", action="store_true", help="also run each scenario again on a warm cache")
+    parser.add_argument("--url", help="benchmark an already running mock instead of starting one")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    config_arguments(parser)
+    parser.set_defaults(seed=0)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server, _, url = start_mock_server(config_from_arguments(args))
+    client = TimedLLMClient(api_key="mock", api_url=url, max_concurrency=args.concurrency)
+    corpus = make_corpus(args.items, args.duplicates, args.seed)
+
+    results = []
+    for name, factory in scenarios(client, corpus, args.chunk_token_budget, args.max_chunks).items():
+        if args.scenario and name not in args.scenario:
+            continue
+        run = factory()
+        results.append(run_scenario(name, client, len(corpus), run))
+        if args.warm:
+            results.append(run_scenario(f"{name} (warm)", client, len(corpus), run))
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+    else:
+        columns = list(results[0].keys()) if results else []
+        print("  ".join(f"{column:>18}" if index else f"{column:<28}" for index, column in enumerate(columns)))
+        for result in results:
+            print("  ".join(f"{str(result[column]):>18}" if index else f"{str(result[column]):<28}"
+                            for index, column in enumerate(columns)))
+
+    if server is not None:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Local stand-in for the DeepSeek chat completions API
+
+Answers the sentiment (single and batched) and market analysis prompts with
+schema-valid JSON, scoring text with the local finance lexicon so replies
+vary with the content. Latency, error and throttling behaviour are
+configurable. Point the app at it with DEEPSEEK_API_URL:
+
+    python -m benchmarks.mock_deepseek --port 8089 --latency 0.4 --throttle-rate 0.05
+    DEEPSEEK_API_URL=http://127.0.0.1:8089/v1/chat/completions DEEPSEEK_API_KEY=mock python main.py
+
+GET /stats returns request counts; POST /reset clears them.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+import argparse
+import json
+import random
+import re
+import threading
+import time
+
+from sentiment_analyzer import estimate_tokens
+from sentiment_cascade import LexiconScorer
+
+BATCH_LINE = re.compile(r"^\[([^\]]+)\] (.*)$", re.MULTILINE)
+CASHTAG = re.compile(r"\$([A-Za-z]{1,5})\b")
+SYMBOL = re.compile(r"\b[A-Z]{2,5}\b")
+TOPIC_WORDS = re.compile(r"[a-z]{5,}")
+
+class MockConfig:
+    """How the mock behaves; rates are fractions of requests"""
+    def __init__(self, latency: float = 0.3, latency_sigma: float = 0.5, per_token_latency: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: Optional[float] = 1.0,
+                 max_concurrent: Optional[int] = None, drop_rate: float = 0.0, seed: Optional[int] = None):
+        # Median seconds per request, drawn from a lognormal with this sigma, plus
+        # per_token_latency seconds per estimated prompt token
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.per_token_latency = per_token_latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        # Requests over this many in flight are throttled, like a per-key rate limit
+        self.max_concurrent = max_concurrent
+        # Fraction of ids left out of batched sentiment replies
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+
+class MockState:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.scorer = LexiconScorer()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.stats = Counter()
+
+    def count(self, **increments) -> None:
+        with self.lock:
+            self.stats.update(increments)
+
+    def draw(self) -> Tuple[float, float]:
+        with self.lock:
+            return self.config.random.random(), self.config.random.lognormvariate(0.0, self.config.latency_sigma)
+
+def _sentiment(state: MockState, texts: List[str]) -> List[Dict[str, Any]]:
+    results = []
+    for score, label, confidence in state.scorer.analyze_texts(texts):
+        results.append({
+            "sentiment_score": round(score, 3),
+            "sentiment_label": label,
+            # The lexicon's confidence is 0 without hits; an LLM would still be fairly sure
+            "confidence": round(0.5 + confidence / 2, 3)
+        })
+    return results
+
+def _market_analysis(state: MockState, content: str) -> Dict[str, Any]:
+    symbols = Counter(symbol.upper() for symbol in CASHTAG.findall(content))
+    symbols.update(SYMBOL.findall(content))
+    topics = Counter(TOPIC_WORDS.findall(content.lower()))
+    score = _sentiment(state, [content])[0]["sentiment_score"]
+
+    return {
+        "stocks": [
+            {"symbol": symbol, "sentiment_score": score, "mention_count": count}
+            for symbol, count in symbols.most_common(10)
+        ],
+        "news": [
+            {"title": f"{symbol} in focus", "category": "discussion", "sentiment": score}
+            for symbol, _ in symbols.most_common(3)
+        ],
+        "market_sentiment": {"fear_greed_score": round((score + 1) * 50, 1), "confidence": 0.7},
+        "trending_topics": [
+            {"topic": topic, "frequency": count, "sentiment": score}
+            for topic, count in topics.most_common(10)
+        ],
+        "risk_indicators": {"volatility_score": round(min(1.0, len(symbols) / 20), 2), "contrarian_signals": []}
+    }
+
+def reply_for(state: MockState, prompt: str) -> Tuple[str, str]:
+    """The reply text for a prompt, and which kind of prompt it was"""
+    if "Each text is on its own line" in prompt:
+        lines = BATCH_LINE.findall(prompt)
+        kept = [(text_id, text) for text_id, text in lines if state.draw()[0] >= state.config.drop_rate]
+        results = _sentiment(state, [text for _, text in kept])
+        return json.dumps({text_id: result for (text_id, _), result in zip(kept, results)}), "sentiment_batch"
+    if prompt.startswith("Analyze the sentiment of this text"):
+        text = prompt.split("Text: ", 1)[-1].split("\n\nRespond in JSON", 1)[0]
+        return json.dumps(_sentiment(state, [text])[0]), "sentiment"
+    if "merged from analyses" in prompt:
+        analysis = prompt.split("Analysis: ", 1)[-1].split("\n\nMerge entries", 1)[0]
+        return analysis, "reduce"
+    if prompt.startswith("Analyze this market-related content"):
+        content = prompt.split("Content: ", 1)[-1].split("\n\nRespond in JSON", 1)[0]
+        return json.dumps(_market_analysis(state, content)), "market_analysis"
+    return json.dumps({"reply": "ok"}), "other"
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/stats":
+                return self._send(404, {"error": "not found"})
+            with state.lock:
+                self._send(200, dict(state.stats))
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.rstrip("/") == "/reset":
+                with state.lock:
+                    state.stats.clear()
+                return self._send(200, {"status": "reset"})
+
+            config = state.config
+            with state.lock:
+                state.active += 1
+                active = state.active
+            try:
+                state.count(requests=1)
+                roll, spread = state.draw()
+                over_limit = config.max_concurrent is not None and active > config.max_concurrent
+                if over_limit or roll < config.throttle_rate:
+                    state.count(throttled=1)
+                    headers = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else {}
+                    return self._send(429, {"error": {"message": "Rate limit reached"}}, headers)
+
+                try:
+                    prompt = json.loads(body)["messages"][-1]["content"]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    state.count(bad_requests=1)
+                    return self._send(400, {"error": {"message": "Invalid request body"}})
+
+                prompt_tokens = estimate_tokens(prompt)
+                time.sleep(config.latency * spread + config.per_token_latency * prompt_tokens)
+                if roll < config.throttle_rate + config.error_rate:
+                    state.count(errors=1)
+                    return self._send(500, {"error": {"message": "Internal server error"}})
+
+                content, kind = reply_for(state, prompt)
+                state.count(ok=1, prompt_tokens=prompt_tokens, **{f"kind_{kind}": 1})
+                self._send(200, {
+                    "id": f"mock-{state.stats['requests']}",
+                    "object": "chat.completion",
+                    "model": "deepseek-chat",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": estimate_tokens(content)}
+                })
+            finally:
+                with state.lock:
+                    state.active -= 1
+    return Handler
+
+def start_mock_server(config: Optional[MockConfig] = None, host: str = "127.0.0.1",
+                      port: int = 0) -> Tuple[ThreadingHTTPServer, MockState, str]:
+    """Serve the mock in a background thread; returns the server, its state and the completions URL"""
+    state = MockState(config or MockConfig())
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-deepseek", daemon=True).start()
+    return server, state, f"http://{host}:{server.server_port}/v1/chat/completions"
+
+def config_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the MockConfig options to a command line parser"""
+    parser.add_argument("--latency", type=float, default=0.3, help="median seconds per request")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal spread of the latency")
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="extra seconds per prompt token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--max-concurrent", type=int, default=None, help="throttle requests beyond this many in flight")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of ids left out of batch replies")
+    parser.add_argument("--seed", type=int, default=None)
+
+def config_from_arguments(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        per_token_latency=args.per_token_latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        max_concurrent=args.max_concurrent,
+        drop_rate=args.drop_rate,
+        seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the DeepSeek chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    config_arguments(parser)
+    args = parser.parse_args()
+
+    server, _, url = start_mock_server(config_from_arguments(args), args.host, args.port)
+    print(f"Mock DeepSeek API at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
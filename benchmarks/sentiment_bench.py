@@ -0,0 +1,63 @@
+"""
+Benchmark sentiment scoring: the batch polarity scorer against a TextBlob per document
+
+    python -m benchmarks.sentiment_bench --items 20000
+
+Reports documents per second over a synthetic corpus (or the lines of a file
+with --texts) for TextBlob(text).sentiment.polarity run per document, as the
+market aggregates did, and for PolarityScorer.score_texts() over batches of
+--batch-size, as they do now, with the largest difference between the two
+and whether it is within POLARITY_TOLERANCE.
+"""
+from typing import List
+import argparse
+import numpy as np
+from textblob import TextBlob
+
+from polarity_scorer import PolarityScorer, POLARITY_TOLERANCE
+from aggregation import SCORING_BATCH_SIZE
+from benchmarks.llm_bench import make_corpus
+from benchmarks.ticker_bench import timed
+
+def textblob_scores(texts: List[str]) -> np.ndarray:
+    return np.array([TextBlob(text).sentiment.polarity for text in texts])
+
+def batch_scores(scorer: PolarityScorer, texts: List[str], batch_size: int) -> np.ndarray:
+    return np.concatenate(
+        [scorer.score_texts(texts[offset:offset + batch_size]) for offset in range(0, len(texts), batch_size)]
+        or [np.zeros(0)]
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sentiment scoring")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--texts", help="score the lines of this file instead of a synthetic corpus")
+    parser.add_argument("--batch-size", type=int, default=SCORING_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as lines:
+            texts = [line.rstrip("\n") for line in lines]
+    else:
+        texts = [item["text"] for item in make_corpus(args.items, 0.0, args.seed)]
+    scorer = PolarityScorer()
+
+    runs = [
+        ("TextBlob (per document)", lambda: textblob_scores(texts)),
+        (f"batch scorer ({args.batch_size} per batch)", lambda: batch_scores(scorer, texts, args.batch_size)),
+    ]
+    print(f"{len(texts)} documents")
+    results = []
+    for name, run in runs:
+        seconds, scores = timed(run, args.repeat)
+        results.append(scores)
+        print(f"{name:<32} {seconds:8.3f}s {len(texts) / seconds:10.0f} docs/s  mean polarity {scores.mean():+.4f}")
+
+    difference = np.abs(results[0] - results[1]) if texts else np.zeros(1)
+    print(f"largest difference {difference.max():.3g}, {int((difference > POLARITY_TOLERANCE).sum())} "
+          f"documents beyond the tolerance of {POLARITY_TOLERANCE:g}")
+
+if __name__ == "__main__":
+    main()
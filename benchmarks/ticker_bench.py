@@ -0,0 +1,75 @@
+"""
+Benchmark ticker extraction: the dictionary-backed extractor against the old regexes
+
+    python -m benchmarks.ticker_bench --items 20000
+
+Reports throughput in MB/s over a synthetic corpus, for the old patterns run
+over the concatenated corpus (as analyze_market_trends did) and per document
+(as the ticker rollup did), and for the extractor run per document, with the
+symbols each finds most often.
+"""
+from collections import Counter
+from typing import List, Tuple, Callable, Any
+import argparse
+import re
+import time
+
+from ticker_extractor import TickerExtractor
+from benchmarks.llm_bench import make_corpus
+
+# The patterns MarketAnalyzer.extract_stock_mentions used before the extractor
+LEGACY_STOCK_PATTERNS = [
+    r'\$[A-Z]{1,5}',  # $AAPL
+    r'[A-Z]{1,5}',    # AAPL
+    r'[A-Za-z]+ Inc\.',  # Apple Inc.
+    r'[A-Za-z]+ Corp\.'  # Microsoft Corp.
+]
+
+def legacy_extract(text: str) -> List[Tuple[str, int]]:
+    mentions = []
+    for pattern in LEGACY_STOCK_PATTERNS:
+        for match in re.finditer(pattern, text):
+            mentions.append(match.group().strip('$').strip('.'))
+    return Counter(mentions).most_common()
+
+def legacy_count(texts: List[str]) -> Counter:
+    total = Counter()
+    for text in texts:
+        total.update(dict(legacy_extract(text)))
+    return total
+
+def timed(run: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    """Best wall time of repeat runs, and the last result"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ticker extraction")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = [item["text"] for item in make_corpus(args.items, 0.0, args.seed)]
+    corpus = " ".join(texts)
+    megabytes = len(corpus.encode()) / 1e6
+    extractor = TickerExtractor()
+
+    runs = [
+        ("legacy regexes (concatenated)", lambda: legacy_extract(corpus)),
+        # How the ticker rollup called it, one record at a time
+        ("legacy regexes (per document)", lambda: legacy_count(texts).most_common()),
+        ("extractor (per document)", lambda: extractor.count(texts).most_common()),
+    ]
+    print(f"{args.items} documents, {megabytes:.2f} MB")
+    for name, run in runs:
+        seconds, mentions = timed(run, args.repeat)
+        print(f"{name:<32} {seconds:8.3f}s {megabytes / seconds:8.2f} MB/s  "
+              f"{len(mentions)} symbols, top {mentions[:6]}")
+
+if __name__ == "__main__":
+    main()
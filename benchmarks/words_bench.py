@@ -0,0 +1,71 @@
+"""
+Benchmark word counting: the bounded word summary against a full Counter of split text
+
+    python -m benchmarks.words_bench --items 20000 --capacity 500
+
+Reports documents per second over a synthetic corpus (or the lines of a file
+with --texts) for a Counter over text.lower().split(), as
+generate_word_frequencies did, and for word_tokens() folded into a
+SpaceSaving summary in batches, as the aggregates do now, with the number of
+words each keeps, the top words, and how many of the summary's top words
+are wrong or have counts outside their reported errors.
+"""
+from collections import Counter
+from typing import List
+import argparse
+
+from word_counter import SpaceSaving, DEFAULT_WORD_CAPACITY, word_tokens
+from aggregation import SCORING_BATCH_SIZE
+from benchmarks.llm_bench import make_corpus
+from benchmarks.ticker_bench import timed
+
+def split_counts(texts: List[str]) -> Counter:
+    counts = Counter()
+    for text in texts:
+        counts.update(text.lower().split())
+    return counts
+
+def summary_counts(texts: List[str], capacity: int) -> SpaceSaving:
+    summary = SpaceSaving(capacity)
+    for offset in range(0, len(texts), SCORING_BATCH_SIZE):
+        words = Counter()
+        for text in texts[offset:offset + SCORING_BATCH_SIZE]:
+            words.update(word_tokens(text))
+        summary.update(words)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark word counting")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--texts", help="count the lines of this file instead of a synthetic corpus")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_WORD_CAPACITY)
+    parser.add_argument("--top", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as lines:
+            texts = [line.rstrip("\n") for line in lines]
+    else:
+        texts = [item["text"] for item in make_corpus(args.items, 0.0, args.seed)]
+    print(f"{len(texts)} documents")
+
+    seconds, counts = timed(lambda: split_counts(texts), args.repeat)
+    print(f"{'Counter (split)':<32} {seconds:8.3f}s {len(texts) / seconds:10.0f} docs/s  "
+          f"{len(counts)} words kept, top {counts.most_common(6)}")
+
+    seconds, summary = timed(lambda: summary_counts(texts, args.capacity), args.repeat)
+    top = summary.top(args.top)
+    print(f"{f'SpaceSaving ({args.capacity} words)':<32} {seconds:8.3f}s {len(texts) / seconds:10.0f} docs/s  "
+          f"{len(summary.counts)} words kept, top {[(word, count) for word, count, _ in top[:6]]}")
+
+    # The summary's top words against exact counts of the same tokens
+    exact = Counter(token for text in texts for token in word_tokens(text))
+    expected = {word for word, _ in exact.most_common(args.top)}
+    outside = sum(1 for word, count, error in top if not count - error <= exact[word] <= count)
+    print(f"error bound {summary.error_bound()}, {len({word for word, _, _ in top} - expected)} of the top "
+          f"{len(top)} not in the exact top {args.top}, {outside} counts outside their errors")
+
+if __name__ == "__main__":
+    main()
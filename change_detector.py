@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple, Iterable
+import hashlib
+import threading
+
+class ChangeDetector:
+    """
+    Skip writes for posts and comments that have not changed since they were
+    last written by this process
+
+    Keeps a bounded LRU of record ids with a fingerprint of their mutable
+    fields. Records never seen before go out as full rows, records whose
+    fingerprint changed go out as partial updates carrying only the changed
+    fields, and unchanged records are dropped.
+    """
+    MUTABLE_FIELDS = {
+        "posts": ("score", "num_comments", "text"),
+        "comments": ("score", "text")
+    }
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], Tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {
+            "hits": 0,      # unchanged, write skipped
+            "misses": 0,    # not seen before, full row written
+            "changed": 0,   # seen with different values, partial update written
+            "evictions": 0
+        }
+
+    def _fingerprint(self, kind: str, record: Dict[str, Any]) -> Tuple:
+        """One small digest per mutable field, so changed fields can be told apart without keeping the text"""
+        digests = []
+        for field in self.MUTABLE_FIELDS[kind]:
+            value = record.get(field)
+            if isinstance(value, str):
+                value = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+            digests.append(value)
+        return tuple(digests)
+
+    def filter(self, kind: str, records: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Split records into (new full rows, partial updates)
+        Partial updates hold the record id and only the fields that changed.
+        """
+        new_rows = []
+        updates = []
+
+        with self.lock:
+            for record in records:
+                key = (kind, record["id"])
+                fingerprint = self._fingerprint(kind, record)
+                previous = self.entries.get(key)
+
+                if previous is None:
+                    self.stats["misses"] += 1
+                    new_rows.append(record)
+                elif previous == fingerprint:
+                    self.stats["hits"] += 1
+                    self.entries.move_to_end(key)
+                    continue
+                else:
+                    self.stats["changed"] += 1
+                    update = {"id": record["id"]}
+                    for field, old, new in zip(self.MUTABLE_FIELDS[kind], previous, fingerprint):
+                        if old != new:
+                            update[field] = record.get(field)
+                    updates.append(update)
+
+                self.entries[key] = fingerprint
+                self.entries.move_to_end(key)
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+
+        return new_rows, updates
+
+    def forget(self, kind: str, ids: Iterable[str]) -> None:
+        """Drop records whose write failed so the next pass writes them again"""
+        with self.lock:
+            for record_id in ids:
+                self.entries.pop((kind, record_id), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus the share of records whose write was skipped"""
+        with self.lock:
+            seen = self.stats["hits"] + self.stats["misses"] + self.stats["changed"]
+            return {
+                **self.stats,
+                "entries": len(self.entries),
+                "skip_rate": self.stats["hits"] / seen if seen else 0.0
+            }
@@ -1,37 +1,51 @@
 from datetime import datetime, timedelta
-from database import Database
+from database import StorageBackend, get_database, POST_TEXT_COLUMNS, COMMENT_TEXT_COLUMNS
 from market_analyzer import MarketAnalyzer
+from aggregation import get_analysis_pool
+from typing import Optional
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_daily_data():
+# Upper bound on posts and on comments read for one day of analysis
+DAILY_ROW_LIMIT = 50000
+# LLM requests for the day's batch analysis; a day's content is sampled down to this many chunks
+DAILY_MAX_CHUNKS = 64
+
+def process_daily_data(database: Optional[StorageBackend] = None):
     """
     Process market data for the last 24 hours and store it in the database
     """
     try:
         # Initialize components
-        database = Database()
-        market_analyzer = MarketAnalyzer()
+        database = database or get_database()
+        # Set ANALYSIS_WORKERS to spread the counting and scoring over worker processes
+        market_analyzer = MarketAnalyzer(pool=get_analysis_pool())
         
         # Get data from the last 24 hours
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=24)
         
-        # Get posts and comments
-        posts = database.get_posts_by_time_range(start_time, end_time)
-        comments = database.get_comments_by_time_range(start_time, end_time)
+        # Stream posts and comments page by page into the analysis
+        posts = database.iter_posts_by_time_range(
+            start_time, end_time, max_rows=DAILY_ROW_LIMIT, columns=POST_TEXT_COLUMNS
+        )
+        comments = database.iter_comments_by_time_range(
+            start_time, end_time, max_rows=DAILY_ROW_LIMIT, columns=COMMENT_TEXT_COLUMNS
+        )
         
         # Process the data
-        analysis = market_analyzer.analyze_market_trends(posts, comments)
+        analysis = market_analyzer.analyze_market_trends(posts, comments, max_chunks=DAILY_MAX_CHUNKS)
+        logger.info(f"Analyzed {analysis['documents']} posts and comments")
         
         # Store in database
         database.store_daily_analysis(
             date=end_time.date(),
             stock_mentions=analysis["stock_mentions"],
             word_frequencies=analysis["word_frequencies"],
+            word_error_bound=analysis["word_error_bound"],
             fear_greed_index=analysis["fear_greed_index"],
             market_sentiment=analysis["batch_analysis"]["market_sentiment"],
             trending_topics=analysis["batch_analysis"]["trending_topics"],
@@ -1,18 +1,576 @@
 from supabase import create_client
+from abc import ABC, abstractmethod
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Iterator, Tuple, Union, Sequence, Callable
 from datetime import datetime
 import json
+import threading
+import time
+import weakref
 
-class Database:
-    def __init__(self):
+# Rows sent per request by the bulk store methods
+DEFAULT_CHUNK_SIZE = 500
+# Rows fetched per request by the streaming time range readers
+DEFAULT_PAGE_SIZE = 1000
+# Records whose deferred columns are fetched together by one request
+DEFAULT_LAZY_BATCH_SIZE = 200
+# Text hashes looked up per request; 64-character hashes keep the URL well under limits
+HASH_LOOKUP_SIZE = 100
+
+# Column sets for analytics reads, so callers only pay for what they use
+POST_TEXT_COLUMNS = ('id', 'created_utc', 'title', 'text')
+COMMENT_TEXT_COLUMNS = ('id', 'created_utc', 'text')
+POST_METRIC_COLUMNS = ('id', 'created_utc', 'subreddit', 'score', 'num_comments')
+COMMENT_METRIC_COLUMNS = ('id', 'created_utc', 'post_id', 'score')
+SENTIMENT_SCORE_COLUMNS = ('content_id', 'content_type', 'sentiment_score', 'confidence', 'created_at')
+SENTIMENT_RESULT_COLUMNS = ('sentiment_score', 'sentiment_label', 'confidence')
+
+# Seconds the latest market analysis is served from memory before it is read again
+ANALYSIS_CACHE_TTL = 300
+
+# Upsert conflict targets for tables whose natural key is not their primary key.
+# A re-analysed post or comment replaces its sentiment row instead of adding one.
+SENTIMENT_KEY = ('content_type', 'content_id')
+UPSERT_KEYS = {
+    'sentiments': SENTIMENT_KEY,
+    'daily_market_analysis': ('date',),
+}
+
+Columns = Union[str, Sequence[str]]
+
+def select_clause(columns: Columns, required: Sequence[str] = ()) -> str:
+    """Build a PostgREST select list, adding any columns the query itself depends on"""
+    if isinstance(columns, str):
+        columns = [column.strip() for column in columns.split(',')]
+    if '*' in columns:
+        return '*'
+    columns = list(columns)
+    columns += [column for column in required if column not in columns]
+    return ','.join(columns)
+
+class LazyRecord(dict):
+    """
+    A row read without some of its columns, typically the text body
+
+    Reading a deferred column, by indexing or get(), makes the loader fetch
+    it for this record and for the other records still waiting on it, in one
+    request per batch.
+    """
+    def __init__(self, row: Dict[str, Any], loader: "DeferredColumnLoader"):
+        super().__init__(row)
+        self.loader = loader
+
+    def __missing__(self, key):
+        if key in self.loader.columns:
+            self.loader.load(self)
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self.loader.columns and not dict.__contains__(self, key):
+            self.loader.load(self)
+        return dict.get(self, key, default)
+
+    def __reduce__(self):
+        # Pickle as a plain dict; the loader holds a database client
+        return (dict, (dict(self),))
+
+class DeferredColumnLoader:
+    """Fetch deferred columns for LazyRecords in batches"""
+    def __init__(self, database: "StorageBackend", table: str, columns: Sequence[str],
+                 batch_size: int = DEFAULT_LAZY_BATCH_SIZE):
+        self.database = database
+        self.table = table
+        self.columns = tuple(columns)
+        self.batch_size = batch_size
+        # Weak so records the caller has dropped are not kept alive waiting for a load
+        self.pending: "weakref.WeakValueDictionary[str, LazyRecord]" = weakref.WeakValueDictionary()
+
+    def wrap(self, row: Dict[str, Any]) -> LazyRecord:
+        """Register a row whose deferred columns have not been fetched yet"""
+        record = LazyRecord(row, self)
+        self.pending[row['id']] = record
+        return record
+
+    def load(self, record: LazyRecord) -> None:
+        """Fetch the deferred columns for this record and up to a batch of other pending ones"""
+        batch = {record['id']: record}
+        for record_id, pending in list(self.pending.items()):
+            if len(batch) >= self.batch_size:
+                break
+            batch.setdefault(record_id, pending)
+
+        for row in self.database.fetch_columns(self.table, list(batch), self.columns):
+            batch[row['id']].update(row)
+        for record_id, loaded in batch.items():
+            # Rows deleted since the first read keep None so they are not fetched again
+            for column in self.columns:
+                dict.setdefault(loaded, column, None)
+            self.pending.pop(record_id, None)
+
+def decode_jsonb(value: Any) -> Any:
+    """
+    Read a JSONB column that may still hold a JSON-encoded string
+    Rows written before the native JSONB migration stored documents as strings.
+    """
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+class AnalysisCache:
+    """
+    Process-wide cache of the latest market analysis
+
+    Holds the decoded analysis and, per endpoint, the response body already
+    serialised from it, so a hit needs neither a database round-trip nor any
+    JSON work. Entries expire after the TTL and are dropped whenever this
+    process stores a new daily analysis.
+    """
+    def __init__(self, ttl: float = ANALYSIS_CACHE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.analysis: Optional[Dict[str, Any]] = None
+        self.loaded_at = 0.0
+        self.responses: Dict[str, bytes] = {}
+
+    def _fresh(self) -> bool:
+        return self.analysis is not None and time.monotonic() - self.loaded_at < self.ttl
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.analysis if self._fresh() else None
+
+    def set(self, analysis: Dict[str, Any]) -> None:
+        with self.lock:
+            self.analysis = analysis
+            self.loaded_at = time.monotonic()
+            self.responses = {}
+
+    def get_response(self, endpoint: str) -> Optional[bytes]:
+        with self.lock:
+            return self.responses.get(endpoint) if self._fresh() else None
+
+    def set_response(self, endpoint: str, analysis: Dict[str, Any], body: bytes) -> None:
+        with self.lock:
+            # Only keep bodies built from the analysis currently cached
+            if analysis is self.analysis:
+                self.responses[endpoint] = body
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.analysis = None
+            self.responses = {}
+
+analysis_cache = AnalysisCache()
+
+# One Supabase client per process. Its HTTP session keeps connections alive,
+# so later serverless invocations in the same process can reuse its TLS connections.
+_shared_client = None
+_shared_database = None
+_shared_lock = threading.Lock()
+_shared_requests = 0
+
+def get_supabase_client():
+    """Return the process-wide Supabase client, creating it on first use"""
+    global _shared_client
+    
+    with _shared_lock:
+        if _shared_client is None:
+            supabase_url = os.getenv("SUPABASE_URL")
+            supabase_key = os.getenv("SUPABASE_KEY")
+            
+            if not supabase_url or not supabase_key:
+                raise ValueError("Missing Supabase credentials")
+                
+            _shared_client = create_client(supabase_url, supabase_key)
+            
+    return _shared_client
+
+def get_database() -> "StorageBackend":
+    """
+    Return the process-wide storage backend, creating it on first use
+    STORAGE_BACKEND selects "supabase" (the default) or "sqlite", stored at SQLITE_PATH.
+    """
+    global _shared_database
+    
+    backend = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    if backend == "sqlite":
+        # Imported here, sqlite_database builds on this module
+        from sqlite_database import SQLiteDatabase
+        with _shared_lock:
+            if _shared_database is None:
+                _shared_database = SQLiteDatabase()
+        return _shared_database
+    if backend != "supabase":
+        raise ValueError(f"Unknown storage backend: {backend}")
+    
+    client = get_supabase_client()
+    with _shared_lock:
+        if _shared_database is None:
+            _shared_database = Database(client)
+            
+    return _shared_database
+
+def acquire_database() -> Tuple["StorageBackend", str]:
+    """
+    Return the shared storage backend for one request, and "first-request" if this
+    is the first request the process serves with it or "reused" otherwise
+    This counts requests per process; it does not say whether the HTTP pool
+    reused a connection or had to open a new one.
+    """
+    global _shared_requests
+    
+    database = get_database()
+    with _shared_lock:
+        _shared_requests += 1
+        state = "first-request" if _shared_requests == 1 else "reused"
+        
+    return database, state
+
+class StorageBackend(ABC):
+    """
+    Storage interface shared by the Supabase and SQLite backends
+
+    Backends implement the reads and writes against their own store; chunked
+    bulk writes, keyset time range walks, lazy columns and the analysis cache
+    are built on top of them here, so both behave the same way.
+    """
+    @abstractmethod
+    def store_post(self, post_data: Dict[str, Any]) -> None:
+        """Store a Reddit post in the database"""
+
+    @abstractmethod
+    def store_comment(self, comment_data: Dict[str, Any]) -> None:
+        """Store a Reddit comment in the database"""
+
+    @abstractmethod
+    def store_sentiment(self, sentiment_data: Dict[str, Any]) -> None:
+        """Store sentiment analysis results, replacing any earlier result for the same content"""
+
+    @abstractmethod
+    def _write_chunk(self, table: str, rows: List[Dict[str, Any]], upsert: bool) -> None:
+        """Write one chunk of rows in a single request, replacing rows with the same key if upsert"""
+
+    def _store_chunks(self, table: str, rows: List[Dict[str, Any]], chunk_size: int,
+                      key: Union[str, Sequence[str], None] = 'id') -> List[Dict[str, Any]]:
+        """
+        Upsert rows with one request per chunk, key being one column or several
+        Returns one result per chunk so a failing chunk does not hide the others.
+        """
+        keys = (key,) if isinstance(key, str) else tuple(key or ())
+        if keys:
+            # Postgres rejects an upsert that touches the same row twice, keep the last copy
+            rows = list({tuple(row[column] for column in keys): row for row in rows}.values())
+
+        results = []
+        for offset in range(0, len(rows), chunk_size):
+            chunk = rows[offset:offset + chunk_size]
+            try:
+                self._write_chunk(table, chunk, upsert=key is not None)
+                results.append({"offset": offset, "count": len(chunk), "success": True, "error": None})
+            except Exception as e:
+                print(f"Error storing {len(chunk)} rows in {table}: {str(e)}")
+                results.append({
+                    "offset": offset,
+                    "count": len(chunk),
+                    "success": False,
+                    "error": str(e),
+                    "ids": [row.get(keys[-1] if keys else 'content_id') for row in chunk]
+                })
+        return results
+
+    @abstractmethod
+    def _update_chunk(self, table: str, updates: List[Dict[str, Any]]) -> None:
+        """Apply one chunk of partial updates, each an id and the fields to set, in a single request"""
+
+    def _update_chunks(self, table: str, updates: List[Dict[str, Any]], chunk_size: int) -> List[Dict[str, Any]]:
+        """
+        Apply partial updates grouped by the fields they set, one request per chunk
+        Returns one result per chunk, as _store_chunks does, offsets counting
+        through the updates in group order.
+        """
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for fields in updates:
+            groups.setdefault(tuple(sorted(fields)), []).append(fields)
+
+        results = []
+        offset = 0
+        for group in groups.values():
+            for start in range(0, len(group), chunk_size):
+                chunk = group[start:start + chunk_size]
+                try:
+                    self._update_chunk(table, chunk)
+                    results.append({"offset": offset, "count": len(chunk), "success": True, "error": None})
+                except Exception as e:
+                    print(f"Error updating {len(chunk)} rows in {table}: {str(e)}")
+                    results.append({
+                        "offset": offset,
+                        "count": len(chunk),
+                        "success": False,
+                        "error": str(e),
+                        "ids": [fields["id"] for fields in chunk]
+                    })
+                offset += len(chunk)
+        return results
+
+    def store_posts(self, posts: List[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Store Reddit posts in chunks, one request per chunk"""
+        return self._store_chunks('posts', posts, chunk_size)
+
+    def store_comments(self, comments: List[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Store Reddit comments in chunks, one request per chunk"""
+        return self._store_chunks('comments', comments, chunk_size)
+
+    def store_sentiments(self, sentiments: List[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Store sentiment analysis results in chunks, one request per chunk"""
+        return self._store_chunks('sentiments', sentiments, chunk_size, key=SENTIMENT_KEY)
+
+    def update_posts(self, updates: List[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Update only the changed fields of stored Reddit posts, one request per chunk"""
+        return self._update_chunks('posts', updates, chunk_size)
+
+    def update_comments(self, updates: List[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Update only the changed fields of stored Reddit comments, one request per chunk"""
+        return self._update_chunks('comments', updates, chunk_size)
+
+    @abstractmethod
+    def update_post(self, post_id: str, fields: Dict[str, Any]) -> None:
+        """Update only the given fields of a stored Reddit post"""
+
+    @abstractmethod
+    def update_comment(self, comment_id: str, fields: Dict[str, Any]) -> None:
+        """Update only the given fields of a stored Reddit comment"""
+
+    @abstractmethod
+    def get_collection_cursor(self, subreddit: str, listing: str) -> Optional[Dict[str, Any]]:
+        """Get the incremental collection high-water mark for a subreddit listing"""
+
+    @abstractmethod
+    def store_collection_cursor(self, cursor_data: Dict[str, Any]) -> None:
+        """Store the incremental collection high-water mark for a subreddit listing"""
+
+    @abstractmethod
+    def get_post(self, post_id: str, columns: Columns = '*') -> Optional[Dict[str, Any]]:
+        """Get a single post by id"""
+
+    @abstractmethod
+    def get_posts_by_subreddit(self, subreddit: str, limit: int = 100, columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get posts from a specific subreddit"""
+
+    @abstractmethod
+    def get_comments_by_post(self, post_id: str, limit: int = 100, columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get comments for a specific post"""
+
+    @abstractmethod
+    def get_posts_by_time_range(self, start_time: datetime, end_time: datetime, page: int = 1, page_size: int = 50,
+                                columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get posts within a time range with pagination"""
+
+    @abstractmethod
+    def get_comments_by_time_range(self, start_time: datetime, end_time: datetime, page: int = 1, page_size: int = 50,
+                                   columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get comments within a time range with pagination"""
+
+    @abstractmethod
+    def fetch_columns(self, table: str, ids: List[str], columns: Sequence[str]) -> List[Dict[str, Any]]:
+        """Read some columns, plus id, of the rows with the given ids"""
+
+    @abstractmethod
+    def _read_time_range_page(self, table: str, start_time: datetime, end_time: datetime, size: int,
+                              columns: Columns, boundary: Optional[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Read up to size rows inside a time range ordered by (created_utc, id) descending,
+        starting strictly after boundary when one is given
+        """
+
+    def _iter_time_range(self, table: str, start_time: datetime, end_time: datetime,
+                         page_size: int, max_rows: Optional[int], columns: Columns = '*',
+                         lazy_columns: Sequence[str] = ()) -> Iterator[Dict[str, Any]]:
+        """
+        Walk every row of a table inside a time range, newest first
+
+        Uses keyset pagination on (created_utc, id): each page starts strictly
+        after the last row of the previous one, so pages cost the same no matter
+        how deep the walk goes and rows sharing a timestamp are neither skipped
+        nor repeated. Only `columns` are read; `lazy_columns` are left out and
+        fetched in batches the first time a yielded record reads one of them.
+        """
+        loader = DeferredColumnLoader(self, table, lazy_columns) if lazy_columns else None
+        remaining = max_rows
+        boundary: Optional[Tuple[str, str]] = None
+
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            try:
+                rows = self._read_time_range_page(table, start_time, end_time, size, columns, boundary)
+            except Exception as e:
+                print(f"Error reading {table} by time range: {str(e)}")
+                raise
+
+            if loader:
+                rows = [loader.wrap(row) for row in rows]
+            yield from rows
+
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
+            boundary = (rows[-1]['created_utc'], rows[-1]['id'])
+
+    def iter_posts_by_time_range(self, start_time: datetime, end_time: datetime,
+                                 page_size: int = DEFAULT_PAGE_SIZE, max_rows: Optional[int] = None,
+                                 columns: Columns = '*', lazy_columns: Sequence[str] = ()) -> Iterator[Dict[str, Any]]:
+        """Stream all posts within a time range, optionally stopping after max_rows"""
+        return self._iter_time_range('posts', start_time, end_time, page_size, max_rows, columns, lazy_columns)
+
+    def iter_comments_by_time_range(self, start_time: datetime, end_time: datetime,
+                                    page_size: int = DEFAULT_PAGE_SIZE, max_rows: Optional[int] = None,
+                                    columns: Columns = '*', lazy_columns: Sequence[str] = ()) -> Iterator[Dict[str, Any]]:
+        """Stream all comments within a time range, optionally stopping after max_rows"""
+        return self._iter_time_range('comments', start_time, end_time, page_size, max_rows, columns, lazy_columns)
+
+    def get_all_posts_by_time_range(self, start_time: datetime, end_time: datetime, max_rows: Optional[int],
+                                    page_size: int = DEFAULT_PAGE_SIZE, columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Collect posts within a time range; max_rows must be given explicitly (None for no cap)"""
+        return list(self.iter_posts_by_time_range(start_time, end_time, page_size, max_rows, columns))
+
+    def get_all_comments_by_time_range(self, start_time: datetime, end_time: datetime, max_rows: Optional[int],
+                                       page_size: int = DEFAULT_PAGE_SIZE, columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Collect comments within a time range; max_rows must be given explicitly (None for no cap)"""
+        return list(self.iter_comments_by_time_range(start_time, end_time, page_size, max_rows, columns))
+
+    @abstractmethod
+    def get_sentiment_by_time_range(self, start_time: datetime, end_time: datetime,
+                                    columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get sentiment analysis results within a time range"""
+
+    @abstractmethod
+    def get_sentiment_by_text_hash(self, text_hash: str,
+                                   columns: Columns = SENTIMENT_RESULT_COLUMNS) -> Optional[Dict[str, Any]]:
+        """Get the latest stored sentiment result for a text hash, the persistent tier of the sentiment cache"""
+
+    @abstractmethod
+    def get_sentiments_by_text_hashes(self, text_hashes: List[str],
+                                      columns: Columns = SENTIMENT_RESULT_COLUMNS) -> Dict[str, Dict[str, Any]]:
+        """Get a stored sentiment result for each of many text hashes; hashes without one are left out"""
+
+    @abstractmethod
+    def _write_daily_analysis(self, row: Dict[str, Any]) -> None:
+        """Insert or replace the daily_market_analysis row for row['date']"""
+
+    @abstractmethod
+    def _read_latest_market_analysis(self) -> Optional[Dict[str, Any]]:
+        """Read the daily_market_analysis row with the latest date"""
+
+    def store_daily_analysis(self, date, stock_mentions, word_frequencies, fear_greed_index, 
+                            market_sentiment, trending_topics, risk_indicators, word_error_bound=0):
+        """
+        Store daily market analysis in the database
+        word_error_bound is the most any word frequency overstates its true count.
+        """
+        try:
+            # JSONB columns take the documents as they are; encoding them first
+            # would store JSON strings that the database cannot look inside
+            self._write_daily_analysis({
+                "date": date.isoformat() if hasattr(date, 'isoformat') else date,
+                "stock_mentions": stock_mentions,
+                "word_frequencies": word_frequencies,
+                "word_error_bound": word_error_bound,
+                "fear_greed_index": fear_greed_index,
+                "market_sentiment": market_sentiment,
+                "trending_topics": trending_topics,
+                "risk_indicators": risk_indicators
+            })
+            
+            # Readers must not keep serving the previous analysis
+            analysis_cache.invalidate()
+            
+        except Exception as e:
+            print(f"Error storing daily analysis: {str(e)}")
+            raise
+
+    def get_latest_market_analysis(self):
+        """
+        Get the most recent market analysis, served from the analysis cache while it is fresh
+        """
+        cached = analysis_cache.get()
+        if cached is not None:
+            return cached
+            
+        try:
+            result = self._read_latest_market_analysis()
+            
+            if result:
+                analysis = {
+                    "date": result['date'],
+                    "stock_mentions": decode_jsonb(result['stock_mentions']),
+                    "word_frequencies": decode_jsonb(result['word_frequencies']),
+                    # Analyses stored before the column existed have none
+                    "word_error_bound": result.get('word_error_bound') or 0,
+                    "fear_greed_index": result['fear_greed_index'],
+                    "market_sentiment": decode_jsonb(result['market_sentiment']),
+                    "trending_topics": decode_jsonb(result['trending_topics']),
+                    "risk_indicators": decode_jsonb(result['risk_indicators']),
+                    "created_at": result['created_at']
+                }
+                analysis_cache.set(analysis)
+                return analysis
+            return None
+            
+        except Exception as e:
+            print(f"Error getting latest market analysis: {str(e)}")
+            raise 
+
+    def get_market_analysis_response(self, endpoint: str,
+                                     build: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Optional[bytes]:
+        """
+        Get an endpoint's JSON response body for the latest market analysis
+        The body is built and serialised once per cached analysis; returns None when there is no analysis.
+        """
+        body = analysis_cache.get_response(endpoint)
+        if body is not None:
+            return body
+            
+        analysis = self.get_latest_market_analysis()
+        if not analysis:
+            return None
+            
+        body = json.dumps(build(analysis)).encode()
+        analysis_cache.set_response(endpoint, analysis, body)
+        return body
+
+    @abstractmethod
+    def get_market_analysis_history(self, start_date, end_date=None,
+                                    columns: Columns = ('date', 'fear_greed_index')) -> List[Dict[str, Any]]:
+        """
+        Get daily market analysis rows by date, oldest first
+        Columns may be JSON paths such as 'fear_greed_score:market_sentiment->fear_greed_score'.
+        """
+
+    @abstractmethod
+    def replace_ticker_mentions(self, contents: List[Dict[str, Any]]) -> None:
+        """
+        Replace the ticker mentions of a batch of posts/comments in one transaction
+        The hourly rollup is adjusted by the difference, so repeats never double count.
+        """
+
+    @abstractmethod
+    def get_ticker_mentions_window(self, start_time: datetime, end_time: datetime,
+                                   max_symbols: int = 100) -> List[Dict[str, Any]]:
+        """Get per-symbol totals from the hourly ticker rollup, most mentioned first"""
+
+    @abstractmethod
+    def rebuild_ticker_mentions_hourly(self) -> None:
+        """Regenerate the hourly ticker rollup from the per-content mentions"""
+
+class Database(StorageBackend):
+    """Storage backend on Supabase, reached through PostgREST"""
+    def __init__(self, client=None):
         self.supabase_url = os.getenv("SUPABASE_URL")
         self.supabase_key = os.getenv("SUPABASE_KEY")
         
-        if not self.supabase_url or not self.supabase_key:
-            raise ValueError("Missing Supabase credentials")
-            
-        self.supabase = create_client(self.supabase_url, self.supabase_key)
+        # Share the process-wide client unless one is passed in
+        self.supabase = client if client is not None else get_supabase_client()
         
     def store_post(self, post_data: Dict[str, Any]) -> None:
         """Store a Reddit post in the database"""
@@ -30,19 +588,88 @@ class Database:
             print(f"Error storing comment: {str(e)}")
             raise
             
+    def _write_chunk(self, table: str, rows: List[Dict[str, Any]], upsert: bool) -> None:
+        """Write one chunk of rows in a single request"""
+        query = self.supabase.table(table)
+        if not upsert:
+            query.insert(rows).execute()
+        elif table in UPSERT_KEYS:
+            query.upsert(rows, on_conflict=','.join(UPSERT_KEYS[table])).execute()
+        else:
+            query.upsert(rows).execute()
+
+    def _update_chunk(self, table: str, updates: List[Dict[str, Any]]) -> None:
+        """Apply one chunk of partial updates in a single request"""
+        # An upsert of partial rows would trip the NOT NULL columns, so a function applies them
+        self.supabase.rpc(f'update_{table}_partial', {"updates": updates}).execute()
+
+    def update_post(self, post_id: str, fields: Dict[str, Any]) -> None:
+        """Update only the given fields of a stored Reddit post"""
+        try:
+            self.supabase.table('posts').update(fields).eq('id', post_id).execute()
+        except Exception as e:
+            print(f"Error updating post: {str(e)}")
+            raise
+
+    def update_comment(self, comment_id: str, fields: Dict[str, Any]) -> None:
+        """Update only the given fields of a stored Reddit comment"""
+        try:
+            self.supabase.table('comments').update(fields).eq('id', comment_id).execute()
+        except Exception as e:
+            print(f"Error updating comment: {str(e)}")
+            raise
+            
     def store_sentiment(self, sentiment_data: Dict[str, Any]) -> None:
-        """Store sentiment analysis results"""
+        """Store sentiment analysis results, replacing any earlier result for the same content"""
         try:
-            self.supabase.table('sentiments').upsert(sentiment_data).execute()
+            self.supabase.table('sentiments').upsert(sentiment_data, on_conflict=','.join(SENTIMENT_KEY)).execute()
         except Exception as e:
             print(f"Error storing sentiment: {str(e)}")
             raise
             
-    def get_posts_by_subreddit(self, subreddit: str, limit: int = 100) -> List[Dict[str, Any]]:
+    def get_collection_cursor(self, subreddit: str, listing: str) -> Optional[Dict[str, Any]]:
+        """Get the incremental collection high-water mark for a subreddit listing"""
+        try:
+            response = self.supabase.table('collection_cursors')\
+                .select('*')\
+                .eq('subreddit', subreddit)\
+                .eq('listing', listing)\
+                .limit(1)\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error getting collection cursor: {str(e)}")
+            raise
+
+    def store_collection_cursor(self, cursor_data: Dict[str, Any]) -> None:
+        """Store the incremental collection high-water mark for a subreddit listing"""
+        try:
+            self.supabase.table('collection_cursors').upsert({
+                **cursor_data,
+                "updated_at": datetime.utcnow().isoformat()
+            }).execute()
+        except Exception as e:
+            print(f"Error storing collection cursor: {str(e)}")
+            raise
+            
+    def get_post(self, post_id: str, columns: Columns = '*') -> Optional[Dict[str, Any]]:
+        """Get a single post by id"""
+        try:
+            response = self.supabase.table('posts')\
+                .select(select_clause(columns))\
+                .eq('id', post_id)\
+                .limit(1)\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error getting post: {str(e)}")
+            raise
+
+    def get_posts_by_subreddit(self, subreddit: str, limit: int = 100, columns: Columns = '*') -> List[Dict[str, Any]]:
         """Get posts from a specific subreddit"""
         try:
             response = self.supabase.table('posts')\
-                .select('*')\
+                .select(select_clause(columns))\
                 .eq('subreddit', subreddit)\
                 .order('created_utc', desc=True)\
                 .limit(limit)\
@@ -52,11 +679,11 @@ class Database:
             print(f"Error getting posts: {str(e)}")
             raise
             
-    def get_comments_by_post(self, post_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+    def get_comments_by_post(self, post_id: str, limit: int = 100, columns: Columns = '*') -> List[Dict[str, Any]]:
         """Get comments for a specific post"""
         try:
             response = self.supabase.table('comments')\
-                .select('*')\
+                .select(select_clause(columns))\
                 .eq('post_id', post_id)\
                 .order('created_utc', desc=True)\
                 .limit(limit)\
@@ -66,31 +693,66 @@ class Database:
             print(f"Error getting comments: {str(e)}")
             raise
             
-    def get_posts_by_time_range(self, start_time: datetime, end_time: datetime, page: int = 1, page_size: int = 50) -> List[Dict[str, Any]]:
+    def get_posts_by_time_range(self, start_time: datetime, end_time: datetime, page: int = 1, page_size: int = 50,
+                                columns: Columns = '*') -> List[Dict[str, Any]]:
         """Get posts within a time range with pagination"""
         try:
             start = (page - 1) * page_size
-            response = self.supabase.table('posts').select('*').gte('created_utc', start_time.isoformat()).lte('created_utc', end_time.isoformat()).order('created_utc', desc=True).range(start, start + page_size - 1).execute()
+            response = self.supabase.table('posts').select(select_clause(columns)).gte('created_utc', start_time.isoformat()).lte('created_utc', end_time.isoformat()).order('created_utc', desc=True).range(start, start + page_size - 1).execute()
             return response.data
         except Exception as e:
             print(f"Error getting posts by time range: {e}")
             return []
             
-    def get_comments_by_time_range(self, start_time: datetime, end_time: datetime, page: int = 1, page_size: int = 50) -> List[Dict[str, Any]]:
+    def get_comments_by_time_range(self, start_time: datetime, end_time: datetime, page: int = 1, page_size: int = 50,
+                                     columns: Columns = '*') -> List[Dict[str, Any]]:
         """Get comments within a time range with pagination"""
         try:
             start = (page - 1) * page_size
-            response = self.supabase.table('comments').select('*').gte('created_utc', start_time.isoformat()).lte('created_utc', end_time.isoformat()).order('created_utc', desc=True).range(start, start + page_size - 1).execute()
+            response = self.supabase.table('comments').select(select_clause(columns)).gte('created_utc', start_time.isoformat()).lte('created_utc', end_time.isoformat()).order('created_utc', desc=True).range(start, start + page_size - 1).execute()
             return response.data
         except Exception as e:
             print(f"Error getting comments by time range: {e}")
             return []
             
-    def get_sentiment_by_time_range(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+    def fetch_columns(self, table: str, ids: List[str], columns: Sequence[str]) -> List[Dict[str, Any]]:
+        """Read some columns, plus id, of the rows with the given ids"""
+        try:
+            response = self.supabase.table(table)\
+                .select(select_clause(columns, required=('id',)))\
+                .in_('id', ids)\
+                .execute()
+            return response.data
+        except Exception as e:
+            print(f"Error loading {', '.join(columns)} for {table}: {str(e)}")
+            raise
+
+    def _read_time_range_page(self, table: str, start_time: datetime, end_time: datetime, size: int,
+                              columns: Columns, boundary: Optional[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Read one keyset page of a time range, newest first"""
+        query = self.supabase.table(table)\
+            .select(select_clause(columns, required=('id', 'created_utc')))\
+            .gte('created_utc', start_time.isoformat())\
+            .lte('created_utc', end_time.isoformat())\
+            .limit(size)
+
+        # postgrest-py has no helpers for or= filters or multi-column ordering
+        query.params = query.params.add('order', 'created_utc.desc,id.desc')
+        if boundary:
+            created_utc, row_id = boundary
+            query.params = query.params.add(
+                'or',
+                f'(created_utc.lt."{created_utc}",and(created_utc.eq."{created_utc}",id.lt."{row_id}"))'
+            )
+
+        return query.execute().data
+            
+    def get_sentiment_by_time_range(self, start_time: datetime, end_time: datetime,
+                                    columns: Columns = '*') -> List[Dict[str, Any]]:
         """Get sentiment analysis results within a time range"""
         try:
             response = self.supabase.table('sentiments')\
-                .select('*')\
+                .select(select_clause(columns))\
                 .gte('created_at', start_time.isoformat())\
                 .lte('created_at', end_time.isoformat())\
                 .order('created_at', desc=True)\
@@ -100,61 +762,97 @@ class Database:
             print(f"Error getting sentiment by time range: {str(e)}")
             raise
 
-    def store_daily_analysis(self, date, stock_mentions, word_frequencies, fear_greed_index, 
-                            market_sentiment, trending_topics, risk_indicators):
+    def get_sentiment_by_text_hash(self, text_hash: str,
+                                   columns: Columns = SENTIMENT_RESULT_COLUMNS) -> Optional[Dict[str, Any]]:
+        """Get the latest stored sentiment result for a text hash"""
+        try:
+            response = self.supabase.table('sentiments')\
+                .select(select_clause(columns))\
+                .eq('text_hash', text_hash)\
+                .order('created_at', desc=True)\
+                .limit(1)\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error getting sentiment by text hash: {str(e)}")
+            raise
+
+    def get_sentiments_by_text_hashes(self, text_hashes: List[str],
+                                      columns: Columns = SENTIMENT_RESULT_COLUMNS) -> Dict[str, Dict[str, Any]]:
+        """Get a stored sentiment result for each of many text hashes, in requests of HASH_LOOKUP_SIZE"""
+        results: Dict[str, Dict[str, Any]] = {}
+        try:
+            for offset in range(0, len(text_hashes), HASH_LOOKUP_SIZE):
+                response = self.supabase.table('sentiments')\
+                    .select(select_clause(columns, required=('text_hash',)))\
+                    .in_('text_hash', text_hashes[offset:offset + HASH_LOOKUP_SIZE])\
+                    .order('created_at', desc=True)\
+                    .execute()
+                for row in response.data:
+                    results.setdefault(row['text_hash'], row)
+            return results
+        except Exception as e:
+            print(f"Error getting sentiments by text hash: {str(e)}")
+            raise
+
+    def _write_daily_analysis(self, row: Dict[str, Any]) -> None:
+        """Upsert the daily_market_analysis row for row['date']"""
+        self.supabase.table('daily_market_analysis').upsert(row, on_conflict='date').execute()
+
+    def _read_latest_market_analysis(self) -> Optional[Dict[str, Any]]:
+        """Read the daily_market_analysis row with the latest date"""
+        response = self.supabase.table('daily_market_analysis').select('*').order('date', desc=True).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def get_market_analysis_history(self, start_date, end_date=None,
+                                    columns: Columns = ('date', 'fear_greed_index')) -> List[Dict[str, Any]]:
         """
-        Store daily market analysis in the database
+        Get daily market analysis rows by date, oldest first, projected server-side
+        Columns may be JSON paths such as 'fear_greed_score:market_sentiment->fear_greed_score'.
         """
         try:
-            query = """
-            INSERT INTO daily_market_analysis 
-            (date, stock_mentions, word_frequencies, fear_greed_index, 
-             market_sentiment, trending_topics, risk_indicators)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (date) DO UPDATE SET
-                stock_mentions = EXCLUDED.stock_mentions,
-                word_frequencies = EXCLUDED.word_frequencies,
-                fear_greed_index = EXCLUDED.fear_greed_index,
-                market_sentiment = EXCLUDED.market_sentiment,
-                trending_topics = EXCLUDED.trending_topics,
-                risk_indicators = EXCLUDED.risk_indicators
-            """
-            
-            self.supabase.table('daily_market_analysis').upsert({
-                "date": date,
-                "stock_mentions": json.dumps(stock_mentions),
-                "word_frequencies": json.dumps(word_frequencies),
-                "fear_greed_index": fear_greed_index,
-                "market_sentiment": json.dumps(market_sentiment),
-                "trending_topics": json.dumps(trending_topics),
-                "risk_indicators": json.dumps(risk_indicators)
-            }).execute()
-            
+            query = self.supabase.table('daily_market_analysis')\
+                .select(select_clause(columns))\
+                .gte('date', start_date.isoformat())
+            if end_date is not None:
+                query = query.lte('date', end_date.isoformat())
+            response = query.order('date').execute()
+            return response.data
         except Exception as e:
-            print(f"Error storing daily analysis: {str(e)}")
+            print(f"Error getting market analysis history: {str(e)}")
             raise
 
-    def get_latest_market_analysis(self):
+    def replace_ticker_mentions(self, contents: List[Dict[str, Any]]) -> None:
         """
-        Get the most recent market analysis
+        Replace the ticker mentions of a batch of posts/comments in one request
+        The hourly rollup is adjusted by a trigger, so repeats never double count.
         """
+        if not contents:
+            return
         try:
-            response = self.supabase.table('daily_market_analysis').select('*').order('date', desc=True).limit(1).execute()
-            result = response.data[0] if response.data else None
-            
-            if result:
-                return {
-                    "date": result['date'],
-                    "stock_mentions": json.loads(result['stock_mentions']),
-                    "word_frequencies": json.loads(result['word_frequencies']),
-                    "fear_greed_index": result['fear_greed_index'],
-                    "market_sentiment": json.loads(result['market_sentiment']),
-                    "trending_topics": json.loads(result['trending_topics']),
-                    "risk_indicators": json.loads(result['risk_indicators']),
-                    "created_at": result['created_at']
-                }
-            return None
-            
+            self.supabase.rpc('replace_ticker_mentions', {"contents": contents}).execute()
         except Exception as e:
-            print(f"Error getting latest market analysis: {str(e)}")
-            raise 
\ No newline at end of file
+            print(f"Error storing ticker mentions: {str(e)}")
+            raise
+
+    def get_ticker_mentions_window(self, start_time: datetime, end_time: datetime,
+                                   max_symbols: int = 100) -> List[Dict[str, Any]]:
+        """Get per-symbol totals from the hourly ticker rollup, most mentioned first"""
+        try:
+            response = self.supabase.rpc('ticker_mentions_window', {
+                "start_hour": start_time.replace(minute=0, second=0, microsecond=0).isoformat(),
+                "end_hour": end_time.isoformat(),
+                "max_symbols": max_symbols
+            }).execute()
+            return response.data
+        except Exception as e:
+            print(f"Error getting ticker mentions: {str(e)}")
+            raise
+
+    def rebuild_ticker_mentions_hourly(self) -> None:
+        """Regenerate the hourly ticker rollup from the per-content mentions"""
+        try:
+            self.supabase.rpc('rebuild_ticker_mentions_hourly', {}).execute()
+        except Exception as e:
+            print(f"Error rebuilding ticker rollup: {str(e)}")
+            raise
\ No newline at end of file
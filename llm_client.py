@@ -0,0 +1,220 @@
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from functools import partial
+from typing import Dict, List, Any, Optional, Callable, Iterable, TypeVar
+import asyncio
+import random
+import threading
+import time
+
+DEFAULT_API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEFAULT_MODEL = "deepseek-chat"
+
+# Requests in flight at once per process, across sync and async callers
+DEFAULT_MAX_CONCURRENCY = 8
+# Seconds a single HTTP attempt may take
+DEFAULT_TIMEOUT = 60.0
+# Attempts after the first for throttled, failed or unreachable requests
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+class LLMError(Exception):
+    """A chat completion request that failed, with the last HTTP status if there was one"""
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class LLMTimeout(LLMError):
+    """A chat completion request that did not finish before its deadline"""
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class LLMClient:
+    """
+    Shared client for DeepSeek chat completions
+
+    Holds one keep-alive connection pool, so calls reuse TLS connections, and
+    lets at most max_concurrency requests run at once however many threads or
+    coroutines call it. Every call has a per-attempt timeout and may carry a
+    deadline (a time.monotonic() value) that bounds the whole call, retries
+    included. Throttled (429) and 5xx responses, timeouts and connection errors
+    are retried with exponential backoff, waiting at least as long as the
+    Retry-After header asks. The async API runs calls on a bounded thread pool.
+    """
+    def __init__(self, api_key: Optional[str] = None, api_url: Optional[str] = None,
+                 model: str = DEFAULT_MODEL, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF):
+        self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
+        if not self.api_key:
+            raise ValueError("Missing DeepSeek API key")
+
+        self.api_url = api_url or os.getenv("DEEPSEEK_API_URL") or DEFAULT_API_URL
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self.worker = threading.local()
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0, "timeouts": 0}
+
+    def _count(self, stat: str) -> None:
+        with self.stats_lock:
+            self.stats[stat] += 1
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        """Seconds left before a deadline, raising once it has passed"""
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("timeouts")
+            raise LLMTimeout("DeepSeek API request timed out")
+        return remaining
+
+    def _post(self, payload: Dict[str, Any], timeout: float, deadline: Optional[float]) -> Dict[str, Any]:
+        """POST one request, retrying transient failures until the deadline"""
+        for attempt in range(self.max_retries + 1):
+            remaining = self._remaining(deadline)
+            wait = None
+            status = None
+
+            # A slot is held only while the request is on the wire, not while backing off
+            if not self.slots.acquire(timeout=remaining):
+                self._count("timeouts")
+                raise LLMTimeout("DeepSeek API request timed out waiting for a connection")
+            try:
+                self._count("requests")
+                attempt_timeout = timeout if remaining is None else min(timeout, remaining)
+                response = self.session.post(self.api_url, json=payload, timeout=attempt_timeout)
+                status = response.status_code
+                if status == 200:
+                    return response.json()
+                if status not in RETRY_STATUSES:
+                    self._count("failures")
+                    raise LLMError(f"API request failed: {response.text}", status)
+                if status == 429:
+                    self._count("throttled")
+                wait = retry_after_seconds(response.headers.get("Retry-After"))
+                error = LLMError(f"API request failed: {response.text}", status)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                error = LLMError(f"API request failed: {str(e)}")
+            finally:
+                self.slots.release()
+
+            if attempt == self.max_retries:
+                break
+            # Exponential backoff with jitter, unless the server said how long to wait
+            if wait is None:
+                wait = min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            remaining = self._remaining(deadline)
+            if remaining is not None and wait >= remaining:
+                self._count("timeouts")
+                raise LLMTimeout(f"DeepSeek API request timed out: {str(error)}")
+            self._count("retries")
+            time.sleep(wait)
+
+        self._count("failures")
+        raise error
+
+    def chat(self, prompt: str, model: Optional[str] = None, timeout: Optional[float] = None,
+             deadline: Optional[float] = None, **options) -> str:
+        """
+        Send a single-message chat completion and return the reply text
+        options are passed through in the request body, e.g. temperature or response_format.
+        """
+        payload = {
+            "model": model or self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            **options
+        }
+        result = self._post(payload, timeout or self.timeout, deadline)
+        return result['choices'][0]['message']['content']
+
+    def map(self, function: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """Run function over items on the client's thread pool, returning results in order"""
+        if getattr(self.worker, "active", False):
+            # Already on the pool: waiting on it from here could leave no free workers
+            return [function(item) for item in items]
+
+        def run(item: T) -> R:
+            self.worker.active = True
+            try:
+                return function(item)
+            finally:
+                self.worker.active = False
+
+        return list(self.executor.map(run, items))
+
+    async def achat(self, prompt: str, model: Optional[str] = None, timeout: Optional[float] = None,
+                    deadline: Optional[float] = None, **options) -> str:
+        """chat() for asyncio callers; the request runs on the client's thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(self.chat, prompt, model, timeout, deadline, **options)
+        )
+
+    async def achat_many(self, prompts: List[str], deadline: Optional[float] = None,
+                         **options) -> List[Any]:
+        """
+        Send many prompts concurrently, at most max_concurrency at a time
+        Returns the reply text, or the exception raised, for each prompt in order.
+        """
+        return await asyncio.gather(
+            *(self.achat(prompt, deadline=deadline, **options) for prompt in prompts),
+            return_exceptions=True
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requests sent, retries, throttled responses, failures and timeouts"""
+        with self.stats_lock:
+            return {**self.stats, "max_concurrency": self.max_concurrency}
+
+# One client per process, so every analyzer shares its connection pool and concurrency limit
+_shared_client: Optional[LLMClient] = None
+_shared_lock = threading.Lock()
+
+def get_llm_client() -> LLMClient:
+    """Return the process-wide LLM client, creating it on first use"""
+    global _shared_client
+
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient(
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+            )
+
+    return _shared_client
@@ -1,11 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from reddit_collector import RedditCollector
-from database import Database
+from reddit_collector import RedditCollector, DEFAULT_MAX_EXPANSIONS
+from database import acquire_database, get_database, POST_TEXT_COLUMNS, COMMENT_TEXT_COLUMNS
 from sentiment_analyzer import SentimentAnalyzer
+from sentiment_cascade import SentimentCascade
 from market_analyzer import MarketAnalyzer
-from typing import Dict, List, Any
+from change_detector import ChangeDetector
+from market_responses import trends_response, sentiment_response
+from ticker_rollup import TickerRollup
+from write_behind import WriteBehindWriter
+from typing import Dict, List, Any, Optional, Callable, Literal, Tuple
 from datetime import datetime, timedelta
+import threading
 import time
 
 app = FastAPI(
@@ -24,14 +31,67 @@ app.add_middleware(
 )
 
 # Initialize components
-reddit_collector = RedditCollector()
-database = Database()
-sentiment_analyzer = SentimentAnalyzer()
+database = get_database()
+reddit_collector = RedditCollector(database)
+sentiment_analyzer = SentimentAnalyzer(database)
+# Local lexicon first; only uncertain or ticker-bearing texts reach DeepSeek
+sentiment_cascade = SentimentCascade(sentiment_analyzer)
 market_analyzer = MarketAnalyzer()
+change_detector = ChangeDetector()
+ticker_rollup = TickerRollup(database, market_analyzer.ticker_extractor)
 
-# Cache for market trends
-market_trends_cache = {}
-CACHE_DURATION = 300  # 5 minutes in seconds
+# Ingestion endpoints hand what they collect to the writer and respond without
+# waiting for the database; only new or changed records are written
+writer = WriteBehindWriter(database, change_detector=change_detector, ticker_rollup=ticker_rollup)
+writer.start()
+
+@app.middleware("http")
+async def report_process_state(request, call_next):
+    # "first-request" for the first request this process serves with the shared client, "reused" afterwards
+    _, process_state = acquire_database()
+    response = await call_next(request)
+    response.headers["X-Process-State"] = process_state
+    return response
+
+@app.on_event("shutdown")
+def flush_writes():
+    writer.close()
+
+# Upper bound on posts and on comments read for a single on-demand analysis
+ANALYSIS_ROW_LIMIT = 5000
+# Seconds a client is asked to wait before retrying when the write buffer is full
+WRITE_BUFFER_RETRY_AFTER = 2
+
+def queue_writes(kind: str, records: List[Dict[str, Any]], on_written: Optional[Callable[[], None]] = None) -> None:
+    """
+    Hand records to the writer without waiting for room in its buffer
+    Handlers run on the event loop, so a full buffer is reported as 503 instead of blocking it.
+    """
+    dropped = writer.submit(kind, records, timeout=0, on_written=on_written)
+    if dropped:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Write buffer full, {dropped} of {len(records)} {kind} were not stored",
+            headers={"Retry-After": str(WRITE_BUFFER_RETRY_AFTER)}
+        )
+
+# Collections run in worker threads; incremental ones stage their cursors on the
+# shared collector, so they take turns and each hands over only its own cursors
+incremental_collection = threading.Lock()
+
+def collect_with_cursors(collect: Callable[[], Any], incremental: bool) -> Tuple[Any, Dict[str, Dict[str, Any]]]:
+    """
+    Run a post collection, blocking on the Reddit rate budget, and take the cursors it advanced
+    Called through run_in_threadpool so a drained budget does not stall the event loop.
+    """
+    if not incremental:
+        return collect(), {}
+    with incremental_collection:
+        try:
+            return collect(), reddit_collector.take_cursors()
+        except Exception:
+            reddit_collector.discard_cursors()
+            raise
 
 @app.get("/")
 async def root():
@@ -53,50 +113,77 @@ async def health_check():
         }
     }
 
+@app.get("/ingest/stats")
+async def get_ingest_stats():
+    return {
+        "dedup": change_detector.get_stats(),
+        "writer": writer.get_stats(),
+        "sentiment_cache": sentiment_analyzer.get_cache_stats(),
+        "sentiment_cascade": sentiment_cascade.get_stats()
+    }
+
 @app.get("/reddit/posts/{subreddit}")
-async def get_subreddit_posts(subreddit: str, limit: int = 100):
+async def get_subreddit_posts(subreddit: str, limit: int = 100, incremental: bool = False):
     try:
         # Get posts from Reddit
-        posts = reddit_collector.collect_posts(subreddit, limit)
+        collect = reddit_collector.collect_new_posts if incremental else reddit_collector.collect_posts
+        posts, cursors = await run_in_threadpool(collect_with_cursors, lambda: collect(subreddit, limit), incremental)
         
-        # Store posts in database
-        for post in posts:
-            database.store_post(post)
+        # Queue the posts for writing; the cursors only advance once they are all stored
+        queue_writes("posts", posts, on_written=lambda: reddit_collector.commit_cursors(cursors))
             
         return {
             "subreddit": subreddit,
             "posts": posts
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/reddit/posts")
-async def get_all_posts(limit: int = 100):
+async def get_all_posts(response: Response, limit: int = 100, incremental: bool = False):
     try:
-        all_posts = reddit_collector.collect_all_subreddits(limit)
+        def collect():
+            all_posts = reddit_collector.collect_all_subreddits(limit, incremental=incremental)
+            return all_posts, dict(reddit_collector.fetch_times)
+        (all_posts, fetch_times), cursors = await run_in_threadpool(collect_with_cursors, collect, incremental)
         
-        # Store posts in database
-        for subreddit_posts in all_posts.values():
-            for post in subreddit_posts:
-                database.store_post(post)
+        # Report per-subreddit fetch times without changing the response body
+        response.headers["Server-Timing"] = ", ".join(
+            f"{subreddit};dur={seconds * 1000:.1f}"
+            for subreddit, seconds in fetch_times.items()
+        )
+        
+        # Queue the posts for writing; the cursors only advance once they are all stored
+        queue_writes("posts", [post for posts in all_posts.values() for post in posts],
+                     on_written=lambda: reddit_collector.commit_cursors(cursors))
                 
         return all_posts
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/reddit/comments/{post_id}")
-async def get_post_comments(post_id: str, limit: int = 100):
+async def get_post_comments(post_id: str, limit: int = 100, order: Literal["breadth", "score"] = "breadth",
+                            max_expansions: int = DEFAULT_MAX_EXPANSIONS, max_depth: Optional[int] = None):
     try:
-        comments = reddit_collector.get_post_comments(post_id, limit)
+        # Expanding the comment tree waits on the rate budget; run it off the event loop
+        comments = await run_in_threadpool(
+            reddit_collector.get_post_comments,
+            post_id, limit, order=order, max_expansions=max_expansions, max_depth=max_depth
+        )
         
-        # Store comments in database
-        for comment in comments:
-            database.store_comment(comment)
+        # Queue the comments for writing; each carries its subreddit for the rollup
+        queue_writes("comments", comments)
             
         return {
             "post_id": post_id,
             "comments": comments
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -111,7 +198,7 @@ async def analyze_post(post_id: str):
         post = posts[0]
         
         # Analyze sentiment
-        sentiment_data = sentiment_analyzer.analyze_post(post)
+        sentiment_data = sentiment_cascade.analyze_post(post)
         
         # Store sentiment analysis
         database.store_sentiment(sentiment_data)
@@ -131,7 +218,7 @@ async def analyze_comment(comment_id: str):
         comment = comments[0]
         
         # Analyze sentiment
-        sentiment_data = sentiment_analyzer.analyze_comment(comment)
+        sentiment_data = sentiment_cascade.analyze_comment(comment)
         
         # Store sentiment analysis
         database.store_sentiment(sentiment_data)
@@ -143,27 +230,16 @@ async def analyze_comment(comment_id: str):
 @app.get("/market/trends")
 async def get_market_trends():
     try:
-        # Get the latest pre-processed analysis
-        analysis = database.get_latest_market_analysis()
+        # Serve the latest pre-processed analysis, pre-serialised while it is cached
+        body = database.get_market_analysis_response("trends", trends_response)
         
-        if not analysis:
+        if body is None:
             raise HTTPException(
                 status_code=404,
                 detail="No market analysis available. Please try again later."
             )
             
-        return {
-            "data": {
-                "stock_mentions": analysis["stock_mentions"],
-                "word_frequencies": analysis["word_frequencies"],
-                "fear_greed_index": analysis["fear_greed_index"],
-                "market_sentiment": analysis["market_sentiment"],
-                "trending_topics": analysis["trending_topics"],
-                "risk_indicators": analysis["risk_indicators"]
-            },
-            "date": analysis["date"],
-            "last_updated": analysis["created_at"]
-        }
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -174,14 +250,20 @@ async def get_wordcloud(hours: int = 24):
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=hours)
         
-        posts = database.get_posts_by_time_range(start_time, end_time)
-        comments = database.get_comments_by_time_range(start_time, end_time)
+        posts = database.iter_posts_by_time_range(
+            start_time, end_time, max_rows=ANALYSIS_ROW_LIMIT, columns=POST_TEXT_COLUMNS
+        )
+        comments = database.iter_comments_by_time_range(
+            start_time, end_time, max_rows=ANALYSIS_ROW_LIMIT, columns=COMMENT_TEXT_COLUMNS
+        )
         
-        # Analyze market trends
-        analysis = market_analyzer.analyze_market_trends(posts, comments)
+        # Count words as the pages stream in; the word cloud needs no LLM analysis
+        analysis = market_analyzer.analyze_wordcloud(posts, comments)
         
         return {
             "word_frequencies": analysis["word_frequencies"],
+            # The most any frequency overstates its true count, 0 when they are exact
+            "error_bound": analysis["word_error_bound"],
             "timestamp": analysis["timestamp"]
         }
     except Exception as e:
@@ -190,20 +272,24 @@ async def get_wordcloud(hours: int = 24):
 @app.get("/market/stocks")
 async def get_trending_stocks(hours: int = 24):
     try:
-        # Get posts and comments from the last N hours
+        # Sum the hourly ticker rollup over the last N hours (whole hours)
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=hours)
         
-        posts = database.get_posts_by_time_range(start_time, end_time)
-        comments = database.get_comments_by_time_range(start_time, end_time)
-        
-        # Analyze market trends
-        analysis = market_analyzer.analyze_market_trends(posts, comments)
+        rows = database.get_ticker_mentions_window(start_time, end_time)
         
         return {
-            "trending_stocks": analysis["stock_mentions"],
-            "sentiment_analysis": analysis["batch_analysis"]["stocks"],
-            "timestamp": analysis["timestamp"]
+            "trending_stocks": [(row["symbol"], row["mention_count"]) for row in rows],
+            "sentiment_analysis": [
+                {
+                    "symbol": row["symbol"],
+                    "sentiment_score": row["sentiment_sum"] / row["content_count"] if row["content_count"] else 0.0,
+                    "mention_count": row["mention_count"],
+                    "score": row["score_sum"]
+                }
+                for row in rows
+            ],
+            "timestamp": end_time.isoformat()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -211,21 +297,36 @@ async def get_trending_stocks(hours: int = 24):
 @app.get("/market/sentiment")
 async def get_market_sentiment():
     try:
-        # Get the latest pre-processed analysis
-        analysis = database.get_latest_market_analysis()
+        # Serve the latest pre-processed analysis, pre-serialised while it is cached
+        body = database.get_market_analysis_response("sentiment", sentiment_response)
         
-        if not analysis:
+        if body is None:
             raise HTTPException(
                 status_code=404,
                 detail="No market analysis available. Please try again later."
             )
             
+        return Response(content=body, media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/market/history")
+async def get_market_history(days: int = 30):
+    try:
+        # Only the requested fields leave the database, not the whole analysis documents
+        start_date = (datetime.utcnow() - timedelta(days=days)).date()
+        history = database.get_market_analysis_history(
+            start_date,
+            columns=(
+                "date",
+                "fear_greed_index",
+                "fear_greed_score:market_sentiment->fear_greed_score",
+                "volatility_score:risk_indicators->volatility_score"
+            )
+        )
+        
         return {
-            "fear_greed_index": analysis["fear_greed_index"],
-            "market_sentiment": analysis["market_sentiment"],
-            "risk_indicators": analysis["risk_indicators"],
-            "date": analysis["date"],
-            "last_updated": analysis["created_at"]
+            "history": history
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -237,11 +338,15 @@ async def get_market_news(hours: int = 24):
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=hours)
         
-        posts = database.get_posts_by_time_range(start_time, end_time)
-        comments = database.get_comments_by_time_range(start_time, end_time)
+        posts = database.iter_posts_by_time_range(
+            start_time, end_time, max_rows=ANALYSIS_ROW_LIMIT, columns=POST_TEXT_COLUMNS
+        )
+        comments = database.iter_comments_by_time_range(
+            start_time, end_time, max_rows=ANALYSIS_ROW_LIMIT, columns=COMMENT_TEXT_COLUMNS
+        )
         
-        # Analyze market trends
-        analysis = market_analyzer.analyze_market_trends(posts, comments)
+        # Reading the rows and the LLM requests take seconds; run them off the event loop
+        analysis = await run_in_threadpool(market_analyzer.analyze_market_trends, posts, comments)
         
         return {
             "news": analysis["batch_analysis"]["news"],
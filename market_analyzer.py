@@ -1,54 +1,149 @@
-import os
-import requests
-from typing import Dict, List, Any, Tuple
+from llm_client import LLMClient, get_llm_client
+from sentiment_analyzer import normalize_text, pack_batches
+from ticker_extractor import TickerExtractor, get_ticker_extractor
+from aggregation import MarketAggregate, AnalysisPool, MEASURES, content_text, content_sentiments
+from word_counter import SpaceSaving, word_tokens, frequency_entries
+from typing import Dict, List, Any, Tuple, Optional, Iterable, Iterator, Union
 import json
 from datetime import datetime, timedelta
-import re
 from collections import Counter
-from textblob import TextBlob
+from itertools import chain
 import pandas as pd
 import numpy as np
 
-class MarketAnalyzer:
-    def __init__(self):
-        self.api_key = os.getenv("DEEPSEEK_API_KEY")
-        if not self.api_key:
-            raise ValueError("Missing DeepSeek API key")
-            
-        self.api_url = "https://api.deepseek.com/v1/chat/completions"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
+# Estimated content tokens per batch analysis request; content beyond one
+# chunk is analyzed chunk by chunk and the results merged
+CHUNK_TOKEN_BUDGET = 6000
+# Chunk requests per batch analysis; beyond this an evenly spaced sample of
+# the chunks is analyzed, so request count and cost stay bounded
+MAX_ANALYSIS_CHUNKS = 16
+# Entries of each list kept after merging
+MAX_MERGED_STOCKS = 50
+MAX_MERGED_NEWS = 30
+MAX_MERGED_TOPICS = 30
+
+def _number(value: Any) -> Optional[float]:
+    """A numeric field from an LLM reply, or None if it is missing or not a number"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _weighted(pairs: List[Tuple[Any, float]]) -> Optional[float]:
+    """Weighted mean of the numeric values among (value, weight) pairs"""
+    pairs = [(_number(value), weight) for value, weight in pairs]
+    pairs = [(value, weight) for value, weight in pairs if value is not None and weight > 0]
+    total = sum(weight for _, weight in pairs)
+    if not total:
+        return None
+    return sum(value * weight for value, weight in pairs) / total
+
+def _merge_counted(analyses: List[Tuple[Dict[str, Any], int]], field: str, key_field: str,
+                   count_field: str, limit: int, key=lambda value: value) -> List[Dict[str, Any]]:
+    """
+    Merge a list field whose entries carry a count: counts are summed per key and
+    sentiment is averaged weighted by count. Ordered by count, then key.
+    """
+    merged: Dict[Any, Dict[str, Any]] = {}
+    sentiments: Dict[Any, List[Tuple[Any, float]]] = {}
+    for analysis, _ in analyses:
+        for entry in analysis.get(field) or []:
+            if not isinstance(entry, dict) or not entry.get(key_field):
+                continue
+            entry_key = key(str(entry[key_field]))
+            count = _number(entry.get(count_field))
+            count = count if count is not None and count > 0 else 1
+            if entry_key not in merged:
+                merged[entry_key] = {**entry, key_field: entry_key, count_field: 0}
+                sentiments[entry_key] = []
+            merged[entry_key][count_field] += count
+            sentiments[entry_key].append((entry.get("sentiment_score", entry.get("sentiment")), count))
+
+    for entry_key, entry in merged.items():
+        sentiment = _weighted(sentiments[entry_key])
+        sentiment_field = "sentiment_score" if "sentiment_score" in entry else "sentiment"
+        if sentiment is not None:
+            entry[sentiment_field] = sentiment
+        if float(entry[count_field]).is_integer():
+            entry[count_field] = int(entry[count_field])
+
+    ordered = sorted(merged.values(), key=lambda entry: (-entry[count_field], entry[key_field]))
+    return ordered[:limit]
+
+def merge_chunk_analyses(analyses: List[Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+    """
+    Combine per-chunk batch analyses into one, given each with its chunk's content count
+
+    Stock mention counts and topic frequencies are summed and their sentiment
+    averaged weighted by those counts. News is de-duplicated by title, first
+    seen first. Chunk-level scores (fear/greed, confidence, volatility) are
+    averaged weighted by how much content each chunk held. The result depends
+    only on the chunk results and their order.
+    """
+    news, seen = [], set()
+    for analysis, _ in analyses:
+        for item in analysis.get("news") or []:
+            if not isinstance(item, dict) or not item.get("title"):
+                continue
+            title = normalize_text(str(item["title"])).lower()
+            if title not in seen:
+                seen.add(title)
+                news.append(item)
+
+    sentiments = [(analysis.get("market_sentiment") or {}, weight) for analysis, weight in analyses]
+    risks = [(analysis.get("risk_indicators") or {}, weight) for analysis, weight in analyses]
+
+    # Contrarian signals come back as lists, scores or text depending on the chunk
+    signals = [risk.get("contrarian_signals") for risk, _ in risks if risk.get("contrarian_signals") is not None]
+    if signals and all(_number(signal) is not None for signal in signals):
+        contrarian_signals = _weighted([(risk.get("contrarian_signals"), weight) for risk, weight in risks])
+    else:
+        contrarian_signals = []
+        for signal in signals:
+            for item in signal if isinstance(signal, list) else [signal]:
+                if item not in contrarian_signals:
+                    contrarian_signals.append(item)
+
+    return {
+        "stocks": _merge_counted(analyses, "stocks", "symbol", "mention_count", MAX_MERGED_STOCKS,
+                                 key=lambda symbol: symbol.strip().lstrip('$').upper()),
+        "news": news[:MAX_MERGED_NEWS],
+        "market_sentiment": {
+            "fear_greed_score": _weighted([(sentiment.get("fear_greed_score"), weight) for sentiment, weight in sentiments]),
+            "confidence": _weighted([(sentiment.get("confidence"), weight) for sentiment, weight in sentiments])
+        },
+        "trending_topics": _merge_counted(analyses, "trending_topics", "topic", "frequency", MAX_MERGED_TOPICS,
+                                          key=lambda topic: normalize_text(topic).lower()),
+        "risk_indicators": {
+            "volatility_score": _weighted([(risk.get("volatility_score"), weight) for risk, weight in risks]),
+            "contrarian_signals": contrarian_signals
         }
+    }
+
+class MarketAnalyzer:
+    def __init__(self, llm_client: Optional[LLMClient] = None,
+                 ticker_extractor: Optional[TickerExtractor] = None, pool: Optional[AnalysisPool] = None):
+        # The process-wide client shares its connections and concurrency limit with SentimentAnalyzer
+        self.llm = llm_client or get_llm_client()
         
-        # Stock symbol patterns
-        self.stock_patterns = [
-            r'\$[A-Z]{1,5}',  # $AAPL
-            r'[A-Z]{1,5}',    # AAPL
-            r'[A-Za-z]+ Inc\.',  # Apple Inc.
-            r'[A-Za-z]+ Corp\.'  # Microsoft Corp.
-        ]
+        # Known symbols and company names, loaded once per process
+        self.ticker_extractor = ticker_extractor or get_ticker_extractor()
         
-    def batch_analyze_content(self, contents: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """
-        Analyze a batch of posts/comments for comprehensive market insights
-        """
-        try:
-            # Combine all text for analysis
-            combined_text = " ".join([
-                f"{content.get('title', '')} {content.get('text', '')}"
-                for content in contents
-            ])
-            
-            # Prepare the prompt for comprehensive analysis
-            prompt = f"""Analyze this market-related content and provide:
+        # With a pool, the counting and sentiment scoring run in worker processes
+        self.pool = pool
+        
+    def _analysis_prompt(self, content: str) -> str:
+        """Prompt for a comprehensive analysis of some market-related content"""
+        return f"""Analyze this market-related content and provide:
 1. List of mentioned stocks with their sentiment scores
 2. Key news and updates
 3. Market sentiment indicators (fear/greed)
 4. Trending topics and themes
 5. Risk indicators
 
-Content: {combined_text}
+Content: {content}
 
 Respond in JSON format with these fields:
 - stocks: List of dicts with symbol, sentiment_score, mention_count
@@ -57,26 +152,75 @@ Respond in JSON format with these fields:
 - trending_topics: List of dicts with topic, frequency, sentiment
 - risk_indicators: Dict with volatility_score, contrarian_signals"""
 
-            # Make the API request
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json={
-                    "model": "deepseek-chat",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.3
-                }
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"API request failed: {response.text}")
-                
-            # Parse the response
-            result = response.json()
-            content = result['choices'][0]['message']['content']
-            analysis = json.loads(content)
-            
-            return analysis
+    def _analyze_chunk(self, texts: List[str]) -> Dict[str, Any]:
+        """Analyze one chunk of content texts in a single request"""
+        # Make the API request and parse the response
+        content = self.llm.chat(self._analysis_prompt(" ".join(texts)), temperature=0.3)
+        return json.loads(content)
+
+    def _reduce_with_llm(self, merged: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask the LLM to consolidate a merged analysis, e.g. topics or news that are the same story"""
+        prompt = f"""This market analysis was merged from analyses of separate chunks of content, so it may
+list the same topic, news story or stock under different names.
+
+Analysis: {json.dumps(merged)}
+
+Merge entries that refer to the same thing, adding up their mention_count or frequency and
+averaging their sentiment weighted by those counts. Keep every other value as it is.
+Respond in JSON format with the same fields: stocks, news, market_sentiment, trending_topics, risk_indicators"""
+        reduced = json.loads(self.llm.chat(prompt, temperature=0.0, response_format={"type": "json_object"}))
+        # A reply missing fields keeps the deterministic merge for them
+        return {field: reduced.get(field, value) for field, value in merged.items()}
+
+    def batch_analyze_content(self, contents: Iterable[Dict[str, Any]], chunk_token_budget: int = CHUNK_TOKEN_BUDGET,
+                              reduce_with_llm: bool = False, max_chunks: int = MAX_ANALYSIS_CHUNKS) -> Dict[str, Any]:
+        """
+        Analyze a batch of posts/comments for comprehensive market insights
+
+        Content that fits in chunk_token_budget estimated tokens is analyzed in
+        one request. More is split into chunks of that size, analyzed
+        concurrently, and the chunk results merged by merge_chunk_analyses().
+        At most max_chunks chunks are analyzed: with more, an evenly spaced
+        sample of them across the content, so mention counts and topic
+        frequencies then cover the sample only.
+        With reduce_with_llm a final request consolidates the merged result.
+        """
+        try:
+            # A single post longer than a chunk is cut to fit one
+            texts = [content_text(content)[:chunk_token_budget * 4] for content in contents]
+            chunks = [
+                [text for _, text in chunk]
+                for chunk in pack_batches(list(enumerate(texts)), chunk_token_budget, max(1, len(texts)))
+            ]
+            if len(chunks) <= 1:
+                return self._analyze_chunk(texts)
+            if len(chunks) > max_chunks:
+                step = len(chunks) / max_chunks
+                chunks = [chunks[int(index * step)] for index in range(max_chunks)]
+
+            def analyze(chunk: List[str]) -> Optional[Dict[str, Any]]:
+                try:
+                    return self._analyze_chunk(chunk)
+                except Exception as e:
+                    print(f"Error in batch analysis of a {len(chunk)}-item chunk: {str(e)}")
+                    return None
+
+            # Chunks run as many at once as the LLM client's concurrency limit allows
+            results = self.llm.map(analyze, chunks)
+            analyses = [
+                (analysis, len(chunk)) for analysis, chunk in zip(results, chunks) if isinstance(analysis, dict)
+            ]
+            if not analyses:
+                raise Exception(f"All {len(chunks)} chunks failed")
+
+            merged = merge_chunk_analyses(analyses)
+            if reduce_with_llm:
+                try:
+                    merged = self._reduce_with_llm(merged)
+                except Exception as e:
+                    # The deterministic merge is already a complete answer
+                    print(f"Error in batch analysis reduce: {str(e)}")
+            return merged
             
         except Exception as e:
             print(f"Error in batch analysis: {str(e)}")
@@ -87,139 +231,109 @@ Respond in JSON format with these fields:
         Extract stock symbols from text
         Returns: List of (symbol, count) tuples
         """
-        mentions = []
-        for pattern in self.stock_patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                symbol = match.group().strip('$').strip('.')
-                mentions.append(symbol)
-        
-        return Counter(mentions).most_common()
+        return self.ticker_extractor.extract(text).most_common()
         
     def generate_word_frequencies(self, text: str, max_words: int = 100) -> List[Dict[str, Any]]:
         """
         Generate word frequencies for word cloud generation
+        Links and stopwords are left out; cashtags and emoji count as words.
         Returns: List of dicts with word and frequency
         """
-        # Split text into words and count frequencies
-        words = text.lower().split()
-        word_counts = Counter(words)
+        words = SpaceSaving().update(Counter(word_tokens(text)))
+        return frequency_entries(words, max_words)
         
-        # Convert to list of dicts
-        return [
-            {"word": word, "frequency": count}
-            for word, count in word_counts.most_common(max_words)
-        ]
+    def sentiment_scores(self, contents: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Sentiment polarity of every post/comment body, scored as one batch
+        Returns: Array of scores between -1 and 1
+        """
+        return content_sentiments(contents)
         
-    def calculate_fear_greed_index(self, sentiment_scores: List[float]) -> float:
+    def calculate_fear_greed_index(self, sentiment_scores: Union[List[float], np.ndarray]) -> float:
         """
-        Calculate fear/greed index from sentiment scores
+        Calculate fear/greed index from sentiment scores, a list or an array
         Returns: Score between 0 (extreme fear) and 100 (extreme greed)
         """
-        if not sentiment_scores:
+        scores = np.asarray(sentiment_scores, dtype=float)
+        if not scores.size:
             return 50.0
             
         # Normalize sentiment scores to 0-100 range
-        normalized_scores = [(score + 1) * 50 for score in sentiment_scores]
-        return np.mean(normalized_scores)
+        return float(np.mean((scores + 1) * 50))
         
-    def analyze_market_trends(self, posts: List[Dict[str, Any]], 
-                            comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _aggregate(self, contents: Iterable[Dict[str, Any]], measures: Iterable[str] = MEASURES) -> MarketAggregate:
+        """Aggregate content serially, or across the pool if there is one; the results are identical"""
+        if self.pool is not None:
+            return self.pool.aggregate(contents, measures, self.ticker_extractor)
+        return MarketAggregate(self.ticker_extractor, measures).update(contents)
+        
+    def analyze_market_trends(self, posts: Iterable[Dict[str, Any]],
+                            comments: Iterable[Dict[str, Any]], max_chunks: int = MAX_ANALYSIS_CHUNKS) -> Dict[str, Any]:
         """
         Comprehensive market trend analysis
+        posts and comments may be iterators; each is read once. Counts and the
+        fear/greed index cover all of them; the LLM analysis at most max_chunks chunks.
         """
-        # Combine all content
-        all_content = posts + comments
-        text_content = " ".join([
-            f"{content.get('title', '')} {content.get('text', '')}"
-            for content in all_content
-        ])
-        
-        # Extract stock mentions
-        stock_mentions = self.extract_stock_mentions(text_content)
-        
-        # Generate word frequencies
-        word_frequencies = self.generate_word_frequencies(text_content)
-        
-        # Calculate sentiment scores
-        sentiment_scores = [
-            TextBlob(content.get('text', '')).sentiment.polarity
-            for content in all_content
-        ]
-        
-        # Calculate fear/greed index
-        fear_greed_index = self.calculate_fear_greed_index(sentiment_scores)
-        
-        # Perform batch analysis
-        batch_analysis = self.batch_analyze_content(all_content)
+        if self.pool is not None:
+            # The workers need the content and so does the batch analysis after them
+            contents = []
+            
+            def collect() -> Iterator[Dict[str, Any]]:
+                for content in chain(posts, comments):
+                    contents.append(content)
+                    yield content
+                    
+            aggregate = self._aggregate(collect())
+            batch_analysis = self.batch_analyze_content(contents, max_chunks=max_chunks)
+        else:
+            aggregate = MarketAggregate(self.ticker_extractor)
+            # One pass: every document is counted on its way into the batch analysis
+            batch_analysis = self.batch_analyze_content(aggregate.consume(chain(posts, comments)), max_chunks=max_chunks)
         
         return {
-            "stock_mentions": stock_mentions,
-            "word_frequencies": word_frequencies,
-            "fear_greed_index": fear_greed_index,
+            "stock_mentions": aggregate.stock_mentions(),
+            "word_frequencies": aggregate.word_frequencies(),
+            "word_error_bound": aggregate.word_error_bound(),
+            "fear_greed_index": aggregate.fear_greed_index(),
             "batch_analysis": batch_analysis,
+            "documents": aggregate.documents,
             "timestamp": datetime.utcnow().isoformat()
         }
         
-    def analyze_stock_mentions(self, posts: List[Dict[str, Any]], 
-                             comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def analyze_stock_mentions(self, posts: Iterable[Dict[str, Any]],
+                             comments: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Analyze only stock mentions
         """
-        # Combine all content
-        all_content = posts + comments
-        text_content = " ".join([
-            f"{content.get('title', '')} {content.get('text', '')}"
-            for content in all_content
-        ])
-        
-        # Extract stock mentions
-        stock_mentions = self.extract_stock_mentions(text_content)
+        aggregate = self._aggregate(chain(posts, comments), measures=("tickers",))
         
         return {
-            "stock_mentions": stock_mentions,
+            "stock_mentions": aggregate.stock_mentions(),
             "timestamp": datetime.utcnow().isoformat()
         }
         
-    def analyze_sentiment(self, posts: List[Dict[str, Any]], 
-                         comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def analyze_sentiment(self, posts: Iterable[Dict[str, Any]],
+                         comments: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Analyze only sentiment
         """
-        # Combine all content
-        all_content = posts + comments
-        
-        # Calculate sentiment scores
-        sentiment_scores = [
-            TextBlob(content.get('text', '')).sentiment.polarity
-            for content in all_content
-        ]
-        
-        # Calculate fear/greed index
-        fear_greed_index = self.calculate_fear_greed_index(sentiment_scores)
+        aggregate = self._aggregate(chain(posts, comments), measures=("sentiment",))
         
         return {
-            "fear_greed_index": fear_greed_index,
-            "average_sentiment": np.mean(sentiment_scores) if sentiment_scores else 0,
+            "fear_greed_index": aggregate.fear_greed_index(),
+            "average_sentiment": aggregate.average_sentiment(),
             "timestamp": datetime.utcnow().isoformat()
         }
         
-    def analyze_wordcloud(self, posts: List[Dict[str, Any]], 
-                         comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def analyze_wordcloud(self, posts: Iterable[Dict[str, Any]],
+                         comments: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Analyze only word frequencies for word cloud
         """
-        # Combine all content
-        all_content = posts + comments
-        text_content = " ".join([
-            f"{content.get('title', '')} {content.get('text', '')}"
-            for content in all_content
-        ])
-        
-        # Generate word frequencies
-        word_frequencies = self.generate_word_frequencies(text_content)
+        aggregate = self._aggregate(chain(posts, comments), measures=("words",))
         
         return {
-            "word_frequencies": word_frequencies,
+            "word_frequencies": aggregate.word_frequencies(),
+            "word_error_bound": aggregate.word_error_bound(),
             "timestamp": datetime.utcnow().isoformat()
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,38 @@
+from typing import Dict, Any
+
+# Response bodies served from the latest daily market analysis. Shared by
+# main.py and the handlers under api/market so the cached bodies match.
+
+def trends_response(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Body for /market/trends"""
+    return {
+        "data": {
+            "stock_mentions": analysis["stock_mentions"],
+            "word_frequencies": analysis["word_frequencies"],
+            "fear_greed_index": analysis["fear_greed_index"],
+            "market_sentiment": analysis["market_sentiment"],
+            "trending_topics": analysis["trending_topics"],
+            "risk_indicators": analysis["risk_indicators"]
+        },
+        "date": analysis["date"],
+        "last_updated": analysis["created_at"]
+    }
+
+def sentiment_response(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Body for /market/sentiment"""
+    return {
+        "fear_greed_index": analysis["fear_greed_index"],
+        "market_sentiment": analysis["market_sentiment"],
+        "risk_indicators": analysis["risk_indicators"],
+        "date": analysis["date"],
+        "last_updated": analysis["created_at"]
+    }
+
+def wordcloud_response(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Body for /market/wordcloud"""
+    return {
+        "word_frequencies": analysis["word_frequencies"],
+        # The most any frequency overstates its true count, 0 when they are exact
+        "error_bound": analysis["word_error_bound"],
+        "timestamp": analysis["created_at"]
+    }
@@ -0,0 +1,265 @@
+from typing import Dict, List, Tuple, Optional, Sequence
+import re
+import numpy as np
+from textblob.en import sentiment as textblob_lexicon
+from textblob._text import (ABBREVIATIONS, EMOTICONS, EOS, PUNCTUATION, RE_ABBR1, RE_ABBR2, RE_ABBR3,
+                            RE_EMOTICONS, RE_SARCASM)
+
+# TextBlob's tokenizer (textblob._text.find_tokens) spaces out quotes, turns
+# paragraph breaks into END-OF-SENTENCE tokens and splits every
+# whitespace-separated chunk on its own: leading punctuation other than
+# periods one mark per token, trailing punctuation, ellipses and periods
+# except those of abbreviations (U.S., Mr., e.g.). Chunks repeat a lot in a
+# batch, so each distinct one is split once.
+LEADING = tuple(PUNCTUATION.replace(".", ""))
+TRAILING = LEADING + (".",)
+QUOTES = "“”‘’'\""
+PARAGRAPH_BREAK = re.compile(r"\n{2,}")
+# Sentences end after a run of these tokens that holds a period, "!", "?",
+# "..." or a paragraph break; emoticons are never joined across the end
+TERMINAL = rf"(?:\.\.\.|[.!?]|{EOS})(?= |$)"
+CLOSING = rf"(?:\.\.\.|[.!?)”’]|{EOS})(?= |$)"
+SENTENCE_END = re.compile(rf"(?<![^ ]){TERMINAL}(?: {CLOSING})*")
+END_OF_SENTENCE = re.compile(rf"(?:^| ){EOS}(?= |$)")
+
+# Sarcasm marks are assessed like emoticons, as neutral
+SARCASM = "(!)"
+# Joins the documents of a batch into one string; it is a token of its own,
+# so nothing is joined across it
+SEPARATOR = "\x00"
+# Marks the end of a sentence while emoticons are joined
+BOUNDARY = "\x01"
+# The two are reserved: in a text they are read as this control character,
+# which TextBlob treats the same, as part of an unknown word
+RESERVED_STAND_IN = "\x02"
+
+# "!" boosts the polarity of the assessment before it by this factor
+EXCLAMATION_BOOST = 1.25
+# Negated assessments are scaled by this: "not good" is slightly bad
+NEGATION_FACTOR = -0.5
+
+# Largest difference from TextBlob's polarity of the same text
+POLARITY_TOLERANCE = 1e-9
+
+def _mark_polarities() -> Dict[str, float]:
+    """Polarity of emoticons and sarcasm marks; TextBlob never scores alphabetic emoticons such as xD"""
+    marks = {
+        emoticon.lower(): polarity
+        for (_, polarity), emoticons in EMOTICONS.items() for emoticon in emoticons if not emoticon.isalpha()
+    }
+    marks[SARCASM] = 0.0
+    return marks
+
+def _join_emoticon(match: re.Match) -> str:
+    return match.group(1).replace(" ", "") + match.group(2)
+
+def _split_chunk(chunk: str) -> str:
+    """The tokens of one whitespace-separated chunk, space separated, as find_tokens splits it"""
+    if not chunk.startswith(LEADING) and not chunk.endswith(TRAILING):
+        return chunk
+    tokens, tail = [], []
+    while chunk.startswith(LEADING):
+        tokens.append(chunk[0])
+        chunk = chunk[1:]
+    while chunk.endswith(TRAILING):
+        if chunk.endswith(LEADING):
+            tail.append(chunk[-1])
+            chunk = chunk[:-1]
+        if chunk.endswith("..."):
+            tail.append("...")
+            chunk = chunk[:-3].rstrip(".")
+        if chunk.endswith("."):
+            if (chunk in ABBREVIATIONS or RE_ABBR1.match(chunk) or RE_ABBR2.match(chunk)
+                    or RE_ABBR3.match(chunk)):
+                break
+            tail.append(".")
+            chunk = chunk[:-1]
+    if chunk:
+        tokens.append(chunk)
+    tokens.extend(reversed(tail))
+    return " ".join(tokens)
+
+def join_batch(texts: Sequence[str]) -> str:
+    """A batch of texts as one string, each followed by a separator token"""
+    joined = f" {SEPARATOR} ".join(
+        (text or "").replace(SEPARATOR, RESERVED_STAND_IN).replace(BOUNDARY, RESERVED_STAND_IN) for text in texts
+    )
+    return f"{joined} {SEPARATOR}"
+
+def batch_ids(tokens: List[str]) -> Tuple[Dict[str, int], np.ndarray, np.ndarray]:
+    """
+    Vocabulary ids of the tokens of a joined batch, and the document of each
+    Distinct tokens get ids in order of appearance, the separator among them;
+    the returned ids and documents leave the separators out.
+    """
+    vocabulary: Dict[str, int] = dict.fromkeys(tokens)
+    for index, token in enumerate(vocabulary):
+        vocabulary[token] = index
+    ids = np.fromiter(map(vocabulary.__getitem__, tokens), dtype=np.intp, count=len(tokens))
+    separators = ids == vocabulary[SEPARATOR]
+    documents = (np.cumsum(separators) - separators)[~separators]
+    return vocabulary, ids[~separators], documents
+
+def previous_index(mask: np.ndarray, documents: np.ndarray) -> np.ndarray:
+    """For every token, the index of the last earlier token of its document in mask, or -1"""
+    positions = np.where(mask, np.arange(len(mask)), -1)
+    previous = np.empty_like(positions)
+    previous[0] = -1
+    previous[1:] = np.maximum.accumulate(positions)[:-1]
+    found = previous >= 0
+    found[found] = documents[previous[found]] == documents[found]
+    previous[~found] = -1
+    return previous
+
+def _at(values: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """values[indices] where indices >= 0, False elsewhere"""
+    result = np.zeros(len(indices), dtype=bool)
+    found = indices >= 0
+    result[found] = values[indices[found]]
+    return result
+
+class PolarityScorer:
+    """
+    Score many documents with TextBlob's polarity in one vectorised pass
+
+    TextBlob builds objects and walks its rules per word per document. Here
+    a whole batch is tokenised as one string, its tokens are looked up in
+    TextBlob's lexicon once per distinct token, and its
+    rules (modifiers such as "very" scaling the next word, negations scaling
+    by -0.5, "!" boosting, emoticons) are applied with NumPy over the token
+    arrays of all documents together; a document's polarity is the mean of
+    its assessments, 0 without any.
+
+    Scores match TextBlob(text).sentiment.polarity to within
+    POLARITY_TOLERANCE, the rounding of repeated "!" boosts, control
+    characters and paragraph breaks included. tests/test_polarity_scorer.py
+    checks this on a fixed corpus; benchmarks/sentiment_bench.py reports the
+    largest difference on a generated one.
+    """
+    def __init__(self):
+        lexicon = textblob_lexicon
+        lexicon.load()
+        # Polarity and intensity per word, over all parts of speech, and which
+        # words are adverbs that modify the next one
+        self.lexicon: Dict[str, Tuple[float, float, bool]] = {
+            word: (entry[None][0], entry[None][2], any(pos in entry for pos in lexicon.modifiers))
+            for word, entry in lexicon.items()
+        }
+        self.negations = frozenset(lexicon.negations)
+        self.marks = _mark_polarities()
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lower-cased tokens of a document, or of a batch from join_batch, as TextBlob assesses them"""
+        # TextBlob splits "don't" into do n ' t; its other contractions split at the quote anyway
+        text = (text or "").replace("n't", " n't")
+        for quote in QUOTES:
+            text = text.replace(quote, f" {quote} ")
+        text = text.replace("\r\n", "\n")
+        chunks = PARAGRAPH_BREAK.sub(f" {EOS} ", text).split()
+        split = {chunk: _split_chunk(chunk) for chunk in dict.fromkeys(chunks)}
+        spaced = " ".join(map(split.__getitem__, chunks))
+        # Sentence ends are marked, then the paragraph breaks dropped, so
+        # emoticons split by the punctuation rules, such as ":" ")", are
+        # joined again within sentences only
+        spaced = SENTENCE_END.sub(rf"\g<0> {BOUNDARY}", spaced)
+        if EOS in spaced:
+            spaced = END_OF_SENTENCE.sub("", spaced)
+        spaced = RE_EMOTICONS.sub(_join_emoticon, RE_SARCASM.sub(SARCASM, spaced))
+        return spaced.replace(f" {BOUNDARY}", "").lower().split()
+
+    def _token_table(self, vocabulary: Dict[str, int]) -> Dict[str, np.ndarray]:
+        """Attributes of each distinct token, indexed by vocabulary id"""
+        size = len(vocabulary)
+        table = {
+            "polarity": np.zeros(size), "intensity": np.ones(size),
+            "known": np.zeros(size, dtype=bool), "modifier": np.zeros(size, dtype=bool),
+            "absorbs_negation": np.zeros(size, dtype=bool),
+            "negation": np.zeros(size, dtype=bool), "mark": np.zeros(size, dtype=bool),
+            "exclamation": np.zeros(size, dtype=bool),
+            # Unknown tokens this long end a pending negation (2) or modifier (3)
+            "ends_negation": np.zeros(size, dtype=bool), "ends_modifier": np.zeros(size, dtype=bool)
+        }
+        for token, index in vocabulary.items():
+            entry = self.lexicon.get(token)
+            if entry is not None:
+                table["polarity"][index], table["intensity"][index], table["modifier"][index] = entry
+                table["known"][index] = True
+                table["absorbs_negation"][index] = entry[2] and token.endswith("ly")
+                continue
+            if token in self.marks:
+                table["polarity"][index] = self.marks[token]
+                table["mark"][index] = True
+            table["negation"][index] = token in self.negations
+            table["exclamation"][index] = token == "!"
+            table["ends_negation"][index] = len(token) > 1
+            table["ends_modifier"][index] = len(token) > 2
+        return table
+
+    def score_texts(self, texts: Sequence[str]) -> np.ndarray:
+        """Polarity between -1 and 1 of every text, as a float array"""
+        # The whole batch is tokenised at once, with separators between documents
+        vocabulary, ids, documents = batch_ids(self.tokenize(join_batch(texts)))
+        if not len(ids):
+            return np.zeros(len(texts))
+        table = {name: values[ids] for name, values in self._token_table(vocabulary).items()}
+        known, negation = table["known"], table["negation"]
+        # Known words and emoticons are assessed; a word may extend the latest assessment
+        assessing = known | table["mark"]
+        latest = previous_index(assessing, documents)
+
+        # A negation after an -ly modifier negates the latest assessment ("really not good")
+        modifier_before = previous_index(known | (table["ends_modifier"] & ~negation), documents)
+        absorbed = negation & _at(table["absorbs_negation"], modifier_before)
+        # A modifier applies to the next known word across tokens of up to two
+        # characters and the negations it absorbed; a negation across one-character tokens
+        after_modifier = _at(
+            table["modifier"], previous_index(known | (table["ends_modifier"] & ~absorbed), documents)
+        )
+        negation_before = previous_index(known | negation | table["ends_negation"], documents)
+
+        negated = np.zeros(len(ids), dtype=bool)
+        negated[latest[absorbed & (latest >= 0)]] = True
+        # Any other negation negates the next known word and inverts its intensity ("not very good")
+        direct = known & _at(negation & ~absorbed, negation_before)
+        negated |= direct
+        intensity = np.where(direct, 1.0 / table["intensity"], table["intensity"])
+
+        # A known word after a modifier replaces the latest assessment with its
+        # own polarity scaled by that assessment's intensity ("very good")
+        merged = known & after_modifier & (latest >= 0)
+        replaced = np.zeros(len(ids), dtype=bool)
+        replaced[latest[merged]] = True
+        polarity = table["polarity"].copy()
+        polarity[merged] = np.clip(polarity[merged] * intensity[latest[merged]], -1.0, 1.0)
+
+        # Words chained this way form one assessment, negated if any of them is
+        assessing_indices = np.flatnonzero(assessing)
+        chains = np.cumsum(~merged[assessing_indices]) - 1
+        chain_negated = np.bincount(chains, weights=negated[assessing_indices]) > 0
+        negated[assessing_indices] = chain_negated[chains]
+
+        # Each "!" boosts the latest assessment before it
+        assessed = assessing & ~replaced
+        targets = latest[table["exclamation"]]
+        boosts = np.bincount(targets[targets >= 0], minlength=len(ids))
+        polarity = np.clip(polarity * EXCLAMATION_BOOST ** boosts, -1.0, 1.0)
+        polarity = np.where(negated, polarity * NEGATION_FACTOR, polarity)
+
+        totals = np.bincount(documents[assessed], weights=polarity[assessed], minlength=len(texts))
+        counts = np.bincount(documents[assessed], minlength=len(texts))
+        return totals / np.maximum(counts, 1)
+
+    def score_text(self, text: str) -> float:
+        """Polarity of a single text"""
+        return float(self.score_texts([text])[0])
+
+# The lexicon is read once per process
+_shared_scorer: Optional[PolarityScorer] = None
+
+def get_polarity_scorer() -> PolarityScorer:
+    """Return the process-wide polarity scorer"""
+    global _shared_scorer
+
+    if _shared_scorer is None:
+        _shared_scorer = PolarityScorer()
+    return _shared_scorer
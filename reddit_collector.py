@@ -1,10 +1,54 @@
 import praw
 import os
+import heapq
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import count, islice
+from praw.models import MoreComments
+from typing import List, Dict, Any, Optional, Iterator
+
+# Reddit allows 100 OAuth requests per minute per client
+REDDIT_REQUESTS_PER_MINUTE = 100
+# Listing endpoints return at most 100 items per request
+LISTING_PAGE_SIZE = 100
+
+# Default caps for comment tree expansion; each MoreComments expansion is one API call
+DEFAULT_MAX_EXPANSIONS = 32
+DEFAULT_COMMENT_TIME_BUDGET = 10.0
+
+
+class RateBudget:
+    """
+    Token bucket shared by every worker that talks to the Reddit API
+    """
+    def __init__(self, requests_per_minute: int = REDDIT_REQUESTS_PER_MINUTE):
+        self.capacity = float(requests_per_minute)
+        self.refill_rate = requests_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> None:
+        """Block until the requested number of API calls fits in the budget"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+                self.updated_at = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                wait = (tokens - self.tokens) / self.refill_rate
+
+            time.sleep(wait)
 
 class RedditCollector:
-    def __init__(self):
+    def __init__(self, database=None, max_workers: int = 5, requests_per_minute: int = REDDIT_REQUESTS_PER_MINUTE):
         # Get environment variables directly without dotenv
         client_id = os.getenv("REDDIT_CLIENT_ID")
         client_secret = os.getenv("REDDIT_CLIENT_SECRET")
@@ -13,11 +57,28 @@ class RedditCollector:
         if not all([client_id, client_secret, user_agent]):
             raise ValueError("Missing required Reddit API credentials")
             
-        self.reddit = praw.Reddit(
-            client_id=client_id,
-            client_secret=client_secret,
-            user_agent=user_agent
-        )
+        self.credentials = {
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "user_agent": user_agent
+        }
+        self.reddit = praw.Reddit(**self.credentials)
+
+        # PRAW instances are not thread safe, so each worker thread gets its own
+        # client while all of them draw from the same rate limit budget
+        self.max_workers = max_workers
+        self.rate_budget = RateBudget(requests_per_minute)
+        self.thread_clients = threading.local()
+        # One long-lived pool, so its threads keep their clients and OAuth tokens between runs
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reddit-collector")
+
+        # Seconds spent fetching each subreddit during the last collection run
+        self.fetch_times: Dict[str, float] = {}
+
+        # High-water marks for incremental collection are persisted through the
+        # database; new ones wait in pending_cursors until commit_cursors()
+        self.database = database
+        self.pending_cursors: Dict[str, Dict[str, Any]] = {}
         
         # Target subreddits for retail investor discussions
         self.target_subreddits = [
@@ -28,64 +89,300 @@ class RedditCollector:
             "options"
         ]
 
+    def _client(self) -> praw.Reddit:
+        """Return the Reddit client owned by the calling thread"""
+        if threading.current_thread() is threading.main_thread():
+            return self.reddit
+
+        client = getattr(self.thread_clients, "reddit", None)
+        if client is None:
+            # A new client fetches an OAuth token with its first request
+            self.rate_budget.acquire()
+            client = praw.Reddit(**self.credentials)
+            self.thread_clients.reddit = client
+        return client
+
+    def _post_to_dict(self, post, subreddit_name: str) -> Dict[str, Any]:
+        """Convert a PRAW submission into a posts row"""
+        return {
+            "id": post.id,
+            "title": post.title,
+            "text": post.selftext,
+            "score": post.score,
+            "created_utc": datetime.fromtimestamp(post.created_utc).isoformat(),
+            "num_comments": post.num_comments,
+            "subreddit": subreddit_name,
+            "url": post.url,
+            "author": str(post.author) if post.author else "[deleted]"
+        }
+
+    def _paged(self, client: praw.Reddit, path: str, limit: int) -> Iterator:
+        """
+        Iterate up to limit items of a listing endpoint such as r/stocks/hot
+
+        Pages are requested one at a time with after=, each only once the
+        rate budget allows it, so a caller that stops early fetches no more.
+        """
+        after = None
+        while limit > 0:
+            params = {"limit": min(limit, LISTING_PAGE_SIZE)}
+            if after:
+                params["after"] = after
+            self.rate_budget.acquire()
+            listing = client.get(path, params=params)
+            page = list(listing)[:limit]
+            yield from page
+
+            limit -= len(page)
+            after = getattr(listing, "after", None)
+            if not page or not after:
+                return
+
     def collect_posts(self, subreddit_name: str, limit: int = 100) -> List[Dict[str, Any]]:
         """
         Collect posts from a specific subreddit
         """
         posts = []
-        subreddit = self.reddit.subreddit(subreddit_name)
         
-        for post in subreddit.hot(limit=limit):
-            post_data = {
-                "id": post.id,
-                "title": post.title,
-                "text": post.selftext,
-                "score": post.score,
-                "created_utc": datetime.fromtimestamp(post.created_utc).isoformat(),
-                "num_comments": post.num_comments,
-                "subreddit": subreddit_name,
-                "url": post.url,
-                "author": str(post.author) if post.author else "[deleted]"
-            }
-            posts.append(post_data)
+        for post in self._paged(self._client(), f"r/{subreddit_name}/hot", limit):
+            posts.append(self._post_to_dict(post, subreddit_name))
             
         return posts
 
-    def collect_all_subreddits(self, limit: int = 100) -> Dict[str, List[Dict[str, Any]]]:
+    def collect_new_posts(self, subreddit_name: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Collect only posts newer than the stored cursor for a subreddit
+
+        Pages forward from the cursor through new() with before=, so nothing that
+        was already collected is fetched again. When more than `limit` posts are
+        waiting, the oldest ones are returned first and the rest are picked up by
+        the next run. The advanced cursor is held until commit_cursors() is called.
+        """
+        if self.database is None:
+            raise ValueError("Incremental collection requires a database for cursors")
+
+        client = self._client()
+        cursor = self.database.get_collection_cursor(subreddit_name, "new")
+        newer = []
+
+        if cursor:
+            before = cursor["fullname"]
+            while len(newer) < limit:
+                self.rate_budget.acquire()
+                page = list(client.get(
+                    f"r/{subreddit_name}/new",
+                    params={"before": before, "limit": LISTING_PAGE_SIZE}
+                ))
+                # Pages come back newest first; the page nearest the cursor comes first
+                page = [post for post in page if post.created_utc >= cursor["created_utc"]]
+                if not page:
+                    break
+
+                newer = page + newer
+                before = page[0].fullname
+                if len(page) < LISTING_PAGE_SIZE:
+                    break
+
+            # Keep the posts closest to the cursor so the next run leaves no gap
+            newer = newer[-limit:]
+
+        if not newer:
+            # First run, or the cursor post was removed and before= matches nothing:
+            # walk new() from the top and stop at the first post we already know
+            for post in self._paged(client, f"r/{subreddit_name}/new", limit):
+                if cursor and (post.fullname == cursor["fullname"] or post.created_utc < cursor["created_utc"]):
+                    break
+                newer.append(post)
+
+        newer = [post for post in newer if not cursor or post.fullname != cursor["fullname"]]
+
+        if newer:
+            self.pending_cursors[subreddit_name] = {
+                "subreddit": subreddit_name,
+                "listing": "new",
+                "fullname": newer[0].fullname,
+                "created_utc": newer[0].created_utc
+            }
+
+        return [self._post_to_dict(post, subreddit_name) for post in newer]
+
+    def take_cursors(self) -> Dict[str, Dict[str, Any]]:
+        """Hand over the cursors advanced by collect_new_posts, to commit once their posts are written"""
+        cursors = dict(self.pending_cursors)
+        self.pending_cursors.clear()
+        return cursors
+
+    def commit_cursors(self, cursors: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """
+        Persist cursors advanced by collect_new_posts, or those returned by take_cursors
+
+        Call this once the collected posts have been stored, so a failed write
+        is retried by the next run instead of being skipped.
+        """
+        if cursors is None:
+            cursors = self.take_cursors()
+        for cursor in cursors.values():
+            self.database.store_collection_cursor(cursor)
+
+    def discard_cursors(self) -> None:
+        """Drop cursors advanced by collect_new_posts without persisting them"""
+        self.pending_cursors.clear()
+
+    def _timed_collect(self, subreddit: str, limit: int, incremental: bool = False) -> List[Dict[str, Any]]:
+        """Collect posts from one subreddit, recording the fetch time and isolating errors"""
+        started = time.monotonic()
+        try:
+            if incremental:
+                return self.collect_new_posts(subreddit, limit)
+            return self.collect_posts(subreddit, limit)
+        except Exception as e:
+            print(f"Error collecting posts from r/{subreddit}: {str(e)}")
+            return []
+        finally:
+            self.fetch_times[subreddit] = time.monotonic() - started
+
+    def collect_all_subreddits(self, limit: int = 100, max_workers: Optional[int] = None,
+                               incremental: bool = False) -> Dict[str, List[Dict[str, Any]]]:
         """
         Collect posts from all target subreddits
+
+        Subreddits are fetched in parallel by the collector's pool of workers,
+        at most max_workers at a time, sharing one rate limit budget. Pass
+        max_workers=1 to collect them one at a time.
+        Per-subreddit fetch times are left in self.fetch_times. With incremental=True
+        only posts newer than each subreddit's cursor are collected.
         """
-        all_posts = {}
-        
+        workers = min(max_workers or self.max_workers, len(self.target_subreddits))
+        self.fetch_times = {}
+
+        if workers <= 1:
+            return {
+                subreddit: self._timed_collect(subreddit, limit, incremental)
+                for subreddit in self.target_subreddits
+            }
+
+        # The pool is shared by every call; this one keeps at most `workers` subreddits in flight
+        slots = threading.BoundedSemaphore(workers)
+        futures = {}
         for subreddit in self.target_subreddits:
-            try:
-                posts = self.collect_posts(subreddit, limit)
-                all_posts[subreddit] = posts
-            except Exception as e:
-                print(f"Error collecting posts from r/{subreddit}: {str(e)}")
-                all_posts[subreddit] = []
-                
-        return all_posts
-
-    def get_post_comments(self, post_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+            slots.acquire()
+            futures[subreddit] = self.executor.submit(self._timed_collect, subreddit, limit, incremental)
+            futures[subreddit].add_done_callback(lambda _: slots.release())
+        # Keep the target_subreddits ordering in the result
+        return {subreddit: future.result() for subreddit, future in futures.items()}
+
+    def close(self) -> None:
+        """Stop the worker threads once their collections finish"""
+        self.executor.shutdown()
+
+    def _comment_to_dict(self, comment) -> Dict[str, Any]:
+        """Convert a PRAW comment into a comments row"""
+        return {
+            "id": comment.id,
+            "text": comment.body,
+            "score": comment.score,
+            "created_utc": datetime.fromtimestamp(comment.created_utc).isoformat(),
+            # Comes with the comment's data, so reading it costs no API call
+            "subreddit": comment.subreddit.display_name,
+            "author": str(comment.author) if comment.author else "[deleted]"
+        }
+
+    def iter_post_comments(self, post_id: str, order: str = "breadth",
+                           max_expansions: int = DEFAULT_MAX_EXPANSIONS,
+                           max_depth: Optional[int] = None,
+                           time_budget: Optional[float] = DEFAULT_COMMENT_TIME_BUDGET) -> Iterator[Dict[str, Any]]:
+        """
+        Yield comments from a post while expanding the comment tree on demand
+
+        order="breadth" walks the tree level by level, like CommentForest.list().
+        order="score" fetches the tree sorted by top and always yields the
+        highest scoring loaded comment next, expanding MoreComments only once the
+        loaded comments run out. MoreComments are expanded lazily as the walk
+        reaches them, up to max_expansions API calls, max_depth levels below the
+        top-level comments and time_budget seconds. Stop iterating to stop fetching.
+        """
+        if order not in ("breadth", "score"):
+            raise ValueError(f"Unknown comment order: {order}")
+
+        submission = self._client().submission(id=post_id)
+        if order == "score":
+            submission.comment_sort = "top"
+
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        expansions = 0
+        seen = set()
+        # Depth of every loaded comment, so flat morechildren results can be placed
+        depths = {submission.fullname: -1}
+
+        sequence = count()
+        frontier = deque() if order == "breadth" else []
+
+        def push(item, depth):
+            if order == "breadth":
+                frontier.append((depth, item))
+            elif isinstance(item, MoreComments):
+                heapq.heappush(frontier, ((1, -item.count), next(sequence), depth, item))
+            else:
+                heapq.heappush(frontier, ((0, -item.score), next(sequence), depth, item))
+
+        def pop():
+            if order == "breadth":
+                return frontier.popleft()
+            _, _, depth, item = heapq.heappop(frontier)
+            return depth, item
+
+        # Loading the submission fetches the first page of the tree
+        self.rate_budget.acquire()
+        for top_level in submission.comments:
+            push(top_level, 0)
+
+        while frontier:
+            depth, item = pop()
+
+            if isinstance(item, MoreComments):
+                if expansions >= max_expansions:
+                    continue
+                if max_depth is not None and depth > max_depth:
+                    continue
+                if deadline is not None and time.monotonic() >= deadline:
+                    continue
+
+                expansions += 1
+                self.rate_budget.acquire()
+                # Expansions come back flat, parents before their replies, so each
+                # child's depth is recorded before its own replies are placed
+                for child in item.comments():
+                    child_depth = depths.get(child.parent_id, depth - 1) + 1
+                    if not isinstance(child, MoreComments):
+                        depths[child.fullname] = child_depth
+                    if max_depth is None or child_depth <= max_depth:
+                        push(child, child_depth)
+                continue
+
+            if max_depth is not None and depth > max_depth:
+                continue
+            if item.id in seen:
+                continue
+            seen.add(item.id)
+            depths[item.fullname] = depth
+
+            yield self._comment_to_dict(item)
+
+            if max_depth is None or depth < max_depth:
+                for reply in item.replies:
+                    push(reply, depth + 1)
+
+    def get_post_comments(self, post_id: str, limit: int = 100, order: str = "breadth",
+                          max_expansions: int = DEFAULT_MAX_EXPANSIONS,
+                          max_depth: Optional[int] = None,
+                          time_budget: Optional[float] = DEFAULT_COMMENT_TIME_BUDGET) -> List[Dict[str, Any]]:
         """
         Collect comments from a specific post
+
+        Expands only as much of the tree as is needed to return `limit` comments,
+        within the budgets described in iter_post_comments.
         """
-        comments = []
-        submission = self.reddit.submission(id=post_id)
-        
-        # Expand all comments
-        submission.comments.replace_more(limit=None)
-        
-        for comment in submission.comments.list():
-            if hasattr(comment, 'body'):  # Skip MoreComments objects
-                comment_data = {
-                    "id": comment.id,
-                    "text": comment.body,
-                    "score": comment.score,
-                    "created_utc": datetime.fromtimestamp(comment.created_utc).isoformat(),
-                    "author": str(comment.author) if comment.author else "[deleted]"
-                }
-                comments.append(comment_data)
-                
-        return comments[:limit]  # Limit the number of comments returned 
\ No newline at end of file
+        return list(islice(
+            self.iter_post_comments(post_id, order, max_expansions, max_depth, time_budget),
+            limit
+        ))
@@ -13,4 +13,154 @@ CREATE TABLE daily_market_analysis (
 );
 
 -- Create index for quick date lookups
-CREATE INDEX idx_daily_market_analysis_date ON daily_market_analysis(date); 
\ No newline at end of file
+CREATE INDEX idx_daily_market_analysis_date ON daily_market_analysis(date); 
+
+-- High-water marks for incremental Reddit collection, one per subreddit listing
+CREATE TABLE collection_cursors (
+    subreddit TEXT NOT NULL,
+    listing TEXT NOT NULL,
+    fullname TEXT NOT NULL,
+    created_utc DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (subreddit, listing)
+);
+
+-- Keyset pagination over time ranges walks (created_utc, id) newest first
+CREATE INDEX idx_posts_created_utc_id ON posts(created_utc DESC, id DESC);
+CREATE INDEX idx_comments_created_utc_id ON comments(created_utc DESC, id DESC);
+
+-- Ticker mentions contributed by each post or comment. Re-ingesting a piece of
+-- content replaces its rows, so edits and repeats never count twice.
+CREATE TABLE ticker_mentions (
+    content_id TEXT NOT NULL,
+    content_type TEXT NOT NULL CHECK (content_type IN ('post', 'comment')),
+    symbol TEXT NOT NULL,
+    hour TIMESTAMP WITH TIME ZONE NOT NULL,
+    subreddit TEXT NOT NULL,
+    mention_count INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    sentiment FLOAT NOT NULL,
+    PRIMARY KEY (content_type, content_id, symbol)
+);
+
+-- Hourly rollup of ticker_mentions, kept in step by the trigger below
+CREATE TABLE ticker_mentions_hourly (
+    hour TIMESTAMP WITH TIME ZONE NOT NULL,
+    subreddit TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    content_count INTEGER NOT NULL DEFAULT 0,
+    mention_count BIGINT NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    sentiment_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, subreddit, symbol)
+);
+
+CREATE OR REPLACE FUNCTION apply_ticker_mention_delta() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO ticker_mentions_hourly AS h
+            (hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum)
+        VALUES (OLD.hour, OLD.subreddit, OLD.symbol, -1, -OLD.mention_count, -OLD.score, -OLD.sentiment)
+        ON CONFLICT (hour, subreddit, symbol) DO UPDATE SET
+            content_count = h.content_count + EXCLUDED.content_count,
+            mention_count = h.mention_count + EXCLUDED.mention_count,
+            score_sum = h.score_sum + EXCLUDED.score_sum,
+            sentiment_sum = h.sentiment_sum + EXCLUDED.sentiment_sum;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO ticker_mentions_hourly AS h
+            (hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum)
+        VALUES (NEW.hour, NEW.subreddit, NEW.symbol, 1, NEW.mention_count, NEW.score, NEW.sentiment)
+        ON CONFLICT (hour, subreddit, symbol) DO UPDATE SET
+            content_count = h.content_count + EXCLUDED.content_count,
+            mention_count = h.mention_count + EXCLUDED.mention_count,
+            score_sum = h.score_sum + EXCLUDED.score_sum,
+            sentiment_sum = h.sentiment_sum + EXCLUDED.sentiment_sum;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ticker_mentions_rollup
+AFTER INSERT OR UPDATE OR DELETE ON ticker_mentions
+FOR EACH ROW EXECUTE FUNCTION apply_ticker_mention_delta();
+
+-- Replace the mentions of a batch of contents in one transaction.
+-- contents: [{content_id, content_type, mentions: [{symbol, hour, subreddit, mention_count, score, sentiment}]}]
+CREATE OR REPLACE FUNCTION replace_ticker_mentions(contents JSONB) RETURNS VOID AS $$
+    DELETE FROM ticker_mentions t
+    USING jsonb_array_elements(contents) c
+    WHERE t.content_id = c->>'content_id'
+      AND t.content_type = c->>'content_type';
+
+    INSERT INTO ticker_mentions
+        (content_id, content_type, symbol, hour, subreddit, mention_count, score, sentiment)
+    SELECT
+        c->>'content_id',
+        c->>'content_type',
+        m->>'symbol',
+        (m->>'hour')::timestamptz,
+        m->>'subreddit',
+        (m->>'mention_count')::integer,
+        (m->>'score')::integer,
+        (m->>'sentiment')::float
+    FROM jsonb_array_elements(contents) c,
+         jsonb_array_elements(c->'mentions') m;
+$$ LANGUAGE sql;
+
+-- Per-symbol totals for a time window, summed from the hourly rollup
+CREATE OR REPLACE FUNCTION ticker_mentions_window(start_hour TIMESTAMPTZ, end_hour TIMESTAMPTZ, max_symbols INTEGER)
+RETURNS TABLE (symbol TEXT, content_count BIGINT, mention_count BIGINT, score_sum BIGINT, sentiment_sum DOUBLE PRECISION) AS $$
+    SELECT symbol, SUM(content_count), SUM(mention_count), SUM(score_sum), SUM(sentiment_sum)
+    FROM ticker_mentions_hourly
+    WHERE hour >= start_hour AND hour <= end_hour
+    GROUP BY symbol
+    HAVING SUM(mention_count) > 0
+    ORDER BY SUM(mention_count) DESC, symbol
+    LIMIT max_symbols;
+$$ LANGUAGE sql STABLE;
+
+-- Regenerate the hourly rollup from ticker_mentions
+CREATE OR REPLACE FUNCTION rebuild_ticker_mentions_hourly() RETURNS VOID AS $$
+    TRUNCATE ticker_mentions_hourly;
+
+    INSERT INTO ticker_mentions_hourly
+        (hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum)
+    SELECT hour, subreddit, symbol, COUNT(*), SUM(mention_count), SUM(score), SUM(sentiment)
+    FROM ticker_mentions
+    GROUP BY hour, subreddit, symbol;
+$$ LANGUAGE sql;
+
+-- Sentiment results are cached by the hash of the text they scored, and a post
+-- or comment keeps one sentiment row (see migrations/20261017010000)
+ALTER TABLE sentiments ADD COLUMN text_hash TEXT;
+CREATE UNIQUE INDEX idx_sentiments_content ON sentiments(content_type, content_id);
+CREATE INDEX idx_sentiments_text_hash ON sentiments(text_hash);
+
+-- Comments record the subreddit they were collected from, so the ticker rollup
+-- can be rebuilt without their parent posts (see migrations/20261017020000)
+ALTER TABLE comments ADD COLUMN subreddit TEXT;
+
+-- Partial updates of changed posts and comments go out in chunks (see migrations/20261018000000)
+CREATE OR REPLACE FUNCTION update_posts_partial(updates JSONB) RETURNS VOID AS $$
+    UPDATE posts p SET
+        score = CASE WHEN u ? 'score' THEN (u->>'score')::integer ELSE p.score END,
+        num_comments = CASE WHEN u ? 'num_comments' THEN (u->>'num_comments')::integer ELSE p.num_comments END,
+        text = CASE WHEN u ? 'text' THEN u->>'text' ELSE p.text END
+    FROM jsonb_array_elements(updates) u
+    WHERE p.id = u->>'id';
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION update_comments_partial(updates JSONB) RETURNS VOID AS $$
+    UPDATE comments c SET
+        score = CASE WHEN u ? 'score' THEN (u->>'score')::integer ELSE c.score END,
+        text = CASE WHEN u ? 'text' THEN u->>'text' ELSE c.text END
+    FROM jsonb_array_elements(updates) u
+    WHERE c.id = u->>'id';
+$$ LANGUAGE sql;
+
+-- The daily analysis records how far its word frequencies may overstate the
+-- true counts (see migrations/20261018010000)
+ALTER TABLE daily_market_analysis ADD COLUMN word_error_bound INTEGER NOT NULL DEFAULT 0;
@@ -1,25 +1,164 @@
-import os
-import requests
-from typing import Dict, Any, Tuple
+from llm_client import LLMClient, get_llm_client
+from collections import OrderedDict
+from typing import Dict, Any, Tuple, Optional, List
+import hashlib
 import json
+import re
+import threading
+import unicodedata
+
+# Part of every cache key: bump PROMPT_VERSION whenever the prompts or the way
+# replies are parsed change, so results from the old prompts are no longer served.
+# The single and batched prompts ask for the same fields on the same scales.
+SENTIMENT_MODEL = "deepseek-chat"
+PROMPT_VERSION = "1"
+
+# Results kept in memory by each analyzer
+DEFAULT_SENTIMENT_CACHE_SIZE = 10000
+
+# Batched analysis: estimated prompt tokens and texts per request, reply tokens
+# allowed per text, and rounds a text missing from replies is sent again
+BATCH_TOKEN_BUDGET = 3000
+MAX_BATCH_SIZE = 50
+BATCH_OUTPUT_TOKENS = 64
+OUTPUT_TOKENS_PER_TEXT = 40
+MAX_BATCH_ATTEMPTS = 3
+SENTIMENT_LABELS = ("positive", "negative", "neutral")
+
+def normalize_text(text: str) -> str:
+    """
+    Normalise text for the sentiment cache key
+    Unicode variants and whitespace are folded; case is kept, since all caps can carry tone.
+    """
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text or '')).strip()
+
+def text_hash(text: str, model: str = SENTIMENT_MODEL, prompt_version: str = PROMPT_VERSION) -> str:
+    """Cache key for a text: sha256 over the model, the prompt version and the normalised text"""
+    return hashlib.sha256(f"{model}\n{prompt_version}\n{normalize_text(text)}".encode()).hexdigest()
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for batch sizing, about four characters per token"""
+    return len(text) // 4 + 1
+
+def pack_batches(items: List[Tuple[str, str]], token_budget: int = BATCH_TOKEN_BUDGET,
+                 max_batch_size: int = MAX_BATCH_SIZE) -> List[List[Tuple[str, str]]]:
+    """
+    Split (key, text) pairs into batches within a token budget, keeping their order
+    A text over the budget on its own still gets a batch of one.
+    """
+    batches, batch, tokens = [], [], 0
+    for key, text in items:
+        # Every text also costs its id tag and line break
+        cost = estimate_tokens(text) + 4
+        if batch and (tokens + cost > token_budget or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append((key, text))
+        tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def parse_sentiment(analysis: Any) -> Optional[Tuple[float, str, float]]:
+    """Validate one sentiment object from an LLM reply; None if it is missing or malformed"""
+    try:
+        score = float(analysis['sentiment_score'])
+        label = str(analysis['sentiment_label']).lower()
+        confidence = float(analysis['confidence'])
+    except (TypeError, KeyError, ValueError):
+        return None
+    if label not in SENTIMENT_LABELS or not -1 <= score <= 1 or not 0 <= confidence <= 1:
+        return None
+    return (score, label, confidence)
+
+def post_text(post_data: Dict[str, Any]) -> str:
+    """The text analyzed for a post: its title and body"""
+    return f"{post_data['title']} {post_data.get('text', '')}"
+
+class SentimentCache:
+    """Thread-safe in-process LRU of sentiment results by text hash"""
+    def __init__(self, max_entries: int = DEFAULT_SENTIMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, str, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, str, float]]:
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+            return result
+
+    def set(self, key: str, result: Tuple[float, str, float]) -> None:
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
 
 class SentimentAnalyzer:
-    def __init__(self):
-        self.api_key = os.getenv("DEEPSEEK_API_KEY")
-        if not self.api_key:
-            raise ValueError("Missing DeepSeek API key")
-            
-        self.api_url = "https://api.deepseek.com/v1/chat/completions"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+    """
+    Sentiment analysis through DeepSeek, cached by content hash
+
+    Results are cached under text_hash(): first in an in-process LRU, then in
+    the sentiments table, whose rows carry the hash of the text they scored.
+    A hit in either tier skips the LLM call, so reposted titles, copypasta and
+    repeated requests cost one call. Changing the model or PROMPT_VERSION
+    changes every key, so older results stop matching.
+    """
+    def __init__(self, database=None, cache_size: int = DEFAULT_SENTIMENT_CACHE_SIZE,
+                 model: str = SENTIMENT_MODEL, prompt_version: str = PROMPT_VERSION,
+                 llm_client: Optional[LLMClient] = None):
+        # The process-wide client shares its connections and concurrency limit with MarketAnalyzer
+        self.llm = llm_client or get_llm_client()
+        
+        self.model = model
+        self.prompt_version = prompt_version
+        self.database = database
+        self.cache = SentimentCache(cache_size)
+        self.cache_stats = {"memory_hits": 0, "database_hits": 0, "misses": 0, "batch_requests": 0, "requeued": 0}
+        
+    def text_hash(self, text: str) -> str:
+        """Cache key of a text for this analyzer's model and prompt version"""
+        return text_hash(text, self.model, self.prompt_version)
         
     def analyze_text(self, text: str) -> Tuple[float, str, float]:
         """
-        Analyze the sentiment of a given text
+        Analyze the sentiment of a given text, calling the LLM only on a cache miss
         Returns: (sentiment_score, sentiment_label, confidence)
         """
+        key = self.text_hash(text)
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache_stats["memory_hits"] += 1
+            return result
+            
+        if self.database is not None:
+            try:
+                row = self.database.get_sentiment_by_text_hash(key)
+            except Exception:
+                # The persistent tier is an optimisation; fall back to the LLM
+                row = None
+            if row:
+                result = (row['sentiment_score'], row['sentiment_label'], row['confidence'])
+                self.cache_stats["database_hits"] += 1
+                self.cache.set(key, result)
+                return result
+                
+        self.cache_stats["misses"] += 1
+        result = self._call_llm(text)
+        self.cache.set(key, result)
+        return result
+        
+    def _chat(self, prompt: str, **options) -> str:
+        """Send one chat completion request and return the reply text"""
+        return self.llm.chat(prompt, model=self.model, temperature=0.3, **options)
+        
+    def _call_llm(self, text: str) -> Tuple[float, str, float]:
+        """Ask DeepSeek for the sentiment of a text"""
         try:
             # Prepare the prompt for sentiment analysis
             prompt = f"""Analyze the sentiment of this text and provide:
@@ -34,24 +173,7 @@ Respond in JSON format with these fields:
 - sentiment_label
 - confidence"""
 
-            # Make the API request
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json={
-                    "model": "deepseek-chat",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.3
-                }
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"API request failed: {response.text}")
-                
-            # Parse the response
-            result = response.json()
-            content = result['choices'][0]['message']['content']
-            analysis = json.loads(content)
+            analysis = json.loads(self._chat(prompt))
             
             return (
                 analysis['sentiment_score'],
@@ -63,33 +185,162 @@ Respond in JSON format with these fields:
             print(f"Error in sentiment analysis: {str(e)}")
             raise
             
-    def analyze_post(self, post_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _call_llm_batch(self, texts: Dict[str, str]) -> Dict[str, Tuple[float, str, float]]:
         """
-        Analyze sentiment of a Reddit post
+        Ask DeepSeek for the sentiment of several texts in one request
+        texts maps short ids to texts; returns results for the ids that came back valid.
         """
-        # Combine title and text for analysis
-        text_to_analyze = f"{post_data['title']} {post_data.get('text', '')}"
+        # Whitespace is folded so every text stays on its own tagged line
+        lines = "\n".join(f"[{text_id}] {normalize_text(text)}" for text_id, text in texts.items())
+        prompt = f"""Analyze the sentiment of each text below and provide for each:
+1. A sentiment score between -1 (very negative) and 1 (very positive)
+2. A sentiment label (positive, negative, or neutral)
+3. A confidence score between 0 and 1
+
+Each text is on its own line, starting with its id in square brackets.
+
+{lines}
+
+Respond with a JSON object with exactly one key per id, each mapping to an object with these fields:
+- sentiment_score
+- sentiment_label
+- confidence
+Example: {{"1": {{"sentiment_score": 0.4, "sentiment_label": "positive", "confidence": 0.8}}}}"""
+
+        try:
+            analyses = json.loads(self._chat(
+                prompt,
+                response_format={"type": "json_object"},
+                max_tokens=BATCH_OUTPUT_TOKENS + OUTPUT_TOKENS_PER_TEXT * len(texts)
+            ))
+        except Exception as e:
+            print(f"Error in batch sentiment analysis of {len(texts)} texts: {str(e)}")
+            return {}
+            
+        if not isinstance(analyses, dict):
+            return {}
+        results = {}
+        for text_id in texts:
+            result = parse_sentiment(analyses.get(text_id))
+            if result is not None:
+                results[text_id] = result
+        return results
         
-        sentiment_score, sentiment_label, confidence = self.analyze_text(text_to_analyze)
+    def analyze_texts(self, texts: List[str], token_budget: int = BATCH_TOKEN_BUDGET,
+                      max_batch_size: int = MAX_BATCH_SIZE) -> List[Tuple[float, str, float]]:
+        """
+        Analyze the sentiment of many texts, packing cache misses into few LLM requests
+
+        Each distinct text is looked up in the in-process cache, then all the
+        remaining ones in the database at once. Texts still missing are sent in
+        batches of at most token_budget estimated prompt tokens and
+        max_batch_size texts, tagged with ids the reply must be keyed by, as
+        many at once as the LLM client's concurrency limit allows. Texts
+        whose id is missing or invalid in a reply are queued again, up to
+        MAX_BATCH_ATTEMPTS rounds, and then analyzed one at a time.
+        Returns (sentiment_score, sentiment_label, confidence) per text, in order.
+        """
+        keys = [self.text_hash(text) for text in texts]
+        distinct = dict(zip(keys, texts))
+        results: Dict[str, Tuple[float, str, float]] = {}
+        
+        for key in distinct:
+            result = self.cache.get(key)
+            if result is not None:
+                results[key] = result
+        self.cache_stats["memory_hits"] += len(results)
+        
+        missing = [key for key in distinct if key not in results]
+        if missing and self.database is not None:
+            try:
+                rows = self.database.get_sentiments_by_text_hashes(missing)
+            except Exception:
+                # The persistent tier is an optimisation; fall back to the LLM
+                rows = {}
+            for key, row in rows.items():
+                results[key] = (row['sentiment_score'], row['sentiment_label'], row['confidence'])
+                self.cache.set(key, results[key])
+            self.cache_stats["database_hits"] += len(rows)
+            
+        queue = [(key, distinct[key]) for key in distinct if key not in results]
+        self.cache_stats["misses"] += len(queue)
+        
+        for _ in range(MAX_BATCH_ATTEMPTS):
+            if not queue:
+                break
+            requeued = []
+            batches = pack_batches(queue, token_budget, max_batch_size)
+            # Short per-request ids keep the prompt small and easy to echo back
+            replies = self.llm.map(
+                lambda batch: self._call_llm_batch({str(index + 1): text for index, (_, text) in enumerate(batch)}),
+                batches
+            )
+            self.cache_stats["batch_requests"] += len(batches)
+            
+            for batch, scored in zip(batches, replies):
+                for index, (key, _) in enumerate(batch):
+                    if str(index + 1) in scored:
+                        results[key] = scored[str(index + 1)]
+                        self.cache.set(key, results[key])
+                requeued += [(key, text) for key, text in batch if key not in results]
+            self.cache_stats["requeued"] += len(requeued)
+            queue = requeued
+            
+        for key, text in queue:
+            results[key] = self._call_llm(text)
+            self.cache.set(key, results[key])
+            
+        return [results[key] for key in keys]
         
+    def _sentiment_row(self, content_id: str, content_type: str, text: str,
+                       result: Tuple[float, str, float]) -> Dict[str, Any]:
+        """Build a sentiments row for analyzed content"""
+        sentiment_score, sentiment_label, confidence = result
         return {
-            "content_id": post_data['id'],
-            "content_type": "post",
+            "content_id": content_id,
+            "content_type": content_type,
             "sentiment_score": sentiment_score,
             "sentiment_label": sentiment_label,
-            "confidence": confidence
+            "confidence": confidence,
+            "text_hash": self.text_hash(text)
         }
         
+    def analyze_post(self, post_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze sentiment of a Reddit post
+        """
+        # Combine title and text for analysis
+        text_to_analyze = post_text(post_data)
+        
+        return self._sentiment_row(post_data['id'], "post", text_to_analyze, self.analyze_text(text_to_analyze))
+        
     def analyze_comment(self, comment_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyze sentiment of a Reddit comment
         """
-        sentiment_score, sentiment_label, confidence = self.analyze_text(comment_data['text'])
+        return self._sentiment_row(comment_data['id'], "comment", comment_data['text'],
+                                   self.analyze_text(comment_data['text']))
         
-        return {
-            "content_id": comment_data['id'],
-            "content_type": "comment",
-            "sentiment_score": sentiment_score,
-            "sentiment_label": sentiment_label,
-            "confidence": confidence
-        } 
\ No newline at end of file
+    def analyze_posts(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze sentiment of many Reddit posts with batched LLM requests
+        """
+        texts = [post_text(post) for post in posts]
+        return [
+            self._sentiment_row(post['id'], "post", text, result)
+            for post, text, result in zip(posts, texts, self.analyze_texts(texts))
+        ]
+        
+    def analyze_comments(self, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze sentiment of many Reddit comments with batched LLM requests
+        """
+        texts = [comment['text'] for comment in comments]
+        return [
+            self._sentiment_row(comment['id'], "comment", text, result)
+            for comment, text, result in zip(comments, texts, self.analyze_texts(texts))
+        ]
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Cache hits per tier, LLM misses and batch requests"""
+        return {**self.cache_stats, "memory_entries": len(self.cache)}
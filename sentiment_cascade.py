@@ -0,0 +1,325 @@
+from sentiment_analyzer import SentimentAnalyzer, normalize_text, text_hash, post_text
+from polarity_scorer import SEPARATOR, join_batch, batch_ids, previous_index
+from collections import deque
+from typing import Dict, List, Any, Tuple, Optional, Iterable
+import hashlib
+import os
+import re
+import threading
+import numpy as np
+
+# Part of the text_hash stored with locally scored rows, so they never match
+# the LLM's cache keys; bump LEXICON_VERSION whenever the lexicon or scoring changes
+LEXICON_MODEL = "finance-lexicon"
+LEXICON_VERSION = "1"
+
+# Texts whose local confidence is below this go to the LLM
+DEFAULT_CASCADE_THRESHOLD = 0.6
+# Fraction of locally accepted texts also sent to the LLM to measure divergence
+DEFAULT_SAMPLE_RATE = 0.02
+# Recent (text, local, LLM) pairs kept for inspection
+DIVERGENCE_SAMPLES = 20
+
+# Tickers whose mentions always get the LLM's reading, overridable with SENTIMENT_TRACKED_TICKERS
+DEFAULT_TRACKED_TICKERS = ("GME", "AMC", "TSLA", "NVDA", "AAPL", "SPY", "QQQ", "AMD", "PLTR", "MSFT")
+
+# Valence of finance and retail-trading words, between -1 and 1
+FINANCE_LEXICON = {
+    # Bullish
+    "bull": 0.6, "bullish": 0.8, "calls": 0.4, "long": 0.3, "buy": 0.4, "buying": 0.4, "bought": 0.3,
+    "moon": 0.8, "mooning": 0.9, "rocket": 0.7, "rally": 0.7, "rallying": 0.7, "surge": 0.7,
+    "surging": 0.7, "soar": 0.8, "soaring": 0.8, "breakout": 0.6, "rip": 0.5, "ripping": 0.6,
+    "squeeze": 0.5, "gain": 0.5, "gains": 0.6, "green": 0.5, "profit": 0.6, "profits": 0.6,
+    "beat": 0.5, "beats": 0.5, "upgrade": 0.6, "upgraded": 0.6, "outperform": 0.6, "undervalued": 0.5,
+    "strong": 0.5, "growth": 0.4, "momentum": 0.3, "tendies": 0.7, "printing": 0.6, "hodl": 0.4,
+    "hold": 0.2, "diamond": 0.4, "recovery": 0.5, "rebound": 0.5, "uptrend": 0.6, "ath": 0.6,
+    "dividend": 0.3, "win": 0.6, "winning": 0.6, "winner": 0.6, "good": 0.4, "great": 0.6,
+    "love": 0.5, "amazing": 0.7, "awesome": 0.7, "optimistic": 0.6, "confident": 0.5,
+    "\U0001F680": 0.7, "\U0001F4C8": 0.6, "\U0001F48E": 0.4, "\U0001F402": 0.6, "\U0001F911": 0.5,
+    # Bearish
+    "bear": -0.6, "bearish": -0.8, "puts": -0.4, "short": -0.3, "sell": -0.4, "selling": -0.4,
+    "sold": -0.3, "dump": -0.7, "dumping": -0.7, "crash": -0.9, "crashing": -0.9, "tank": -0.7,
+    "tanking": -0.8, "plunge": -0.8, "plunging": -0.8, "drop": -0.5, "dropping": -0.5, "fall": -0.4,
+    "falling": -0.5, "red": -0.5, "loss": -0.6, "losses": -0.7, "lost": -0.5, "miss": -0.5,
+    "missed": -0.5, "downgrade": -0.6, "downgraded": -0.6, "underperform": -0.6, "overvalued": -0.5,
+    "weak": -0.5, "recession": -0.7, "bubble": -0.5, "bagholder": -0.6, "bagholding": -0.6,
+    "bags": -0.4, "rekt": -0.8, "fud": -0.4, "scam": -0.8, "fraud": -0.9, "bankrupt": -0.9,
+    "bankruptcy": -0.9, "layoffs": -0.6, "downtrend": -0.6, "selloff": -0.7, "correction": -0.4,
+    "risky": -0.4, "fear": -0.6, "panic": -0.8, "worried": -0.5, "bad": -0.4, "terrible": -0.7,
+    "awful": -0.7, "hate": -0.5, "worst": -0.7, "worthless": -0.8,
+    "\U0001F4C9": -0.6, "\U0001F43B": -0.6, "\U0001F480": -0.4, "\U0001F62D": -0.4,
+}
+NEGATIONS = {"not", "no", "never", "nothing", "isn't", "aren't", "wasn't", "don't", "doesn't",
+             "didn't", "won't", "can't", "cannot", "hardly"}
+INTENSIFIERS = {"very": 1.5, "super": 1.5, "extremely": 1.8, "really": 1.3, "so": 1.3, "mega": 1.5,
+                "totally": 1.4, "slightly": 0.6, "somewhat": 0.7, "barely": 0.5}
+# A negation flips lexicon words up to this many tokens after it, within its clause
+NEGATION_WINDOW = 3
+CLAUSE_BREAKS = {".", ",", ";", ":", "!", "?", "but"}
+
+# Scaled score = sum / sqrt(sum^2 + ALPHA); each agreeing lexicon hit adds
+# evidence, so confidence = agreement * (1 - exp(-hits / EVIDENCE_SCALE))
+SCORE_ALPHA = 1.0
+EVIDENCE_SCALE = 2.0
+NEUTRAL_BAND = 0.05
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z']*|[.,;:!?]|[\U0001F300-\U0001FAFF]")
+# Tokens of a whole batch joined by join_batch, separators included
+BATCH_TOKEN_PATTERN = re.compile(f"{TOKEN_PATTERN.pattern}|{SEPARATOR}")
+TICKER_PATTERN = re.compile(r"\$?\b[A-Z]{1,5}\b")
+
+def tracked_tickers_from_env() -> Tuple[str, ...]:
+    """Tracked tickers from SENTIMENT_TRACKED_TICKERS (comma-separated), or the defaults"""
+    value = os.getenv("SENTIMENT_TRACKED_TICKERS")
+    if not value:
+        return DEFAULT_TRACKED_TICKERS
+    return tuple(symbol.strip().lstrip('$').upper() for symbol in value.split(",") if symbol.strip())
+
+def sample_fraction(text: str) -> float:
+    """A stable value in [0, 1) per text, so the same texts are sampled on every run"""
+    return int(hashlib.sha256(normalize_text(text).encode()).hexdigest()[:8], 16) / 2 ** 32
+
+def sentiment_label(score: float) -> str:
+    """positive, negative or neutral for a score"""
+    if score > NEUTRAL_BAND:
+        return "positive"
+    if score < -NEUTRAL_BAND:
+        return "negative"
+    return "neutral"
+
+class LexiconScorer:
+    """
+    Finance-aware lexicon sentiment, scored for a whole batch of texts at once
+
+    Like PolarityScorer, a batch is tokenised as one string, each distinct
+    token is looked up once, and the rules are applied with numpy over the
+    token arrays of all texts together: a negation flips the lexicon words
+    up to NEGATION_WINDOW tokens after it within its clause, and an
+    intensifier scales the next word. Per-text sums come from bincounts.
+    Confidence is high only when there are several hits that agree in
+    direction; a text with no lexicon words has confidence 0.
+    """
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None):
+        self.lexicon = dict(lexicon or FINANCE_LEXICON)
+
+    def _token_table(self, vocabulary: Dict[str, int]) -> Dict[str, np.ndarray]:
+        """Attributes of each distinct token, indexed by vocabulary id"""
+        size = len(vocabulary)
+        table = {
+            "valence": np.zeros(size), "boost": np.ones(size), "hit": np.zeros(size, dtype=bool),
+            "clause_break": np.zeros(size, dtype=bool), "negation": np.zeros(size, dtype=bool),
+            "intensifier": np.zeros(size, dtype=bool)
+        }
+        for token, index in vocabulary.items():
+            if token in CLAUSE_BREAKS:
+                table["clause_break"][index] = True
+            elif token in NEGATIONS:
+                table["negation"][index] = True
+            elif token in INTENSIFIERS:
+                table["intensifier"][index] = True
+                table["boost"][index] = INTENSIFIERS[token]
+            elif token in self.lexicon:
+                table["hit"][index] = True
+                table["valence"][index] = self.lexicon[token]
+        return table
+
+    def score_batch(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score many texts
+        Returns: (scores between -1 and 1, confidences between 0 and 1), one per text
+        """
+        count = len(texts)
+        vocabulary, ids, documents = batch_ids(BATCH_TOKEN_PATTERN.findall(join_batch(texts).lower()))
+        if not len(ids):
+            return np.zeros(count), np.zeros(count)
+        table = {name: values[ids] for name, values in self._token_table(vocabulary).items()}
+        hit, negation, intensifier = table["hit"], table["negation"], table["intensifier"]
+        positions = np.arange(len(ids))
+
+        # Negated: the latest negation or clause break before is a negation, close enough
+        opener = previous_index(negation | table["clause_break"], documents)
+        negated = (opener >= 0) & (positions - opener <= NEGATION_WINDOW)
+        negated[negated] = negation[opener[negated]]
+        # Boosted: the latest word before, skipping negations and clause breaks, is an intensifier
+        words = ~(negation | table["clause_break"])
+        before = previous_index(words, documents)
+        boosted = before >= 0
+        boosted[boosted] = intensifier[before[boosted]]
+        boost = np.where(boosted, table["boost"][np.maximum(before, 0)], 1.0)
+
+        valences = (table["valence"] * np.where(negated, -1.0, 1.0) * boost)[hit]
+        documents = documents[hit]
+        total = np.bincount(documents, weights=valences, minlength=count)
+        magnitude = np.bincount(documents, weights=np.abs(valences), minlength=count)
+        hits = np.bincount(documents, minlength=count)
+
+        scores = np.clip(total / np.sqrt(total * total + SCORE_ALPHA), -1.0, 1.0)
+        agreement = np.divide(np.abs(total), magnitude, out=np.zeros(count), where=magnitude > 0)
+        confidences = agreement * (1.0 - np.exp(-hits / EVIDENCE_SCALE))
+        return scores, confidences
+
+    def analyze_texts(self, texts: List[str]) -> List[Tuple[float, str, float]]:
+        """Returns (sentiment_score, sentiment_label, confidence) per text, like SentimentAnalyzer"""
+        scores, confidences = self.score_batch(texts)
+        return [
+            (float(score), sentiment_label(score), float(confidence))
+            for score, confidence in zip(scores, confidences)
+        ]
+
+class SentimentCascade:
+    """
+    Score every text with the local lexicon and only the uncertain ones with the LLM
+
+    A text is escalated to the LLM when its local confidence is below
+    threshold or it mentions a tracked ticker, whose sentiment feeds the
+    market views. All escalated texts of a call go to SentimentAnalyzer in one
+    batched, cached request set. A stable sample of the texts kept locally is
+    also sent, along with them, so get_stats() can report how far the local
+    scores are from the LLM's where the local score is what gets stored.
+    """
+    def __init__(self, analyzer: SentimentAnalyzer, threshold: Optional[float] = None,
+                 tracked_tickers: Optional[Iterable[str]] = None, sample_rate: float = DEFAULT_SAMPLE_RATE,
+                 scorer: Optional[LexiconScorer] = None):
+        self.analyzer = analyzer
+        self.scorer = scorer or LexiconScorer()
+        if threshold is None:
+            threshold = float(os.getenv("SENTIMENT_CASCADE_THRESHOLD", DEFAULT_CASCADE_THRESHOLD))
+        self.threshold = threshold
+        self.tracked_tickers = set(tracked_tickers if tracked_tickers is not None else tracked_tickers_from_env())
+        self.sample_rate = sample_rate
+
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=DIVERGENCE_SAMPLES)
+        self.stats = {
+            "texts": 0,
+            "escalated": 0,
+            "escalated_low_confidence": 0,
+            "escalated_ticker": 0,
+            "sampled": 0,
+            "sampled_abs_divergence": 0.0,
+            "sampled_label_matches": 0,
+            "escalated_abs_divergence": 0.0,
+            "escalated_label_matches": 0
+        }
+
+    def mentions_tracked_ticker(self, text: str) -> bool:
+        """Whether a text names a tracked ticker, as $TSLA or TSLA"""
+        return any(match.lstrip('$') in self.tracked_tickers for match in TICKER_PATTERN.findall(text or ''))
+
+    def text_hash(self, text: str, escalated: bool) -> str:
+        """The text_hash stored with a result: the LLM's cache key, or a lexicon key"""
+        if escalated:
+            return self.analyzer.text_hash(text)
+        return text_hash(text, LEXICON_MODEL, LEXICON_VERSION)
+
+    def _route(self, texts: List[str]) -> Tuple[List[Tuple[float, str, float]], List[bool], List[bool]]:
+        """Score locally and decide, per text, whether to escalate and whether to sample"""
+        local = self.scorer.analyze_texts(texts)
+        low_confidence = [confidence < self.threshold for _, _, confidence in local]
+        ticker = [self.mentions_tracked_ticker(text) for text in texts]
+        escalate = [low or mentioned for low, mentioned in zip(low_confidence, ticker)]
+        sample = [not up and sample_fraction(text) < self.sample_rate for text, up in zip(texts, escalate)]
+
+        with self.lock:
+            self.stats["texts"] += len(texts)
+            self.stats["escalated"] += sum(escalate)
+            self.stats["escalated_low_confidence"] += sum(low_confidence)
+            self.stats["escalated_ticker"] += sum(mentioned and not low for low, mentioned in zip(low_confidence, ticker))
+        return local, escalate, sample
+
+    def _record_divergence(self, text: str, local: Tuple[float, str, float],
+                           remote: Tuple[float, str, float], escalated: bool) -> None:
+        prefix = "escalated" if escalated else "sampled"
+        with self.lock:
+            if not escalated:
+                self.stats["sampled"] += 1
+            self.stats[f"{prefix}_abs_divergence"] += abs(float(local[0]) - float(remote[0]))
+            self.stats[f"{prefix}_label_matches"] += local[1] == str(remote[1]).lower()
+            self.samples.append({
+                "text": normalize_text(text)[:120],
+                "escalated": escalated,
+                "local_score": round(float(local[0]), 3),
+                "llm_score": float(remote[0])
+            })
+
+    def analyze_results(self, texts: List[str]) -> List[Tuple[Tuple[float, str, float], bool]]:
+        """
+        Analyze many texts through the cascade
+        Returns ((sentiment_score, sentiment_label, confidence), escalated) per text, in order.
+        """
+        local, escalate, sample = self._route(texts)
+        remote_indexes = [index for index in range(len(texts)) if escalate[index] or sample[index]]
+        remote = self.analyzer.analyze_texts([texts[index] for index in remote_indexes]) if remote_indexes else []
+
+        results = [(result, False) for result in local]
+        for index, result in zip(remote_indexes, remote):
+            self._record_divergence(texts[index], local[index], result, escalate[index])
+            if escalate[index]:
+                results[index] = (result, True)
+        return results
+
+    def analyze_texts(self, texts: List[str]) -> List[Tuple[float, str, float]]:
+        """Returns (sentiment_score, sentiment_label, confidence) per text, in order"""
+        return [result for result, _ in self.analyze_results(texts)]
+
+    def analyze_text(self, text: str) -> Tuple[float, str, float]:
+        return self.analyze_texts([text])[0]
+
+    def _sentiment_rows(self, content_type: str, ids: List[str], texts: List[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for content_id, text, (result, escalated) in zip(ids, texts, self.analyze_results(texts)):
+            sentiment_score, sentiment_label, confidence = result
+            rows.append({
+                "content_id": content_id,
+                "content_type": content_type,
+                "sentiment_score": sentiment_score,
+                "sentiment_label": sentiment_label,
+                "confidence": confidence,
+                "text_hash": self.text_hash(text, escalated)
+            })
+        return rows
+
+    def analyze_post(self, post_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze sentiment of a Reddit post
+        """
+        return self.analyze_posts([post_data])[0]
+
+    def analyze_comment(self, comment_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze sentiment of a Reddit comment
+        """
+        return self.analyze_comments([comment_data])[0]
+
+    def analyze_posts(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze sentiment of many Reddit posts, escalating only the uncertain ones
+        """
+        return self._sentiment_rows("post", [post['id'] for post in posts], [post_text(post) for post in posts])
+
+    def analyze_comments(self, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze sentiment of many Reddit comments, escalating only the uncertain ones
+        """
+        return self._sentiment_rows("comment", [comment['id'] for comment in comments],
+                                    [comment['text'] for comment in comments])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Escalation fraction and local-vs-LLM divergence, overall and on recent samples"""
+        with self.lock:
+            stats = dict(self.stats)
+            samples = list(self.samples)
+        texts, escalated, sampled = stats["texts"], stats["escalated"], stats["sampled"]
+        return {
+            **stats,
+            "threshold": self.threshold,
+            "sample_rate": self.sample_rate,
+            "escalation_fraction": escalated / texts if texts else 0.0,
+            # Where the local score is kept: the error the cascade accepts to save LLM calls
+            "sampled_mean_abs_divergence": stats["sampled_abs_divergence"] / sampled if sampled else None,
+            "sampled_label_agreement": stats["sampled_label_matches"] / sampled if sampled else None,
+            # Where the LLM overrode the local score
+            "escalated_mean_abs_divergence": stats["escalated_abs_divergence"] / escalated if escalated else None,
+            "escalated_label_agreement": stats["escalated_label_matches"] / escalated if escalated else None,
+            "samples": samples
+        }
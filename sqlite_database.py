@@ -0,0 +1,705 @@
+from database import (StorageBackend, Database, Columns, DEFAULT_CHUNK_SIZE, DEFAULT_PAGE_SIZE,
+                      UPSERT_KEYS, SENTIMENT_RESULT_COLUMNS, HASH_LOOKUP_SIZE)
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple, Sequence
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "marketmood.db")
+
+# schema.sql and schema_updates.sql translated to SQLite. Timestamps are stored as
+# ISO-8601 text in UTC with microseconds, so they compare and sort as strings.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    text TEXT,
+    score INTEGER NOT NULL,
+    created_utc TEXT NOT NULL,
+    num_comments INTEGER NOT NULL,
+    subreddit TEXT NOT NULL,
+    url TEXT,
+    author TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    post_id TEXT REFERENCES posts(id),
+    text TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    created_utc TEXT NOT NULL,
+    author TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000', 'now')),
+    subreddit TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sentiments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_id TEXT NOT NULL,
+    content_type TEXT NOT NULL CHECK (content_type IN ('post', 'comment')),
+    sentiment_score REAL NOT NULL,
+    sentiment_label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    text_hash TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_posts_subreddit ON posts(subreddit);
+CREATE INDEX IF NOT EXISTS idx_posts_created_utc ON posts(created_utc);
+CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id);
+CREATE INDEX IF NOT EXISTS idx_comments_created_utc ON comments(created_utc);
+CREATE INDEX IF NOT EXISTS idx_sentiments_content_id ON sentiments(content_id);
+CREATE INDEX IF NOT EXISTS idx_sentiments_content_type ON sentiments(content_type);
+CREATE INDEX IF NOT EXISTS idx_sentiments_created_at ON sentiments(created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sentiments_content ON sentiments(content_type, content_id);
+CREATE INDEX IF NOT EXISTS idx_sentiments_text_hash ON sentiments(text_hash);
+
+CREATE TABLE IF NOT EXISTS daily_market_analysis (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL UNIQUE,
+    stock_mentions TEXT NOT NULL,
+    word_frequencies TEXT NOT NULL,
+    word_error_bound INTEGER NOT NULL DEFAULT 0,
+    fear_greed_index REAL NOT NULL,
+    market_sentiment TEXT NOT NULL,
+    trending_topics TEXT NOT NULL,
+    risk_indicators TEXT NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS collection_cursors (
+    subreddit TEXT NOT NULL,
+    listing TEXT NOT NULL,
+    fullname TEXT NOT NULL,
+    created_utc REAL NOT NULL,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000', 'now')),
+    PRIMARY KEY (subreddit, listing)
+);
+
+CREATE INDEX IF NOT EXISTS idx_posts_created_utc_id ON posts(created_utc DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_comments_created_utc_id ON comments(created_utc DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS ticker_mentions (
+    content_id TEXT NOT NULL,
+    content_type TEXT NOT NULL CHECK (content_type IN ('post', 'comment')),
+    symbol TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    mention_count INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    sentiment REAL NOT NULL,
+    PRIMARY KEY (content_type, content_id, symbol)
+);
+
+CREATE TABLE IF NOT EXISTS ticker_mentions_hourly (
+    hour TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    content_count INTEGER NOT NULL DEFAULT 0,
+    mention_count INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    sentiment_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, subreddit, symbol)
+);
+
+CREATE TRIGGER IF NOT EXISTS ticker_mentions_rollup_insert AFTER INSERT ON ticker_mentions BEGIN
+    INSERT INTO ticker_mentions_hourly
+        (hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum)
+    VALUES (NEW.hour, NEW.subreddit, NEW.symbol, 1, NEW.mention_count, NEW.score, NEW.sentiment)
+    ON CONFLICT (hour, subreddit, symbol) DO UPDATE SET
+        content_count = content_count + excluded.content_count,
+        mention_count = mention_count + excluded.mention_count,
+        score_sum = score_sum + excluded.score_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum;
+END;
+
+CREATE TRIGGER IF NOT EXISTS ticker_mentions_rollup_delete AFTER DELETE ON ticker_mentions BEGIN
+    INSERT INTO ticker_mentions_hourly
+        (hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum)
+    VALUES (OLD.hour, OLD.subreddit, OLD.symbol, -1, -OLD.mention_count, -OLD.score, -OLD.sentiment)
+    ON CONFLICT (hour, subreddit, symbol) DO UPDATE SET
+        content_count = content_count + excluded.content_count,
+        mention_count = mention_count + excluded.mention_count,
+        score_sum = score_sum + excluded.score_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum;
+END;
+
+CREATE TRIGGER IF NOT EXISTS ticker_mentions_rollup_update AFTER UPDATE ON ticker_mentions BEGIN
+    INSERT INTO ticker_mentions_hourly
+        (hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum)
+    VALUES (OLD.hour, OLD.subreddit, OLD.symbol, -1, -OLD.mention_count, -OLD.score, -OLD.sentiment)
+    ON CONFLICT (hour, subreddit, symbol) DO UPDATE SET
+        content_count = content_count + excluded.content_count,
+        mention_count = mention_count + excluded.mention_count,
+        score_sum = score_sum + excluded.score_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum;
+    INSERT INTO ticker_mentions_hourly
+        (hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum)
+    VALUES (NEW.hour, NEW.subreddit, NEW.symbol, 1, NEW.mention_count, NEW.score, NEW.sentiment)
+    ON CONFLICT (hour, subreddit, symbol) DO UPDATE SET
+        content_count = content_count + excluded.content_count,
+        mention_count = mention_count + excluded.mention_count,
+        score_sum = score_sum + excluded.score_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum;
+END;
+"""
+
+# Conflict targets for upserts, as PostgREST infers them from the primary keys
+TABLE_KEYS = {
+    'posts': ('id',),
+    'comments': ('id',),
+    'collection_cursors': ('subreddit', 'listing'),
+    **UPSERT_KEYS,
+}
+
+# Columns added after a table was first created, with the SQL run to bring an
+# existing database file up to date before the schema's indexes are built
+SCHEMA_MIGRATIONS = [
+    ('sentiments', 'text_hash', """
+        ALTER TABLE sentiments ADD COLUMN text_hash TEXT;
+        DELETE FROM sentiments WHERE id NOT IN (
+            SELECT MAX(id) FROM sentiments GROUP BY content_type, content_id
+        );
+    """),
+    ('comments', 'subreddit', "ALTER TABLE comments ADD COLUMN subreddit TEXT;"),
+    ('daily_market_analysis', 'word_error_bound',
+     "ALTER TABLE daily_market_analysis ADD COLUMN word_error_bound INTEGER NOT NULL DEFAULT 0;"),
+]
+
+# Columns normalised to UTC text so range filters compare correctly
+TIMESTAMP_COLUMNS = {
+    'posts': ('created_utc',),
+    'comments': ('created_utc',),
+    'sentiments': ('created_at',),
+}
+
+# JSONB columns on Supabase; stored as JSON text and decoded on read
+JSON_COLUMNS = {
+    'daily_market_analysis': ('stock_mentions', 'word_frequencies', 'market_sentiment',
+                              'trending_topics', 'risk_indicators'),
+}
+
+# Embedded resources that select lists may name, as PostgREST resolves them from foreign keys
+RELATIONS = {
+    ('comments', 'posts'): 'LEFT JOIN "posts" ON "posts"."id" = "comments"."post_id"',
+}
+
+JSON_PATH_PATTERN = re.compile(r'^(?:(\w+):)?(\w+)(->>?)(\w+)$')
+EMBED_PATTERN = re.compile(r'^(\w+)\((.*)\)$')
+
+def _timestamp(value: Any) -> Optional[str]:
+    """Normalise a datetime or ISO-8601 string to naive UTC text with microseconds"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec='microseconds')
+
+def _split_columns(columns: Columns) -> List[str]:
+    """Split a select list, keeping embedded resources like posts(id,subreddit) whole"""
+    if isinstance(columns, str):
+        return [column.strip() for column in re.split(r',(?![^()]*\))', columns) if column.strip()]
+    return list(columns)
+
+class SQLiteDatabase(StorageBackend):
+    """
+    Storage backend on an embedded SQLite file
+
+    Runs the same reads and writes as the Supabase backend without a network
+    or credentials, for offline runs, load tests at realistic row counts and
+    as a local read replica (see replicate_from). The database runs in WAL
+    mode so readers never block the writer, and each thread uses its own
+    connection. Bulk writes go in as one transaction per chunk.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SQLITE_PATH") or DEFAULT_SQLITE_PATH
+        self.thread_connections = threading.local()
+
+        if self.path == ":memory:":
+            # Per-thread connections would each get a private database; share one
+            self.target, self.uri = f"file:marketmood-{id(self)}?mode=memory&cache=shared", True
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.target, self.uri = self.path, False
+
+        # Also keeps a shared in-memory database alive for the life of this object
+        self.connection = self._connection()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        for table, column, migration in SCHEMA_MIGRATIONS:
+            existing = [row['name'] for row in self.connection.execute(f'PRAGMA table_info("{table}")')]
+            if existing and column not in existing:
+                self.connection.executescript(migration)
+        self.connection.executescript(SCHEMA)
+        self.table_columns = {
+            table: [row['name'] for row in self.connection.execute(f'PRAGMA table_info("{table}")')]
+            for (table,) in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection owned by the calling thread"""
+        connection = getattr(self.thread_connections, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.target, uri=self.uri, timeout=30)
+            connection.row_factory = sqlite3.Row
+            # WAL keeps the file consistent at NORMAL; a crash can only lose the last commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.thread_connections.connection = connection
+        return connection
+
+    def _check_columns(self, table: str, columns: Sequence[str]) -> None:
+        """Reject unknown tables and columns; names are interpolated into SQL"""
+        known = self.table_columns.get(table)
+        if known is None:
+            raise ValueError(f"Unknown table: {table}")
+        unknown = [column for column in columns if column not in known]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {', '.join(unknown)}")
+
+    def _projection(self, table: str, columns: Columns,
+                    required: Sequence[str] = ()) -> Tuple[str, str, List[str]]:
+        """
+        Translate a PostgREST select list into SQL
+        Returns the select list, the joins it needs and the result columns holding JSON.
+        """
+        self._check_columns(table, ())
+        columns = _split_columns(columns)
+        if '*' in columns:
+            index = columns.index('*')
+            columns[index:index + 1] = self.table_columns[table]
+        columns += [column for column in required if column not in columns]
+
+        selected, joins = [], []
+        json_columns = [column for column in JSON_COLUMNS.get(table, ()) if column in columns]
+        for column in columns:
+            path = JSON_PATH_PATTERN.match(column)
+            embed = EMBED_PATTERN.match(column)
+            if path:
+                alias, source, operator, key = path.groups()
+                self._check_columns(table, (source,))
+                alias = alias or key
+                selected.append(f'"{table}"."{source}" {operator} \'$.{key}\' AS "{alias}"')
+                if operator == '->':
+                    json_columns.append(alias)
+            elif embed:
+                relation, inner = embed.groups()
+                join = RELATIONS.get((table, relation))
+                if join is None:
+                    raise ValueError(f"No relation from {table} to {relation}")
+                inner = _split_columns(inner)
+                self._check_columns(relation, inner)
+                selected += [f'"{relation}"."{name}" AS "{relation}.{name}"' for name in inner]
+                joins.append(join)
+            else:
+                self._check_columns(table, (column,))
+                selected.append(f'"{table}"."{column}"')
+
+        return ', '.join(selected), ' '.join(joins), json_columns
+
+    def _to_dict(self, row: sqlite3.Row, json_columns: Sequence[str]) -> Dict[str, Any]:
+        """Convert a result row, decoding JSON and nesting embedded resources like PostgREST"""
+        record: Dict[str, Any] = {}
+        embedded: Dict[str, Dict[str, Any]] = {}
+        for key in row.keys():
+            value = row[key]
+            if key in json_columns and value is not None:
+                value = json.loads(value)
+            if '.' in key:
+                relation, column = key.split('.', 1)
+                embedded.setdefault(relation, {})[column] = value
+            else:
+                record[key] = value
+        for relation, values in embedded.items():
+            # A missing parent row comes back as null, not as a row of nulls
+            record[relation] = values if any(value is not None for value in values.values()) else None
+        return record
+
+    def _select(self, table: str, columns: Columns, where: str = "", params: Tuple = (),
+                order: str = "", limit: Optional[int] = None, offset: int = 0,
+                required: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """Run a projected SELECT on one table and return its rows as dicts"""
+        selected, joins, json_columns = self._projection(table, columns, required)
+        sql = f'SELECT {selected} FROM "{table}" {joins}'
+        if where:
+            sql += f' WHERE {where}'
+        if order:
+            sql += f' ORDER BY {order}'
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params = params + (limit, offset)
+        return [self._to_dict(row, json_columns) for row in self._connection().execute(sql, params)]
+
+    def _prepare(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Encode a row for storage: UTC timestamps and JSON documents as text"""
+        row = dict(row)
+        for column in TIMESTAMP_COLUMNS.get(table, ()):
+            if column in row:
+                row[column] = _timestamp(row[column])
+        for column in JSON_COLUMNS.get(table, ()):
+            if column in row:
+                row[column] = json.dumps(row[column])
+        return row
+
+    def _write_chunk(self, table: str, rows: List[Dict[str, Any]], upsert: bool) -> None:
+        """Write one chunk of rows in a single transaction"""
+        rows = [self._prepare(table, row) for row in rows]
+
+        # Rows with different columns need different statements; group them
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+
+        connection = self._connection()
+        with connection:
+            for columns, group in groups.items():
+                self._check_columns(table, columns)
+                names = ', '.join(f'"{column}"' for column in columns)
+                placeholders = ', '.join('?' for _ in columns)
+                sql = f'INSERT INTO "{table}" ({names}) VALUES ({placeholders})'
+                if upsert:
+                    key = TABLE_KEYS[table]
+                    updates = ', '.join(f'"{column}" = excluded."{column}"' for column in columns if column not in key)
+                    action = f'UPDATE SET {updates}' if updates else 'NOTHING'
+                    sql += f' ON CONFLICT ({", ".join(key)}) DO {action}'
+                connection.executemany(sql, [tuple(row[column] for column in columns) for row in group])
+
+    def _update(self, table: str, row_id: str, fields: Dict[str, Any]) -> None:
+        """Update only the given fields of one row"""
+        fields = self._prepare(table, fields)
+        self._check_columns(table, list(fields))
+        assignments = ', '.join(f'"{column}" = ?' for column in fields)
+        connection = self._connection()
+        with connection:
+            connection.execute(f'UPDATE "{table}" SET {assignments} WHERE "id" = ?', (*fields.values(), row_id))
+
+    def _update_chunk(self, table: str, updates: List[Dict[str, Any]]) -> None:
+        """Apply one chunk of partial updates in a single transaction"""
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for fields in updates:
+            fields = self._prepare(table, fields)
+            groups.setdefault(tuple(column for column in fields if column != 'id'), []).append(fields)
+
+        connection = self._connection()
+        with connection:
+            for columns, group in groups.items():
+                self._check_columns(table, columns)
+                assignments = ', '.join(f'"{column}" = ?' for column in columns)
+                connection.executemany(f'UPDATE "{table}" SET {assignments} WHERE "id" = ?',
+                                       [(*(fields[column] for column in columns), fields['id']) for fields in group])
+
+    def store_post(self, post_data: Dict[str, Any]) -> None:
+        """Store a Reddit post in the database"""
+        try:
+            self._write_chunk('posts', [post_data], upsert=True)
+        except Exception as e:
+            print(f"Error storing post: {str(e)}")
+            raise
+
+    def store_comment(self, comment_data: Dict[str, Any]) -> None:
+        """Store a Reddit comment in the database"""
+        try:
+            self._write_chunk('comments', [comment_data], upsert=True)
+        except Exception as e:
+            print(f"Error storing comment: {str(e)}")
+            raise
+
+    def store_sentiment(self, sentiment_data: Dict[str, Any]) -> None:
+        """Store sentiment analysis results, replacing any earlier result for the same content"""
+        try:
+            self._write_chunk('sentiments', [sentiment_data], upsert=True)
+        except Exception as e:
+            print(f"Error storing sentiment: {str(e)}")
+            raise
+
+    def update_post(self, post_id: str, fields: Dict[str, Any]) -> None:
+        """Update only the given fields of a stored Reddit post"""
+        try:
+            self._update('posts', post_id, fields)
+        except Exception as e:
+            print(f"Error updating post: {str(e)}")
+            raise
+
+    def update_comment(self, comment_id: str, fields: Dict[str, Any]) -> None:
+        """Update only the given fields of a stored Reddit comment"""
+        try:
+            self._update('comments', comment_id, fields)
+        except Exception as e:
+            print(f"Error updating comment: {str(e)}")
+            raise
+
+    def get_collection_cursor(self, subreddit: str, listing: str) -> Optional[Dict[str, Any]]:
+        """Get the incremental collection high-water mark for a subreddit listing"""
+        try:
+            rows = self._select('collection_cursors', '*', '"subreddit" = ? AND "listing" = ?',
+                                (subreddit, listing), limit=1)
+            return rows[0] if rows else None
+        except Exception as e:
+            print(f"Error getting collection cursor: {str(e)}")
+            raise
+
+    def store_collection_cursor(self, cursor_data: Dict[str, Any]) -> None:
+        """Store the incremental collection high-water mark for a subreddit listing"""
+        try:
+            self._write_chunk('collection_cursors', [{
+                **cursor_data,
+                "updated_at": datetime.utcnow().isoformat()
+            }], upsert=True)
+        except Exception as e:
+            print(f"Error storing collection cursor: {str(e)}")
+            raise
+
+    def get_post(self, post_id: str, columns: Columns = '*') -> Optional[Dict[str, Any]]:
+        """Get a single post by id"""
+        try:
+            rows = self._select('posts', columns, '"posts"."id" = ?', (post_id,), limit=1)
+            return rows[0] if rows else None
+        except Exception as e:
+            print(f"Error getting post: {str(e)}")
+            raise
+
+    def get_posts_by_subreddit(self, subreddit: str, limit: int = 100, columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get posts from a specific subreddit"""
+        try:
+            return self._select('posts', columns, '"posts"."subreddit" = ?', (subreddit,),
+                                order='"posts"."created_utc" DESC', limit=limit)
+        except Exception as e:
+            print(f"Error getting posts: {str(e)}")
+            raise
+
+    def get_comments_by_post(self, post_id: str, limit: int = 100, columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get comments for a specific post"""
+        try:
+            return self._select('comments', columns, '"comments"."post_id" = ?', (post_id,),
+                                order='"comments"."created_utc" DESC', limit=limit)
+        except Exception as e:
+            print(f"Error getting comments: {str(e)}")
+            raise
+
+    def _page_by_time_range(self, table: str, start_time: datetime, end_time: datetime,
+                            page: int, page_size: int, columns: Columns) -> List[Dict[str, Any]]:
+        """Read one offset page of a table inside a time range, newest first"""
+        return self._select(
+            table, columns,
+            f'"{table}"."created_utc" >= ? AND "{table}"."created_utc" <= ?',
+            (_timestamp(start_time), _timestamp(end_time)),
+            order=f'"{table}"."created_utc" DESC',
+            limit=page_size, offset=(page - 1) * page_size
+        )
+
+    def get_posts_by_time_range(self, start_time: datetime, end_time: datetime, page: int = 1, page_size: int = 50,
+                                columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get posts within a time range with pagination"""
+        try:
+            return self._page_by_time_range('posts', start_time, end_time, page, page_size, columns)
+        except Exception as e:
+            print(f"Error getting posts by time range: {e}")
+            return []
+
+    def get_comments_by_time_range(self, start_time: datetime, end_time: datetime, page: int = 1, page_size: int = 50,
+                                   columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get comments within a time range with pagination"""
+        try:
+            return self._page_by_time_range('comments', start_time, end_time, page, page_size, columns)
+        except Exception as e:
+            print(f"Error getting comments by time range: {e}")
+            return []
+
+    def fetch_columns(self, table: str, ids: List[str], columns: Sequence[str]) -> List[Dict[str, Any]]:
+        """Read some columns, plus id, of the rows with the given ids"""
+        try:
+            placeholders = ', '.join('?' for _ in ids)
+            return self._select(table, columns, f'"{table}"."id" IN ({placeholders})', tuple(ids),
+                                required=('id',))
+        except Exception as e:
+            print(f"Error loading {', '.join(columns)} for {table}: {str(e)}")
+            raise
+
+    def _read_time_range_page(self, table: str, start_time: datetime, end_time: datetime, size: int,
+                              columns: Columns, boundary: Optional[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Read one keyset page of a time range, newest first"""
+        where = f'"{table}"."created_utc" >= ? AND "{table}"."created_utc" <= ?'
+        params: Tuple = (_timestamp(start_time), _timestamp(end_time))
+        if boundary:
+            created_utc, row_id = boundary
+            # Row values compare lexicographically, so this walks the (created_utc, id) index
+            where += f' AND ("{table}"."created_utc", "{table}"."id") < (?, ?)'
+            params += (created_utc, row_id)
+
+        return self._select(table, columns, where, params,
+                            order=f'"{table}"."created_utc" DESC, "{table}"."id" DESC',
+                            limit=size, required=('id', 'created_utc'))
+
+    def get_sentiment_by_time_range(self, start_time: datetime, end_time: datetime,
+                                    columns: Columns = '*') -> List[Dict[str, Any]]:
+        """Get sentiment analysis results within a time range"""
+        try:
+            return self._select('sentiments', columns, '"created_at" >= ? AND "created_at" <= ?',
+                                (_timestamp(start_time), _timestamp(end_time)), order='"created_at" DESC')
+        except Exception as e:
+            print(f"Error getting sentiment by time range: {str(e)}")
+            raise
+
+    def get_sentiment_by_text_hash(self, text_hash: str,
+                                   columns: Columns = SENTIMENT_RESULT_COLUMNS) -> Optional[Dict[str, Any]]:
+        """Get the latest stored sentiment result for a text hash"""
+        try:
+            rows = self._select('sentiments', columns, '"text_hash" = ?', (text_hash,),
+                                order='"created_at" DESC', limit=1)
+            return rows[0] if rows else None
+        except Exception as e:
+            print(f"Error getting sentiment by text hash: {str(e)}")
+            raise
+
+    def get_sentiments_by_text_hashes(self, text_hashes: List[str],
+                                      columns: Columns = SENTIMENT_RESULT_COLUMNS) -> Dict[str, Dict[str, Any]]:
+        """Get a stored sentiment result for each of many text hashes"""
+        results: Dict[str, Dict[str, Any]] = {}
+        try:
+            for offset in range(0, len(text_hashes), HASH_LOOKUP_SIZE):
+                chunk = text_hashes[offset:offset + HASH_LOOKUP_SIZE]
+                placeholders = ', '.join('?' for _ in chunk)
+                for row in self._select('sentiments', columns, f'"text_hash" IN ({placeholders})', tuple(chunk),
+                                        order='"created_at" DESC', required=('text_hash',)):
+                    results.setdefault(row['text_hash'], row)
+            return results
+        except Exception as e:
+            print(f"Error getting sentiments by text hash: {str(e)}")
+            raise
+
+    def _write_daily_analysis(self, row: Dict[str, Any]) -> None:
+        """Upsert the daily_market_analysis row for row['date']"""
+        self._write_chunk('daily_market_analysis', [row], upsert=True)
+
+    def _read_latest_market_analysis(self) -> Optional[Dict[str, Any]]:
+        """Read the daily_market_analysis row with the latest date"""
+        rows = self._select('daily_market_analysis', '*', order='"date" DESC', limit=1)
+        return rows[0] if rows else None
+
+    def get_market_analysis_history(self, start_date, end_date=None,
+                                    columns: Columns = ('date', 'fear_greed_index')) -> List[Dict[str, Any]]:
+        """
+        Get daily market analysis rows by date, oldest first
+        Columns may be JSON paths such as 'fear_greed_score:market_sentiment->fear_greed_score'.
+        """
+        try:
+            where, params = '"date" >= ?', (start_date.isoformat(),)
+            if end_date is not None:
+                where, params = where + ' AND "date" <= ?', params + (end_date.isoformat(),)
+            return self._select('daily_market_analysis', columns, where, params, order='"date"')
+        except Exception as e:
+            print(f"Error getting market analysis history: {str(e)}")
+            raise
+
+    def replace_ticker_mentions(self, contents: List[Dict[str, Any]]) -> None:
+        """
+        Replace the ticker mentions of a batch of posts/comments in one transaction
+        The hourly rollup is adjusted by triggers, so repeats never double count.
+        """
+        if not contents:
+            return
+        try:
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    'DELETE FROM ticker_mentions WHERE content_id = ? AND content_type = ?',
+                    [(content['content_id'], content['content_type']) for content in contents]
+                )
+                connection.executemany(
+                    'INSERT INTO ticker_mentions '
+                    '(content_id, content_type, symbol, hour, subreddit, mention_count, score, sentiment) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [
+                        (content['content_id'], content['content_type'], mention['symbol'],
+                         _timestamp(mention['hour']), mention['subreddit'], mention['mention_count'],
+                         mention['score'], mention['sentiment'])
+                        for content in contents
+                        for mention in content['mentions']
+                    ]
+                )
+        except Exception as e:
+            print(f"Error storing ticker mentions: {str(e)}")
+            raise
+
+    def get_ticker_mentions_window(self, start_time: datetime, end_time: datetime,
+                                   max_symbols: int = 100) -> List[Dict[str, Any]]:
+        """Get per-symbol totals from the hourly ticker rollup, most mentioned first"""
+        try:
+            rows = self._connection().execute(
+                'SELECT symbol, SUM(content_count) AS content_count, SUM(mention_count) AS mention_count, '
+                'SUM(score_sum) AS score_sum, SUM(sentiment_sum) AS sentiment_sum '
+                'FROM ticker_mentions_hourly WHERE hour >= ? AND hour <= ? '
+                'GROUP BY symbol HAVING SUM(mention_count) > 0 '
+                'ORDER BY SUM(mention_count) DESC, symbol LIMIT ?',
+                (_timestamp(start_time.replace(minute=0, second=0, microsecond=0)), _timestamp(end_time), max_symbols)
+            )
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error getting ticker mentions: {str(e)}")
+            raise
+
+    def rebuild_ticker_mentions_hourly(self) -> None:
+        """Regenerate the hourly ticker rollup from the per-content mentions"""
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute('DELETE FROM ticker_mentions_hourly')
+                connection.execute(
+                    'INSERT INTO ticker_mentions_hourly '
+                    '(hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum) '
+                    'SELECT hour, subreddit, symbol, COUNT(*), SUM(mention_count), SUM(score), SUM(sentiment) '
+                    'FROM ticker_mentions GROUP BY hour, subreddit, symbol'
+                )
+        except Exception as e:
+            print(f"Error rebuilding ticker rollup: {str(e)}")
+            raise
+
+    def replicate_from(self, source: StorageBackend, start_time: datetime, end_time: datetime,
+                       page_size: int = DEFAULT_PAGE_SIZE, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+        """
+        Copy posts, comments, sentiments and daily analyses in a time range from another backend
+        Rows are upserted, so running it again refreshes the replica instead of duplicating it.
+        """
+        counts = {"posts": 0, "comments": 0, "sentiments": 0, "daily_market_analysis": 0}
+
+        for table, rows in (('posts', source.iter_posts_by_time_range(start_time, end_time, page_size)),
+                            ('comments', source.iter_comments_by_time_range(start_time, end_time, page_size))):
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    self._store_chunks(table, batch, chunk_size)
+                    counts[table] += len(batch)
+                    batch = []
+            self._store_chunks(table, batch, chunk_size)
+            counts[table] += len(batch)
+
+        sentiments = source.get_sentiment_by_time_range(start_time, end_time)
+        self.store_sentiments(sentiments, chunk_size)
+        counts["sentiments"] = len(sentiments)
+
+        analyses = source.get_market_analysis_history(start_time.date(), end_time.date(), columns='*')
+        self._store_chunks('daily_market_analysis', analyses, chunk_size, key='date')
+        counts["daily_market_analysis"] = len(analyses)
+
+        return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the embedded SQLite storage backend")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    replicate = subcommands.add_parser("replicate", help="Copy recent Supabase rows into the SQLite database")
+    replicate.add_argument("--hours", type=int, default=24, help="How many hours back to copy")
+    replicate.add_argument("--path", default=None, help="SQLite file, defaults to SQLITE_PATH or data/marketmood.db")
+    args = parser.parse_args()
+
+    end_time = datetime.utcnow()
+    counts = SQLiteDatabase(args.path).replicate_from(Database(), end_time - timedelta(hours=args.hours), end_time)
+    print(json.dumps(counts))
+
+if __name__ == "__main__":
+    main()
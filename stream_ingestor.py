@@ -0,0 +1,139 @@
+from datetime import datetime
+from reddit_collector import RedditCollector
+from database import StorageBackend, get_database
+from change_detector import ChangeDetector
+from ticker_rollup import TickerRollup
+from write_behind import WriteBehindWriter
+from typing import List, Optional
+import logging
+import signal
+import threading
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before reconnecting a stream that failed
+RECONNECT_DELAY = 5.0
+
+class StreamIngestor:
+    """
+    Follow the submission and comment streams of the target subreddits and
+    write what arrives to the database in batches
+
+    Stream threads hand records to a write-behind writer, which coalesces
+    repeats and flushes when a batch reaches batch_size or its oldest record
+    is flush_interval seconds old. Its buffer holds at most queue_size records
+    and stream threads block while it is full, so a slow database throttles
+    the streams instead of growing memory. stop() lets the streams finish
+    their current item and flushes everything buffered before returning.
+    """
+    def __init__(self, collector: RedditCollector, database: StorageBackend, queue_size: int = 1000,
+                 batch_size: int = 100, flush_interval: float = 5.0, skip_existing: bool = True,
+                 change_detector: Optional[ChangeDetector] = None,
+                 ticker_rollup: Optional[TickerRollup] = None, reconnect_delay: float = RECONNECT_DELAY):
+        self.collector = collector
+        self.database = database
+        self.change_detector = change_detector
+        self.ticker_rollup = ticker_rollup
+        self.skip_existing = skip_existing
+        self.reconnect_delay = reconnect_delay
+
+        self.writer = WriteBehindWriter(
+            database,
+            max_buffer=queue_size,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            change_detector=change_detector,
+            ticker_rollup=ticker_rollup
+        )
+        self.stop_event = threading.Event()
+        self.stream_threads: List[threading.Thread] = []
+
+        self.stats = {
+            "posts_received": 0,
+            "comments_received": 0
+        }
+
+    def _subreddits(self):
+        """All target subreddits as one multireddit, using the calling thread's client"""
+        return self.collector._client().subreddit("+".join(self.collector.target_subreddits))
+
+    def submission_stream(self):
+        # pause_after=0 yields None whenever a poll returns nothing new, which
+        # gives the loop a chance to notice shutdown
+        return self._subreddits().stream.submissions(pause_after=0, skip_existing=self.skip_existing)
+
+    def comment_stream(self):
+        return self._subreddits().stream.comments(pause_after=0, skip_existing=self.skip_existing)
+
+    def _follow(self, kind: str) -> None:
+        """Read one stream until shutdown, reconnecting after errors"""
+        while not self.stop_event.is_set():
+            try:
+                stream = self.submission_stream() if kind == "posts" else self.comment_stream()
+                for item in stream:
+                    if self.stop_event.is_set():
+                        return
+                    if item is None:
+                        continue
+
+                    subreddit = item.subreddit.display_name
+                    if kind == "posts":
+                        record = self.collector._post_to_dict(item, subreddit)
+                    else:
+                        record = self.collector._comment_to_dict(item)
+
+                    # Blocks while the writer's buffer is full
+                    self.writer.submit(kind, [record], subreddit)
+                    self.stats[f"{kind}_received"] += 1
+            except Exception as e:
+                logger.error(f"Error reading {kind} stream: {str(e)}")
+                self.stop_event.wait(self.reconnect_delay)
+
+    def start(self) -> None:
+        """Start the stream readers and the writer in background threads"""
+        self.stop_event.clear()
+        self.writer.start()
+        self.stream_threads = [
+            threading.Thread(target=self._follow, args=(kind,), name=f"stream-{kind}", daemon=True)
+            for kind in ("posts", "comments")
+        ]
+        for thread in self.stream_threads:
+            thread.start()
+        logger.info(f"Streaming r/{'+'.join(self.collector.target_subreddits)}")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop reading the streams and wait for everything buffered to be written"""
+        self.stop_event.set()
+        for thread in self.stream_threads:
+            thread.join(timeout)
+        self.writer.close(timeout)
+        logger.info(f"Stream ingestion stopped: {self.stats}, writer {self.writer.get_stats()}")
+
+def run_stream_ingestion():
+    """
+    Run stream ingestion until SIGINT or SIGTERM
+    """
+    database = get_database()
+    ingestor = StreamIngestor(
+        RedditCollector(database),
+        database,
+        change_detector=ChangeDetector(),
+        ticker_rollup=TickerRollup(database)
+    )
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+
+    ingestor.start()
+    started = datetime.utcnow()
+    while not stopped.wait(60):
+        logger.info(f"Ingesting since {started.isoformat()}: {ingestor.stats}, writer {ingestor.writer.get_stats()}, "
+                    f"dedup {ingestor.change_detector.get_stats()}")
+
+    ingestor.stop()
+
+if __name__ == "__main__":
+    run_stream_ingestion()
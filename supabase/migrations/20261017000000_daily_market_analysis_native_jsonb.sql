@@ -0,0 +1,22 @@
+-- daily_market_analysis used to receive every JSONB field already encoded with
+-- json.dumps, so each document was stored as a JSON string. Unwrap those
+-- strings into real JSON documents so they can be queried server-side.
+UPDATE daily_market_analysis
+SET stock_mentions = (stock_mentions #>> '{}')::jsonb
+WHERE jsonb_typeof(stock_mentions) = 'string';
+
+UPDATE daily_market_analysis
+SET word_frequencies = (word_frequencies #>> '{}')::jsonb
+WHERE jsonb_typeof(word_frequencies) = 'string';
+
+UPDATE daily_market_analysis
+SET market_sentiment = (market_sentiment #>> '{}')::jsonb
+WHERE jsonb_typeof(market_sentiment) = 'string';
+
+UPDATE daily_market_analysis
+SET trending_topics = (trending_topics #>> '{}')::jsonb
+WHERE jsonb_typeof(trending_topics) = 'string';
+
+UPDATE daily_market_analysis
+SET risk_indicators = (risk_indicators #>> '{}')::jsonb
+WHERE jsonb_typeof(risk_indicators) = 'string';
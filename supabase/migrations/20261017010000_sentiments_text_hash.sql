@@ -0,0 +1,14 @@
+-- Content-hash sentiment cache: every sentiment row records the hash of the text
+-- it scored (model, prompt version and normalised text), and a post or comment
+-- keeps a single sentiment row that re-analysis replaces.
+ALTER TABLE sentiments ADD COLUMN IF NOT EXISTS text_hash TEXT;
+
+-- Keep only the newest result per post or comment before enforcing uniqueness
+DELETE FROM sentiments s
+USING sentiments newer
+WHERE s.content_type = newer.content_type
+  AND s.content_id = newer.content_id
+  AND s.id < newer.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sentiments_content ON sentiments(content_type, content_id);
+CREATE INDEX IF NOT EXISTS idx_sentiments_text_hash ON sentiments(text_hash);
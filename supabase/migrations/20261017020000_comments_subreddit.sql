@@ -0,0 +1,4 @@
+-- Comments record the subreddit they were collected from. Their parent post is
+-- often not stored (stream comments on older posts), so the ticker rollup rebuild
+-- reads the subreddit from the comment itself.
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS subreddit TEXT;
@@ -0,0 +1,20 @@
+-- Batched partial updates: the write-behind writer sends the changed fields of
+-- many posts or comments in one request per chunk instead of one PATCH per row.
+-- A key left out of an update keeps the stored value. An upsert of partial rows
+-- is not used because Postgres checks NOT NULL on the proposed row first.
+CREATE OR REPLACE FUNCTION update_posts_partial(updates JSONB) RETURNS VOID AS $$
+    UPDATE posts p SET
+        score = CASE WHEN u ? 'score' THEN (u->>'score')::integer ELSE p.score END,
+        num_comments = CASE WHEN u ? 'num_comments' THEN (u->>'num_comments')::integer ELSE p.num_comments END,
+        text = CASE WHEN u ? 'text' THEN u->>'text' ELSE p.text END
+    FROM jsonb_array_elements(updates) u
+    WHERE p.id = u->>'id';
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION update_comments_partial(updates JSONB) RETURNS VOID AS $$
+    UPDATE comments c SET
+        score = CASE WHEN u ? 'score' THEN (u->>'score')::integer ELSE c.score END,
+        text = CASE WHEN u ? 'text' THEN u->>'text' ELSE c.text END
+    FROM jsonb_array_elements(updates) u
+    WHERE c.id = u->>'id';
+$$ LANGUAGE sql;
@@ -0,0 +1,4 @@
+-- Word frequencies come from a bounded summary, so past its capacity a count
+-- may overstate the true one. The daily analysis stores that bound once, and
+-- /market/wordcloud reports it as error_bound. Earlier rows had exact counts.
+ALTER TABLE daily_market_analysis ADD COLUMN IF NOT EXISTS word_error_bound INTEGER NOT NULL DEFAULT 0;
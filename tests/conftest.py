@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_database import SQLiteDatabase
+
+@pytest.fixture
+def database():
+    """An empty in-memory SQLite backend"""
+    return SQLiteDatabase(":memory:")
+
+@pytest.fixture
+def reddit_credentials(monkeypatch):
+    """Credentials RedditCollector requires; building a client makes no request"""
+    monkeypatch.setenv("REDDIT_CLIENT_ID", "test-client")
+    monkeypatch.setenv("REDDIT_CLIENT_SECRET", "test-secret")
+    monkeypatch.setenv("REDDIT_USER_AGENT", "marketmood-tests")
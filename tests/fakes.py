@@ -0,0 +1,33 @@
+"""Stand-ins for the PRAW objects the collector and the stream ingestor read"""
+from types import SimpleNamespace
+from typing import List, Optional
+
+from praw.models import MoreComments
+
+def fake_submission(id: str, subreddit: str, title: str, text: str = "", created_utc: float = 1760000000.0,
+                    score: int = 10):
+    """Stand-in for a PRAW submission with the attributes the collector reads"""
+    return SimpleNamespace(
+        id=id, fullname=f"t3_{id}", title=title, selftext=text, score=score, created_utc=created_utc,
+        num_comments=0, subreddit=SimpleNamespace(display_name=subreddit), url=f"https://reddit.com/{id}",
+        author="poster"
+    )
+
+def fake_comment(id: str, subreddit: str, body: str, created_utc: float = 1760000000.0, score: int = 3,
+                 parent_id: str = "t3_post", replies: Optional[list] = None):
+    """Stand-in for a PRAW comment with the attributes the collector reads"""
+    return SimpleNamespace(
+        id=id, fullname=f"t1_{id}", body=body, score=score, created_utc=created_utc,
+        subreddit=SimpleNamespace(display_name=subreddit), author="commenter",
+        parent_id=parent_id, replies=replies or []
+    )
+
+class FakeMoreComments(MoreComments):
+    """A "load more comments" stub whose expansion returns the given comments, flat, without a request"""
+    def __init__(self, parent_id: str, expanded: List):
+        super().__init__(None, {"id": f"more_{parent_id}", "parent_id": parent_id,
+                                "count": len(expanded), "children": [item.id for item in expanded]})
+        self.expanded = expanded
+
+    def comments(self, *, update: bool = True) -> List:
+        return self.expanded
@@ -0,0 +1,62 @@
+from fractions import Fraction
+import random
+
+import numpy as np
+
+from aggregation import AnalysisPool, MarketAggregate, exact_sum
+
+TEMPLATES = [
+    "$AAPL looks great after earnings, very bullish",
+    "Selling my TSLA calls, this is terrible",
+    "NVDA and AMD are not bad at all!",
+    "Why is $GME so volatile today?",
+    "I love MSFT :) but hate the fees",
+    "Nothing to see here",
+]
+
+def corpus(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [{"id": f"c{index}", "title": rng.choice(["", "Daily thread", "$SPY"]),
+             "text": f"{rng.choice(TEMPLATES)} #{index % 50}"} for index in range(size)]
+
+def assert_same_aggregate(aggregate, serial):
+    assert aggregate.tickers == serial.tickers
+    assert aggregate.sentiment_sum == serial.sentiment_sum
+    assert aggregate.sentiment_count == serial.sentiment_count
+    assert aggregate.documents == serial.documents
+    # The vocabulary fits the word summary, so word counts are exact too
+    assert aggregate.words.counts == serial.words.counts
+
+def test_exact_sum_matches_fractions():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([
+        rng.uniform(-1, 1, 5000), rng.normal(0, 1e10, 100), [0.0, -0.0, 5e-324, -5e-324, 1e308, 1e308, 0.1, 0.2]
+    ])
+
+    assert exact_sum(values) == sum(Fraction(value) for value in values)
+    assert exact_sum(values[::-1]) == exact_sum(values)
+    assert exact_sum(np.array([])) == 0
+
+def test_merged_splits_equal_the_serial_aggregate():
+    contents = corpus(1500)
+    serial = MarketAggregate().update(contents)
+
+    rng = random.Random(1)
+    for cuts in ([], [1], [750], [7, 333, 1499], sorted(rng.sample(range(1, 1500), 20))):
+        merged = MarketAggregate()
+        for start, end in zip([0] + cuts, cuts + [len(contents)]):
+            merged.merge(MarketAggregate().update(contents[start:end]))
+        assert_same_aggregate(merged, serial)
+
+def test_pool_equals_the_serial_aggregate():
+    contents = corpus(400)
+    serial = MarketAggregate().update(contents)
+
+    pool = AnalysisPool(workers=2, shard_size=7)
+    try:
+        # A generator, as the pool reads its input lazily
+        assert_same_aggregate(pool.aggregate(content for content in contents), serial)
+        # The workers are reused by a later call
+        assert_same_aggregate(pool.aggregate(contents[:3]), MarketAggregate().update(contents[:3]))
+    finally:
+        pool.close()
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from benchmarks.mock_deepseek import MockConfig, start_mock_server
+from llm_client import LLMClient, LLMError, LLMTimeout, retry_after_seconds
+
+@pytest.fixture
+def mock_deepseek():
+    servers = []
+    def start(**options):
+        server, state, url = start_mock_server(MockConfig(latency=0.0, **options))
+        servers.append(server)
+        return state, url
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_retry_after_is_honoured_on_429(mock_deepseek):
+    # With this seed the mock throttles the first request and answers the second
+    state, url = mock_deepseek(throttle_rate=0.5, retry_after=0.3, seed=3)
+    # A long backoff shows the wait came from Retry-After, not the backoff
+    client = LLMClient(api_key="test", api_url=url, max_retries=2, backoff=10.0)
+
+    started = time.monotonic()
+    reply = client.chat("hello")
+    elapsed = time.monotonic() - started
+
+    assert reply == '{"reply": "ok"}'
+    assert 0.3 <= elapsed < 2.0
+    assert state.stats["throttled"] == 1 and state.stats["ok"] == 1
+    stats = client.get_stats()
+    assert (stats["requests"], stats["throttled"], stats["retries"], stats["failures"]) == (2, 1, 1, 0)
+
+def test_throttling_past_the_retries_fails_with_429(mock_deepseek):
+    state, url = mock_deepseek(throttle_rate=1.0, retry_after=0.05)
+    client = LLMClient(api_key="test", api_url=url, max_retries=2)
+
+    with pytest.raises(LLMError) as error:
+        client.chat("hello")
+
+    assert error.value.status_code == 429
+    assert state.stats["requests"] == 3
+    assert client.get_stats()["failures"] == 1
+
+def test_deadline_running_out_before_a_retry_raises_timeout(mock_deepseek):
+    # Retry-After asks for longer than the deadline leaves, so the client gives up at once
+    state, url = mock_deepseek(throttle_rate=1.0, retry_after=5)
+    client = LLMClient(api_key="test", api_url=url, max_retries=4)
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        client.chat("hello", deadline=time.monotonic() + 1.0)
+
+    assert time.monotonic() - started < 1.0
+    assert state.stats["requests"] == 1
+    stats = client.get_stats()
+    assert (stats["timeouts"], stats["retries"]) == (1, 0)
+
+def test_deadline_running_out_during_backoff_raises_timeout(mock_deepseek):
+    state, url = mock_deepseek(throttle_rate=1.0, retry_after=0.2)
+    client = LLMClient(api_key="test", api_url=url, max_retries=10)
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        client.chat("hello", deadline=time.monotonic() + 0.5)
+
+    assert time.monotonic() - started < 1.0
+    assert 2 <= state.stats["requests"] <= 3
+    assert client.get_stats()["timeouts"] == 1
+
+def test_nested_map_runs_inline():
+    client = LLMClient(api_key="test", max_concurrency=1)
+    # With one worker, waiting on the pool from inside it would never return
+    assert client.map(lambda x: client.map(lambda y: x * y, [1, 2]), [3, 4]) == [[3, 6], [4, 8]]
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("2.5") == 2.5
+    assert retry_after_seconds("-1") == 0.0
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
@@ -0,0 +1,45 @@
+import json
+import threading
+
+from market_analyzer import MarketAnalyzer
+
+class CountingLLM:
+    """Answers every batch analysis with one mention of the first symbol in the chunk"""
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def chat(self, prompt: str, **options) -> str:
+        with self.lock:
+            self.prompts.append(prompt)
+        symbol = prompt.split("Content: ", 1)[1].split()[0]
+        return json.dumps({"stocks": [{"symbol": symbol, "sentiment_score": 0.5, "mention_count": 1}],
+                           "news": [], "market_sentiment": {"fear_greed_score": 50, "confidence": 0.5},
+                           "trending_topics": [], "risk_indicators": {"volatility_score": 0.2}})
+
+    def map(self, function, items):
+        return [function(item) for item in items]
+
+def test_batch_analysis_requests_at_most_max_chunks():
+    llm = CountingLLM()
+    analyzer = MarketAnalyzer(llm_client=llm)
+    # Every post fills a 100-token chunk on its own
+    contents = [{"title": f"S{index:03d}", "text": "word " * 196} for index in range(400)]
+
+    merged = analyzer.batch_analyze_content(contents, chunk_token_budget=100, max_chunks=8)
+
+    assert len(llm.prompts) == 8
+    # The sampled chunks are spread over the whole batch, not its first chunks
+    symbols = [stock["symbol"] for stock in merged["stocks"]]
+    assert len(symbols) == 8
+    assert max(symbols) >= "S350"
+
+def test_batch_analysis_below_the_cap_analyzes_every_chunk():
+    llm = CountingLLM()
+    analyzer = MarketAnalyzer(llm_client=llm)
+    contents = [{"title": f"S{index:03d}", "text": "word " * 196} for index in range(10)]
+
+    merged = analyzer.batch_analyze_content(contents, chunk_token_budget=100, max_chunks=16)
+
+    assert len(llm.prompts) == 10
+    assert len(merged["stocks"]) == 10
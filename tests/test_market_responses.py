@@ -0,0 +1,20 @@
+import json
+
+from market_responses import wordcloud_response
+
+def test_stored_wordcloud_reports_error_bound(database):
+    database.store_daily_analysis(
+        date="2025-10-09",
+        stock_mentions=[],
+        word_frequencies=[{"word": "moon", "frequency": 12}],
+        fear_greed_index=50.0,
+        market_sentiment={},
+        trending_topics=[],
+        risk_indicators=[],
+        word_error_bound=3
+    )
+
+    body = json.loads(database.get_market_analysis_response("wordcloud", wordcloud_response))
+
+    assert body["word_frequencies"] == [{"word": "moon", "frequency": 12}]
+    assert body["error_bound"] == 3
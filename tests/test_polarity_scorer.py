@@ -0,0 +1,43 @@
+import random
+
+import numpy as np
+from textblob import TextBlob
+
+from polarity_scorer import PolarityScorer, POLARITY_TOLERANCE
+
+CORPUS = [
+    "", "good", "not good", "not very good", "really not good", "very good!!", "I don't like it",
+    "$GME to the moon :) :(", "(!) sure", "U.S. stocks are great. Mr. Market is sad...",
+    # Control characters, reserved ones included, are part of unknown words
+    "\x00weird", "good\x00bad", "\x01great", "bad\x02", "good\x0bgreat", "happy\x1fsad", "nice\x7f",
+    # Paragraph breaks end sentences; emoticons are not joined across them, unless a ")" follows
+    "good\n\nbad", "good :\n\n)", "great\n\n\"bad\"", "good.\n\nbad!", "happy\r\n\r\n:(", ":\n\n'(",
+    "( \n\n! )", "very\n\ngood", "not\n\n\ngreat", "good END-OF-SENTENCE :)",
+    # Leading periods stay on the word, emoticons with periods split at the sentence end
+    ".great !", "...never great", "o . O", "> . >", "o. O", ":-.", "good. .great",
+]
+
+def generated_corpus(size: int, seed: int):
+    """Texts pieced together from words, punctuation, quotes, emoticon parts and control characters"""
+    pieces = ["good", "bad", "great", "very", "really", "not", "never", "n't", "it's", "U.S.", "Mr.", "e.g.",
+              "o.O", ".", "...", ":", ")", "(", "!", "?", "'", "\"", "“", "”", "’", "8", "-", "<3", ":'(", "(!)",
+              "\n", "\n\n", "\r\n", " ", "  ", "\t", "\x00", "\x01", "\x0b", "\x1c", "\xa0", "happy", "well-known"]
+    rng = random.Random(seed)
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 25))) for _ in range(size)]
+
+def test_scores_match_textblob():
+    texts = CORPUS + generated_corpus(2000, seed=0)
+
+    scores = PolarityScorer().score_texts(texts)
+    expected = np.array([TextBlob(text).sentiment.polarity for text in texts])
+
+    mismatched = [text for text, score, polarity in zip(texts, scores, expected)
+                  if abs(score - polarity) > POLARITY_TOLERANCE]
+    assert mismatched == []
+
+def test_texts_in_a_batch_do_not_affect_each_other():
+    scorer = PolarityScorer()
+
+    together = scorer.score_texts(CORPUS)
+
+    assert np.array_equal(together, [scorer.score_text(text) for text in CORPUS])
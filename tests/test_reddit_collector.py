@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+from fakes import fake_submission, fake_comment, FakeMoreComments
+from reddit_collector import RedditCollector, LISTING_PAGE_SIZE
+
+class FakeListing(list):
+    """A listing page: its items and the fullname to pass as after= for the next page"""
+    def __init__(self, items, after):
+        super().__init__(items)
+        self.after = after
+
+class FakeClient:
+    """Serves a listing of `total` posts page by page and logs each request"""
+    def __init__(self, total: int, log: list):
+        self.posts = [fake_submission(f"p{index}", "stocks", f"Post {index}") for index in range(total)]
+        self.log = log
+
+    def get(self, path, params=None):
+        start = 0
+        if "after" in params:
+            start = next(index for index, post in enumerate(self.posts) if post.fullname == params["after"]) + 1
+        page = self.posts[start:start + params["limit"]]
+        self.log.append(("get", path, params.get("after")))
+        return FakeListing(page, page[-1].fullname if start + len(page) < len(self.posts) else None)
+
+class CountingBudget:
+    def __init__(self, log: list):
+        self.log = log
+
+    def acquire(self, tokens: int = 1) -> None:
+        self.log.append(("acquire",))
+
+def collector_with(total: int):
+    log = []
+    collector = RedditCollector()
+    collector.reddit = FakeClient(total, log)
+    collector.rate_budget = CountingBudget(log)
+    return collector, log
+
+def test_rate_budget_is_charged_before_each_page(reddit_credentials):
+    collector, log = collector_with(250)
+
+    posts = collector.collect_posts("stocks", limit=230)
+
+    assert [post["id"] for post in posts] == [f"p{index}" for index in range(230)]
+    assert log == [
+        ("acquire",), ("get", "r/stocks/hot", None),
+        ("acquire",), ("get", "r/stocks/hot", f"t3_p{LISTING_PAGE_SIZE - 1}"),
+        ("acquire",), ("get", "r/stocks/hot", f"t3_p{2 * LISTING_PAGE_SIZE - 1}"),
+    ]
+
+def test_paging_stops_at_the_end_of_the_listing(reddit_credentials):
+    collector, log = collector_with(120)
+
+    posts = collector.collect_posts("stocks", limit=1000)
+
+    assert len(posts) == 120
+    assert [entry[0] for entry in log] == ["acquire", "get", "acquire", "get"]
+
+def test_worker_clients_are_reused_across_runs(reddit_credentials):
+    collector = RedditCollector(max_workers=2)
+    collector._timed_collect = lambda subreddit, limit, incremental=False: [{"client": id(collector._client())}]
+
+    clients = set()
+    for _ in range(3):
+        collected = collector.collect_all_subreddits()
+        assert list(collected) == collector.target_subreddits
+        clients.update(posts[0]["client"] for posts in collected.values())
+    collector.close()
+
+    # One client per worker thread, however many runs they serve
+    assert len(clients) <= 2
+
+def test_expanded_comments_respect_max_depth(reddit_credentials):
+    # c1 has its replies behind a MoreComments; the expansion returns c2 > c3 > c4 flat
+    expanded = [
+        fake_comment("c2", "stocks", "depth 1", parent_id="t1_c1"),
+        fake_comment("c3", "stocks", "depth 2", parent_id="t1_c2"),
+        fake_comment("c4", "stocks", "depth 3", parent_id="t1_c3"),
+    ]
+    top_level = fake_comment("c1", "stocks", "depth 0", replies=[FakeMoreComments("t1_c1", expanded)])
+    collector = RedditCollector()
+    collector.reddit = SimpleNamespace(
+        submission=lambda id: SimpleNamespace(fullname=f"t3_{id}", comments=[top_level])
+    )
+
+    for max_depth, expected in ((0, ["c1"]), (1, ["c1", "c2"]), (2, ["c1", "c2", "c3"]), (None, ["c1", "c2", "c3", "c4"])):
+        comments = collector.get_post_comments("post", max_depth=max_depth, time_budget=None)
+        assert [comment["id"] for comment in comments] == expected
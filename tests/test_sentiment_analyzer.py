@@ -0,0 +1,135 @@
+import json
+
+import pytest
+
+from benchmarks.mock_deepseek import BATCH_LINE, MockConfig, start_mock_server
+from llm_client import LLMClient
+from sentiment_analyzer import (
+    MAX_BATCH_ATTEMPTS, SentimentAnalyzer, normalize_text, pack_batches, parse_sentiment, text_hash
+)
+
+@pytest.fixture
+def mock_deepseek():
+    servers = []
+    def start(**options):
+        server, state, url = start_mock_server(MockConfig(latency=0.0, **options))
+        servers.append(server)
+        return state, LLMClient(api_key="test", api_url=url, max_retries=0)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_whitespace_and_unicode_variants_hit_the_cache(mock_deepseek):
+    state, llm = mock_deepseek()
+    analyzer = SentimentAnalyzer(llm_client=llm)
+
+    first = analyzer.analyze_text("Great  quarter for $AAPL,\nbuying more")
+    assert analyzer.analyze_text("  Great quarter for $AAPL, buying more\t") == first
+    # NFKC folds the full-width letters and the non-breaking space
+    assert analyzer.analyze_text("Ｇreat quarter for $AAPL, buying more") == first
+
+    assert state.stats["requests"] == 1
+    assert (analyzer.cache_stats["memory_hits"], analyzer.cache_stats["misses"]) == (2, 1)
+
+def test_case_variants_are_analyzed_separately(mock_deepseek):
+    # Case is part of the key on purpose, since all caps can carry tone
+    state, llm = mock_deepseek()
+    analyzer = SentimentAnalyzer(llm_client=llm)
+
+    analyzer.analyze_text("great quarter for $AAPL")
+    analyzer.analyze_text("GREAT QUARTER FOR $AAPL")
+
+    assert normalize_text("GREAT quarter") != normalize_text("great quarter")
+    assert state.stats["requests"] == 2
+
+def test_batches_send_each_normalised_text_once(mock_deepseek):
+    state, llm = mock_deepseek()
+    analyzer = SentimentAnalyzer(llm_client=llm)
+    texts = ["to the moon", "to  the moon ", "bag holding again", "to the\nmoon"]
+
+    results = analyzer.analyze_texts(texts)
+
+    assert results[0] == results[1] == results[3]
+    assert state.stats["kind_sentiment_batch"] == 1 and state.stats["kind_sentiment"] == 0
+    assert analyzer.analyze_text(" bag holding again") == results[2]
+    assert state.stats["requests"] == 1
+
+def test_database_tier_is_shared_across_analyzers(mock_deepseek, database):
+    state, llm = mock_deepseek()
+    row = SentimentAnalyzer(database=database, llm_client=llm).analyze_comment({"id": "c1", "text": "puts are printing"})
+    database.store_sentiment(row)
+
+    analyzer = SentimentAnalyzer(database=database, llm_client=llm)
+    assert analyzer.analyze_text("puts  are printing") == (row["sentiment_score"], row["sentiment_label"], row["confidence"])
+
+    assert state.stats["requests"] == 1
+    assert analyzer.cache_stats["database_hits"] == 1
+    assert analyzer.analyze_texts(["puts are printing\n"]) == [analyzer.analyze_text("puts are printing")]
+    assert state.stats["requests"] == 1
+
+def test_version_bump_changes_the_key():
+    assert text_hash("to the moon") == text_hash(" to the  moon")
+    assert text_hash("to the moon") != text_hash("to the moon", prompt_version="2")
+    assert text_hash("to the moon") != text_hash("to the moon", model="deepseek-reasoner")
+
+def test_ids_missing_from_batch_replies_fall_back_to_single_calls(mock_deepseek):
+    # The mock leaves every id out of batch replies
+    state, llm = mock_deepseek(drop_rate=1.0)
+    analyzer = SentimentAnalyzer(llm_client=llm)
+    texts = ["calls printing", "puts printing", "sideways again"]
+
+    results = analyzer.analyze_texts(texts, max_batch_size=2)
+
+    assert results == [SentimentAnalyzer(llm_client=llm).analyze_text(text) for text in texts]
+    # Every round sends the three texts in two batches
+    assert state.stats["kind_sentiment_batch"] == MAX_BATCH_ATTEMPTS * 2
+    # One fallback call per text, beside one per text for the expected results
+    assert state.stats["kind_sentiment"] == 2 * len(texts)
+    assert analyzer.cache_stats["requeued"] == MAX_BATCH_ATTEMPTS * len(texts)
+
+def test_extra_and_missing_ids_in_batch_replies(mock_deepseek, monkeypatch):
+    state, llm = mock_deepseek()
+    analyzer = SentimentAnalyzer(llm_client=llm)
+    chat = analyzer._chat
+
+    def unreliable_chat(prompt, **options):
+        reply = json.loads(chat(prompt, **options))
+        if BATCH_LINE.search(prompt):
+            # Leave out "skipped" texts, garble "garbled" ones and add an id that was never sent
+            sent = dict(BATCH_LINE.findall(prompt))
+            reply = {text_id: "positive" if "garbled" in sent[text_id] else result
+                     for text_id, result in reply.items() if "skipped" not in sent[text_id]}
+            reply["99"] = {"sentiment_score": -1, "sentiment_label": "negative", "confidence": 1}
+        return json.dumps(reply)
+    monkeypatch.setattr(analyzer, "_chat", unreliable_chat)
+
+    texts = ["moon soon", "skipped by the model", "garbled by the model", "bought the dip"]
+    results = analyzer.analyze_texts(texts)
+
+    assert results == [SentimentAnalyzer(llm_client=llm).analyze_text(text) for text in texts]
+    assert state.stats["kind_sentiment_batch"] == MAX_BATCH_ATTEMPTS
+    # The two bad texts fall back to single calls, beside one per text for the expected results
+    assert state.stats["kind_sentiment"] == 2 + len(texts)
+    assert analyzer.cache_stats["requeued"] == MAX_BATCH_ATTEMPTS * 2
+    assert len(analyzer.cache) == len(texts)
+
+def test_pack_batches_keeps_order_within_budgets():
+    items = [(str(i), "x" * 40) for i in range(7)]
+    # Each text costs 11 estimated tokens plus 4 for its id tag
+    batches = pack_batches(items, token_budget=45, max_batch_size=5)
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [item for batch in batches for item in batch] == items
+
+    assert [len(batch) for batch in pack_batches(items, token_budget=1000, max_batch_size=5)] == [5, 2]
+    assert pack_batches([("big", "x" * 1000)], token_budget=10) == [[("big", "x" * 1000)]]
+    assert pack_batches([]) == []
+
+def test_parse_sentiment_rejects_malformed_results():
+    assert parse_sentiment({"sentiment_score": "0.5", "sentiment_label": "Positive", "confidence": 0.9}) == (0.5, "positive", 0.9)
+    assert parse_sentiment(None) is None
+    assert parse_sentiment("positive") is None
+    assert parse_sentiment({"sentiment_score": 0.5, "sentiment_label": "positive"}) is None
+    assert parse_sentiment({"sentiment_score": 2, "sentiment_label": "positive", "confidence": 0.9}) is None
+    assert parse_sentiment({"sentiment_score": 0.5, "sentiment_label": "bullish", "confidence": 0.9}) is None
+    assert parse_sentiment({"sentiment_score": 0.5, "sentiment_label": "positive", "confidence": "high"}) is None
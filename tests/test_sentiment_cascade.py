@@ -0,0 +1,37 @@
+import math
+
+import numpy as np
+
+from sentiment_cascade import LexiconScorer, SCORE_ALPHA
+
+def lexicon_sum(score: float) -> float:
+    """Invert the score scaling back to the sum of lexicon valences"""
+    return score * math.sqrt(SCORE_ALPHA / (1 - score * score))
+
+def test_negations_and_intensifiers():
+    scorer = LexiconScorer()
+    texts = [
+        "bullish",                       # 0.8
+        "not bullish",                   # negated
+        "not, bullish",                  # a clause break ends the negation
+        "not that this is bullish",      # beyond the negation window
+        "very bullish",                  # intensified
+        "very not bullish",              # negations do not reset an intensifier
+        "very much bullish",             # any other word does
+        "",
+    ]
+    scores, confidences = scorer.score_batch(texts)
+
+    assert np.allclose([lexicon_sum(score) for score in scores],
+                       [0.8, -0.8, 0.8, 0.8, 1.2, -1.2, 0.8, 0.0])
+    assert confidences[-1] == 0.0
+
+def test_texts_in_a_batch_do_not_affect_each_other():
+    scorer = LexiconScorer()
+    texts = ["this is not", "bullish", "very", "bearish \U0001F4C9", None, "hardly a crash but gains"]
+
+    together = scorer.score_batch(texts)
+    alone = [scorer.score_batch([text]) for text in texts]
+
+    assert np.array_equal(together[0], np.concatenate([scores for scores, _ in alone]))
+    assert np.array_equal(together[1], np.concatenate([confidences for _, confidences in alone]))
@@ -0,0 +1,115 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from fakes import fake_submission, fake_comment
+from reddit_collector import RedditCollector
+from stream_ingestor import StreamIngestor
+
+class FakeStreams:
+    """
+    Scripted PRAW streams: each connection plays the next script for its kind
+
+    A script is a list of submissions or comments, None for an empty poll, or
+    an exception to raise. After its script a connection keeps polling empty,
+    like a quiet subreddit.
+    """
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.connections = {"submissions": 0, "comments": 0}
+        self.lock = threading.Lock()
+
+    def _play(self, kind):
+        with self.lock:
+            connection = self.connections[kind]
+            self.connections[kind] += 1
+        script = self.scripts[kind][connection] if connection < len(self.scripts[kind]) else []
+        for item in script:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        while True:
+            time.sleep(0.01)
+            yield None
+
+    def submissions(self, pause_after=None, skip_existing=False):
+        return self._play("submissions")
+
+    def comments(self, pause_after=None, skip_existing=False):
+        return self._play("comments")
+
+class FakeCollector:
+    """Just what the ingestor uses of a RedditCollector, without credentials or a client"""
+    _post_to_dict = RedditCollector._post_to_dict
+    _comment_to_dict = RedditCollector._comment_to_dict
+
+    def __init__(self, streams: FakeStreams):
+        self.target_subreddits = ["stocks", "wallstreetbets"]
+        self.streams = streams
+
+    def _client(self):
+        return SimpleNamespace(subreddit=lambda name: SimpleNamespace(stream=self.streams))
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_ingestor_writes_streams_and_reconnects_after_errors(database):
+    streams = FakeStreams({
+        "submissions": [
+            [fake_submission("p1", "stocks", "AAPL earnings"), None, ConnectionError("stream dropped")],
+            [fake_submission("p2", "wallstreetbets", "GME again")],
+        ],
+        "comments": [
+            [None, fake_comment("c1", "stocks", "Bought more", parent_id="t3_p1"), None,
+             fake_comment("c2", "wallstreetbets", "Diamond hands", parent_id="t3_p2")],
+        ],
+    })
+    ingestor = StreamIngestor(FakeCollector(streams), database, batch_size=10, flush_interval=0.05,
+                              reconnect_delay=0.01)
+    submitted = []
+    submit = ingestor.writer.submit
+
+    def recording_submit(kind, records, subreddit=None, **options):
+        submitted.append((kind, [record["id"] for record in records], subreddit))
+        return submit(kind, records, subreddit, **options)
+
+    ingestor.writer.submit = recording_submit
+
+    ingestor.start()
+    assert wait_for(lambda: ingestor.stats == {"posts_received": 2, "comments_received": 2})
+    ingestor.stop(timeout=5)
+
+    # The posts stream failed once and was read again from a new connection
+    assert streams.connections["submissions"] == 2
+    assert streams.connections["comments"] == 1
+    assert sorted(submitted) == [
+        ("comments", ["c1"], "stocks"), ("comments", ["c2"], "wallstreetbets"),
+        ("posts", ["p1"], "stocks"), ("posts", ["p2"], "wallstreetbets"),
+    ]
+    # stop() flushed everything buffered
+    assert {row["id"]: row["subreddit"] for row in database._select("posts", ("id", "subreddit"))} == {
+        "p1": "stocks", "p2": "wallstreetbets"
+    }
+    assert {row["id"]: row["subreddit"] for row in database._select("comments", ("id", "subreddit"))} == {
+        "c1": "stocks", "c2": "wallstreetbets"
+    }
+    assert all(not thread.is_alive() for thread in ingestor.stream_threads)
+
+def test_stop_interrupts_reconnect_wait(database):
+    streams = FakeStreams({"submissions": [[ConnectionError("down")]] * 100, "comments": []})
+    ingestor = StreamIngestor(FakeCollector(streams), database, reconnect_delay=60)
+
+    ingestor.start()
+    assert wait_for(lambda: streams.connections["submissions"] >= 1)
+    started = time.monotonic()
+    ingestor.stop(timeout=5)
+
+    # The reader was waiting out the reconnect delay; stop() ends the wait at once
+    assert time.monotonic() - started < 5
+    assert streams.connections["submissions"] == 1
+    assert all(not thread.is_alive() for thread in ingestor.stream_threads)
@@ -0,0 +1,15 @@
+from ticker_extractor import TickerExtractor
+
+def test_everyday_word_aliases_need_a_capital():
+    extractor = TickerExtractor()
+
+    assert extractor.extract("we had to ford the river") == {}
+    assert extractor.extract("I ate an apple and ordered from amazon") == {}
+    assert extractor.extract("Ford earnings were ugly, Apple and AMAZON beat") == {"F": 1, "AAPL": 1, "AMZN": 1}
+    # Longer aliases and unambiguous names still match in lower case
+    assert extractor.extract("apple inc and tesla and bank of america") == {"AAPL": 1, "TSLA": 1, "BAC": 1}
+
+def test_ambiguous_aliases_can_be_configured():
+    extractor = TickerExtractor(ambiguous_aliases=())
+
+    assert extractor.extract("ford the river") == {"F": 1}
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import os
+import subprocess
+import sys
+
+from fakes import fake_submission, fake_comment
+from reddit_collector import RedditCollector
+from sqlite_database import SQLiteDatabase
+from ticker_rollup import TickerRollup
+from write_behind import WriteBehindWriter
+
+def hourly_rollup(database):
+    return sorted(
+        tuple(row) for row in database._connection().execute(
+            'SELECT hour, subreddit, symbol, content_count, mention_count, score_sum, sentiment_sum '
+            'FROM ticker_mentions_hourly WHERE content_count != 0'
+        )
+    )
+
+def test_rebuild_matches_rollup_built_at_ingest(database, reddit_credentials):
+    collector = RedditCollector(database)
+    rollup = TickerRollup(database)
+    writer = WriteBehindWriter(database, ticker_rollup=rollup)
+    writer.start()
+
+    posts = [
+        collector._post_to_dict(fake_submission("p1", "stocks", "AAPL earnings beat", "Great quarter for $AAPL"), "stocks"),
+        collector._post_to_dict(fake_submission("p2", "wallstreetbets", "$GME to the moon", created_utc=1760003600.0),
+                                "wallstreetbets"),
+    ]
+    comments = [
+        # One on a stored post, one on a post that was never collected, as stream comments often are
+        collector._comment_to_dict(fake_comment("c1", "stocks", "Holding $AAPL and $TSLA, feeling good")),
+        collector._comment_to_dict(fake_comment("c2", "options", "$TSLA puts are terrible", created_utc=1760007200.0)),
+    ]
+    writer.submit("posts", posts)
+    writer.submit("comments", comments)
+    assert writer.flush(timeout=10)
+    writer.close()
+
+    ingested = hourly_rollup(database)
+    assert {(subreddit, symbol) for _, subreddit, symbol, *_ in ingested} == {
+        ("stocks", "AAPL"), ("stocks", "TSLA"), ("wallstreetbets", "GME"), ("options", "TSLA")
+    }
+
+    counts = rollup.rebuild(datetime(2025, 1, 1), datetime(2026, 1, 1))
+
+    assert counts == {"posts": 2, "comments": 2}
+    assert hourly_rollup(database) == ingested
+
+def test_rebuild_command_needs_no_llm_key(tmp_path):
+    path = str(tmp_path / "marketmood.db")
+    created = (datetime.utcnow() - timedelta(hours=1)).replace(microsecond=0).isoformat()
+    SQLiteDatabase(path).store_posts([{"id": "p1", "title": "$NVDA calls", "text": "", "score": 5,
+                                       "created_utc": created, "num_comments": 0, "subreddit": "options"}])
+
+    env = {key: value for key, value in os.environ.items() if key != "DEEPSEEK_API_KEY"}
+    env.update(STORAGE_BACKEND="sqlite", SQLITE_PATH=path)
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "ticker_rollup.py", "rebuild", "--hours", "24"],
+                            cwd=repo, env=env, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert [(row[1], row[2], row[4]) for row in hourly_rollup(SQLiteDatabase(path))] == [("options", "NVDA", 1)]
@@ -0,0 +1,23 @@
+from collections import Counter
+
+from aggregation import MarketAggregate
+from word_counter import SpaceSaving, frequency_entries
+
+
+def test_frequency_entries_keep_word_and_frequency_only():
+    summary = SpaceSaving(8)
+    summary.update(Counter({"moon": 3, "calls": 2}))
+
+    assert frequency_entries(summary, 10) == [
+        {"word": "moon", "frequency": 3},
+        {"word": "calls", "frequency": 2},
+    ]
+    assert summary.error_bound() == 0
+
+
+def test_error_bound_is_reported_once_past_capacity():
+    aggregate = MarketAggregate(measures=("words",), word_capacity=2)
+    aggregate.add_batch([{"text": "alpha beta gamma delta"}, {"text": "alpha alpha"}])
+
+    assert all(set(entry) == {"word", "frequency"} for entry in aggregate.word_frequencies())
+    assert aggregate.word_error_bound() > 0
@@ -0,0 +1,57 @@
+from change_detector import ChangeDetector
+from write_behind import WriteBehindWriter
+
+def post(id, score, num_comments=0, text="body"):
+    return {"id": id, "title": f"Post {id}", "text": text, "score": score, "created_utc": "2025-10-09T08:00:00",
+            "num_comments": num_comments, "subreddit": "stocks", "url": None, "author": "poster"}
+
+def stored(database):
+    return {row["id"]: (row["score"], row["num_comments"], row["text"])
+            for row in database._select("posts", ("id", "score", "num_comments", "text"))}
+
+def write(writer, posts):
+    writer.submit("posts", posts)
+    assert writer.flush(timeout=10)
+
+def test_changed_records_are_updated_in_chunks(database, monkeypatch):
+    detector = ChangeDetector()
+    writer = WriteBehindWriter(database, batch_size=2, change_detector=detector)
+    writer.start()
+    write(writer, [post(f"p{i}", 1) for i in range(5)])
+
+    chunks = []
+    update_chunk = database._update_chunk
+    def record_chunk(table, updates):
+        chunks.append(updates)
+        update_chunk(table, updates)
+    def per_row_update(post_id, fields):
+        raise AssertionError("changed posts were updated one row at a time")
+    monkeypatch.setattr(database, "_update_chunk", record_chunk)
+    monkeypatch.setattr(database, "update_post", per_row_update)
+    # Four score changes and one text change: two field sets, chunks of at most two
+    write(writer, [post("p0", 7), post("p1", 8), post("p2", 9), post("p3", 10), post("p4", 1, text="edited")])
+    writer.close()
+
+    assert sorted(len(chunk) for chunk in chunks) == [1, 2, 2]
+    assert all(len({tuple(sorted(fields)) for fields in chunk}) == 1 for chunk in chunks)
+    assert stored(database) == {"p0": (7, 0, "body"), "p1": (8, 0, "body"), "p2": (9, 0, "body"),
+                                "p3": (10, 0, "body"), "p4": (1, 0, "edited")}
+
+def test_failed_update_chunk_is_written_again(database, monkeypatch):
+    detector = ChangeDetector()
+    writer = WriteBehindWriter(database, change_detector=detector)
+    writer.start()
+    write(writer, [post("p0", 1), post("p1", 1)])
+
+    def fail(table, updates):
+        raise RuntimeError("connection reset")
+    monkeypatch.setattr(database, "_update_chunk", fail)
+    write(writer, [post("p0", 5)])
+    monkeypatch.undo()
+    assert writer.get_stats()["rows_failed"] == 1
+    assert ("posts", "p0") not in detector.entries
+
+    # Forgotten by the change detector, the record goes out again as a full row
+    write(writer, [post("p0", 5)])
+    writer.close()
+    assert stored(database)["p0"] == (5, 0, "body")
@@ -0,0 +1,178 @@
+from collections import Counter
+from typing import Dict, List, Any, Optional, Iterable
+import csv
+import os
+
+DEFAULT_TICKERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tickers.csv")
+
+# Documents are split on whitespace (and slashes, as in AAPL/TSLA), which is much
+# faster than a token regex; punctuation is then stripped from the ends of
+# tokens but kept inside, as in BRK.B, AT&T or C3.ai
+EDGE_PUNCTUATION = ".,;:!?()[]{}<>\"'`*&-\u2018\u2019\u201c\u201d"
+APOSTROPHES = ("'", "\u2019")
+
+# Upper-case words that are valid tickers but in posts are almost always
+# something else. They still count when written as cashtags ($AI).
+DEFAULT_BLOCKLIST = frozenset({
+    "AI", "ARM", "OPEN", "PATH", "NET", "LOW", "SE", "DE", "HD", "TM", "MS", "ON", "IT", "ALL",
+    "CEO", "CFO", "DD", "USA", "GO", "SO", "BE", "NOW", "FOR", "OR", "EV", "ATH", "IPO", "ETF",
+    "GDP", "CPI", "FED", "SEC", "IMO", "FOMO", "EPS", "YOLO", "LOL", "OP", "USD", "EU", "UK",
+    "NYSE", "ARE", "LOVE", "WISH"
+})
+# Bare symbols shorter than this (F, T, X, ...) only count as cashtags
+MIN_BARE_SYMBOL_LENGTH = 2
+# One-word company aliases that are also everyday words ("I ate an apple",
+# "ford the river"); they only count when capitalised or upper case. Longer
+# aliases starting with them ("apple inc") still match in any case.
+DEFAULT_AMBIGUOUS_ALIASES = frozenset({
+    "apple", "amazon", "alphabet", "oracle", "snowflake", "micron", "intel", "uber", "ford", "chewy",
+    "coke", "lilly", "occidental", "upstart", "affirm", "paramount", "sundial", "caterpillar",
+    "berkshire", "nike"
+})
+
+# Key marking the end of an alias in the trie; tokens are never None
+END = None
+
+def clean_token(token: str) -> str:
+    """A whitespace-split token without edge punctuation or a possessive ("TSLA's" -> "TSLA")"""
+    token = token.strip(EDGE_PUNCTUATION)
+    for apostrophe in APOSTROPHES:
+        if apostrophe in token:
+            token = token.split(apostrophe, 1)[0]
+    return token
+
+def split_tokens(text: str) -> List[str]:
+    """Whitespace-split tokens of a document, punctuation still attached"""
+    return (text or "").replace("/", " ").split()
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in map(clean_token, split_tokens(text)) if token]
+
+class TickerExtractor:
+    """
+    Find ticker mentions against a universe of known symbols and company names
+
+    Every document is tokenised once and scanned left to right. A token is a
+    mention when it is a cashtag of a known symbol ($aapl), a known symbol
+    written in upper case (AAPL) that is not blocklisted, or the start of the
+    longest company alias found in a token trie ("Bank of America"). An
+    alias's first word matches in lower, capitalised or upper case and the
+    rest in any case; the tokens it covers are not matched again. One-word
+    aliases that are everyday words (ambiguous_aliases) need a capital.
+    """
+    def __init__(self, universe_path: Optional[str] = None, blocklist: Optional[Iterable[str]] = None,
+                 min_bare_length: int = MIN_BARE_SYMBOL_LENGTH, ambiguous_aliases: Optional[Iterable[str]] = None):
+        self.blocklist = frozenset(blocklist) if blocklist is not None else DEFAULT_BLOCKLIST
+        self.min_bare_length = min_bare_length
+        if ambiguous_aliases is None:
+            ambiguous_aliases = DEFAULT_AMBIGUOUS_ALIASES
+        self.ambiguous_aliases = frozenset(alias.lower() for alias in ambiguous_aliases)
+        self.names: Dict[str, str] = {}
+        self.trie: Dict[str, Any] = {}
+        self.roots: Dict[str, Dict[str, Any]] = {}
+        # Every token that can start a mention as written: symbols and alias roots
+        self.candidates = set()
+        self.load(universe_path or DEFAULT_TICKERS_PATH)
+
+    def load(self, path: str) -> None:
+        """Load symbols, names and |-separated aliases from a CSV with a symbol,name,aliases header"""
+        with open(path, newline="", encoding="utf-8") as universe:
+            for row in csv.DictReader(universe):
+                symbol = row["symbol"].strip().upper()
+                if not symbol:
+                    continue
+                self.names[symbol] = row.get("name", "").strip()
+                self.candidates.add(symbol)
+                for alias in (row.get("aliases") or "").split("|"):
+                    if alias.strip():
+                        self.add_alias(alias, symbol)
+
+    def add_alias(self, alias: str, symbol: str) -> None:
+        """Map a company name, tokenised like the documents, to a symbol"""
+        tokens = tokenize(alias.lower())
+        if not tokens:
+            return
+        node = self.trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[END] = symbol
+        # The first token is looked up as written, so index the usual casings
+        # of it and spare lower-casing every token of every document
+        first = tokens[0]
+        for variant in (first, first.capitalize(), first.upper()):
+            self.roots[variant] = self.trie[first]
+            self.candidates.add(variant)
+
+    def _alias_at(self, tokens: List[str], start: int):
+        """The longest alias starting at a token, as (symbol, tokens covered), or None"""
+        first = clean_token(tokens[start])
+        node = self.roots[first]
+        # An everyday word on its own is only a company when capitalised
+        match = (node[END], 1) if END in node and not (first.islower() and first in self.ambiguous_aliases) else None
+        position = start + 1
+        while position < len(tokens):
+            node = node.get(clean_token(tokens[position]).lower())
+            if node is None:
+                break
+            position += 1
+            if END in node:
+                match = (node[END], position - start)
+        return match
+
+    def extract(self, text: str, counts: Optional[Counter] = None) -> Counter:
+        """Mention counts by symbol in one document, added to counts if given"""
+        counts = Counter() if counts is None else counts
+        names, roots, blocklist, candidates = self.names, self.roots, self.blocklist, self.candidates
+        tokens = split_tokens(text)
+
+        skip_until = 0
+        for index, token in enumerate(tokens):
+            if index < skip_until:
+                continue
+            if token not in candidates:
+                # Plain words that miss cannot match once cleaned either; only
+                # tokens carrying punctuation or a $ are worth cleaning
+                if token.isalpha():
+                    continue
+                token = clean_token(token)
+                if not token:
+                    continue
+            if token[0] == "$":
+                symbol = token[1:].upper()
+                if symbol in names:
+                    counts[symbol] += 1
+                continue
+
+            if token in roots:
+                alias = self._alias_at(tokens, index)
+                if alias is not None:
+                    counts[alias[0]] += 1
+                    skip_until = index + alias[1]
+                    continue
+
+            # Symbols are stored in upper case, so only upper-case tokens can match
+            if token in names and len(token) >= self.min_bare_length and token not in blocklist:
+                counts[token] += 1
+        return counts
+
+    def extract_many(self, texts: Iterable[str]) -> List[Counter]:
+        """Mention counts by symbol for each document"""
+        return [self.extract(text) for text in texts]
+
+    def count(self, texts: Iterable[str]) -> Counter:
+        """Total mention counts by symbol over many documents"""
+        total = Counter()
+        for text in texts:
+            self.extract(text, total)
+        return total
+
+# The universe is read once per process
+_shared_extractor: Optional[TickerExtractor] = None
+
+def get_ticker_extractor() -> TickerExtractor:
+    """Return the process-wide extractor over the default universe"""
+    global _shared_extractor
+
+    if _shared_extractor is None:
+        _shared_extractor = TickerExtractor()
+    return _shared_extractor
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from database import StorageBackend, get_database
+from ticker_extractor import TickerExtractor, get_ticker_extractor
+from aggregation import content_text
+from polarity_scorer import get_polarity_scorer
+from typing import Dict, List, Any, Optional
+import argparse
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns read when rebuilding; comments store the subreddit they were collected from
+POST_ROLLUP_COLUMNS = ('id', 'created_utc', 'title', 'text', 'score', 'subreddit')
+COMMENT_ROLLUP_COLUMNS = ('id', 'created_utc', 'text', 'score', 'subreddit')
+
+class TickerRollup:
+    """
+    Maintain the hourly (hour, subreddit, symbol) ticker-mention rollup at ingest time
+
+    Each post or comment contributes one row per symbol it mentions, holding
+    the mention count, its score and its sentiment. Recording a content again
+    replaces its previous rows, and the database adjusts the hourly totals
+    by the difference, so re-ingested or edited content is never counted twice.
+    Only ticker extraction and local polarity are needed, so no LLM client is.
+    """
+    def __init__(self, database: StorageBackend, ticker_extractor: Optional[TickerExtractor] = None,
+                 batch_size: int = 500):
+        self.database = database
+        self.ticker_extractor = ticker_extractor or get_ticker_extractor()
+        self.batch_size = batch_size
+
+    def content_mentions(self, record: Dict[str, Any], content_type: str,
+                         subreddit: Optional[str] = None, sentiment: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Build the replacement mention rows for one post or comment
+        sentiment is the polarity of its title and text, if already scored.
+        """
+        text = content_text(record)
+        mentions = self.ticker_extractor.extract(text).most_common()
+        
+        hour = datetime.fromisoformat(record['created_utc']).replace(minute=0, second=0, microsecond=0)
+        if not mentions:
+            sentiment = 0.0
+        elif sentiment is None:
+            sentiment = get_polarity_scorer().score_text(text)
+        
+        return {
+            "content_id": record['id'],
+            "content_type": content_type,
+            "mentions": [
+                {
+                    "symbol": symbol,
+                    "hour": hour.isoformat(),
+                    "subreddit": subreddit or record.get('subreddit') or "unknown",
+                    "mention_count": count,
+                    "score": record.get('score') or 0,
+                    "sentiment": sentiment
+                }
+                for symbol, count in mentions
+            ]
+        }
+
+    def record(self, content_type: str, records: List[Dict[str, Any]],
+               subreddits: Optional[Dict[str, str]] = None) -> None:
+        """
+        Replace the mentions of a batch of posts ('post') or comments ('comment')
+        subreddits maps record ids to subreddits for records that do not carry one.
+        """
+        subreddits = subreddits or {}
+        # The whole batch is scored at once
+        sentiments = get_polarity_scorer().score_texts([content_text(record) for record in records])
+        contents = [
+            self.content_mentions(record, content_type, subreddits.get(record['id']), float(sentiment))
+            for record, sentiment in zip(records, sentiments)
+        ]
+        
+        for offset in range(0, len(contents), self.batch_size):
+            self.database.replace_ticker_mentions(contents[offset:offset + self.batch_size])
+
+    def rebuild(self, start_time: datetime, end_time: datetime) -> Dict[str, int]:
+        """
+        Recompute mentions for all posts and comments in a time range from the raw
+        tables, then regenerate the hourly rollup from the per-content mentions
+        """
+        counts = {"posts": 0, "comments": 0}
+        
+        batch = []
+        for post in self.database.iter_posts_by_time_range(start_time, end_time, columns=POST_ROLLUP_COLUMNS):
+            batch.append(post)
+            if len(batch) >= self.batch_size:
+                self.record('post', batch)
+                counts["posts"] += len(batch)
+                batch = []
+        self.record('post', batch)
+        counts["posts"] += len(batch)
+        
+        batch = []
+        for comment in self.database.iter_comments_by_time_range(start_time, end_time, columns=COMMENT_ROLLUP_COLUMNS):
+            batch.append(comment)
+            if len(batch) >= self.batch_size:
+                self.record('comment', batch)
+                counts["comments"] += len(batch)
+                batch = []
+        self.record('comment', batch)
+        counts["comments"] += len(batch)
+        
+        self.database.rebuild_ticker_mentions_hourly()
+        return counts
+
+def rebuild_rollups(hours: int):
+    """
+    Regenerate the ticker rollup for the last N hours of raw posts and comments
+    """
+    try:
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(hours=hours)
+        
+        rollup = TickerRollup(get_database())
+        counts = rollup.rebuild(start_time, end_time)
+        
+        logger.info(f"Rebuilt ticker rollup from {counts['posts']} posts and {counts['comments']} comments")
+        
+    except Exception as e:
+        logger.error(f"Error rebuilding ticker rollup: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the hourly ticker-mention rollup")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild = subcommands.add_parser("rebuild", help="regenerate rollups from the raw posts and comments tables")
+    rebuild.add_argument("--hours", type=int, default=24 * 7, help="how far back to recompute (default: 168)")
+    args = parser.parse_args()
+    
+    if args.command == "rebuild":
+        rebuild_rollups(args.hours)
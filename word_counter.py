@@ -0,0 +1,112 @@
+from typing import Dict, List, Any, Tuple, Optional, Mapping
+import heapq
+import re
+import string
+
+# Words tracked by a SpaceSaving summary; counts are exact until more
+# distinct words than this have been seen
+DEFAULT_WORD_CAPACITY = 5000
+
+# Links, e-mail addresses and HTML entities (Reddit escapes & < > as &amp; &lt; &gt;)
+URL_PATTERN = re.compile(r"(?:https?://|www\.)\S+|\S+@\S+\.\w+|&(?:[a-z]+|#\d+);")
+# Cashtags ($gme, $brk.b), words with inner apostrophes, hyphens or ampersands
+# (don't, s&p, e-mini) and emoji; a trailing possessive 's is left off, and
+# skin tones, joiners and variation selectors are dropped
+WORD_PATTERN = re.compile(
+    r"\$[a-z]{1,6}(?:\.[a-z])?\b"
+    r"|[a-z][a-z0-9]*(?:'(?!s\b)[a-z0-9]+|[&-][a-z0-9]+)*"
+    r"|[\U0001F1E6-\U0001F1FF]{2}|[\U0001F300-\U0001F3FA\U0001F400-\U0001FAFF\u2600-\u27BF]"
+)
+
+STOPWORDS = frozenset(string.ascii_lowercase) | frozenset("""
+about above after again against ain all am an and any are aren aren't as at be because been before being
+below between both but by can can't cannot could couldn couldn't did didn didn't do does doesn doesn't
+doing don don't down during each few for from further had hadn hadn't has hasn hasn't have haven haven't
+having he he'd he'll her here hers herself he's him himself his how i'd i'll i'm i've if in into is isn
+isn't it it'd it'll its it's itself just let let's ll me mightn more most mustn my myself needn no nor not
+now of off on once only or other our ours ourselves out over own re same shan she she'd she'll she's
+should shouldn shouldn't so some such than that that'll that's the their theirs them themselves then
+there there's these they they'd they'll they're they've this those through to too under until up ve very
+was wasn wasn't we we'd we'll we're we've were weren weren't what what's when where which while who whom
+why will with won won't would wouldn wouldn't you you'd you'll you're you've your yours yourself
+yourselves
+im ive dont doesnt didnt cant wont isnt arent wasnt thats theres youre theyre whats lets
+also get got like would could even much one really still ok yeah amp deleted removed
+""".split())
+
+def word_tokens(text: str) -> List[str]:
+    """Lower-cased words, cashtags and emoji of a text, without links and stopwords"""
+    text = URL_PATTERN.sub(" ", (text or "").lower().replace("’", "'"))
+    return [token for token in WORD_PATTERN.findall(text) if token not in STOPWORDS]
+
+def top_counts(counts: Mapping[str, int], limit: Optional[int] = None) -> List[Tuple[str, int]]:
+    """(key, count) pairs by count, ties by key, so the order does not depend on insertion order"""
+    if limit is None:
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return heapq.nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+
+class SpaceSaving:
+    """
+    Approximate counts of the most frequent items in fixed memory (Space-Saving)
+
+    At most capacity items are tracked, each with a count that may overstate
+    its true count by at most its error, never understate it. An item that
+    is not tracked occurred at most floor times. Summaries of separate
+    shards merge: an item missing from one side is taken to have occurred
+    that side's floor times, and the capacity largest counts are kept, so
+    the bounds still hold for the merged stream. While no more than capacity
+    distinct items have been seen, counts are exact and errors 0.
+    """
+    def __init__(self, capacity: int = DEFAULT_WORD_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.floor = 0
+        self.total = 0
+
+    def update(self, counts: Mapping[str, int]) -> "SpaceSaving":
+        """Add exact item counts, such as a Counter over one batch of documents; returns self"""
+        batch = SpaceSaving(self.capacity)
+        batch.total = sum(counts.values())
+        if len(counts) <= self.capacity:
+            batch.counts = dict(counts)
+        else:
+            kept = top_counts(counts, self.capacity + 1)
+            # Anything left out occurred at most as often as the first item left out
+            batch.floor = kept.pop()[1]
+            batch.counts = dict(kept)
+        batch.errors = dict.fromkeys(batch.counts, 0)
+        return self.merge(batch)
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Fold another summary into this one; returns self"""
+        counts, errors = {}, {}
+        for item in self.counts.keys() | other.counts.keys():
+            counts[item] = self.counts.get(item, self.floor) + other.counts.get(item, other.floor)
+            errors[item] = self.errors.get(item, self.floor) + other.errors.get(item, other.floor)
+        floor = self.floor + other.floor
+        if len(counts) > self.capacity:
+            kept = top_counts(counts, self.capacity + 1)
+            floor = max(floor, kept.pop()[1])
+            counts = dict(kept)
+        self.counts = counts
+        self.errors = {item: errors[item] for item in counts}
+        self.floor = floor
+        self.total += other.total
+        return self
+
+    def top(self, limit: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """(item, count, error) triples, most frequent first; the true count is between count - error and count"""
+        return [(item, count, self.errors[item]) for item, count in top_counts(self.counts, limit)]
+
+    def error_bound(self) -> int:
+        """No tracked count overstates by more, and no untracked item occurred more often"""
+        # Every error is a sum of floors that the current floor is at least
+        return self.floor
+
+def frequency_entries(summary: SpaceSaving, max_words: int) -> List[Dict[str, Any]]:
+    """Most frequent words of a summary, for word cloud generation; each overstates by at most error_bound()"""
+    return [
+        {"word": word, "frequency": count}
+        for word, count, _ in summary.top(max_words)
+    ]
@@ -0,0 +1,289 @@
+from database import StorageBackend
+from change_detector import ChangeDetector
+from ticker_rollup import TickerRollup
+from typing import Dict, List, Any, Optional, Callable, Tuple
+import atexit
+import logging
+import threading
+import time
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KINDS = ("posts", "comments")
+
+class WriteTicket:
+    """Tracks the records of one submit() call until they are all written"""
+    def __init__(self, on_written: Optional[Callable[[], None]]):
+        self.on_written = on_written
+        self.remaining = set()
+        self.failed = False
+        # Set once submit() has buffered every record, so a flush that lands
+        # while submit() is blocked on backpressure cannot resolve it early
+        self.submitted = False
+
+class WriteBehindWriter:
+    """
+    Accept posts and comments immediately and write them to the database in the background
+
+    Records wait in an in-memory buffer keyed by id, so a record submitted
+    again before it is written replaces the buffered copy instead of being
+    written twice. A flusher thread writes the buffer, posts before comments,
+    once it holds batch_size records or its oldest record is flush_interval
+    seconds old. When max_buffer records are waiting, submit() blocks until
+    the flusher makes room, up to its timeout, after which the records are
+    dropped and counted. Anything still buffered is flushed at process exit.
+
+    With a change detector only new or changed records are written, and with
+    a ticker rollup the written records are folded into the hourly rollup.
+    """
+    def __init__(self, database: StorageBackend, max_buffer: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 2.0, change_detector: Optional[ChangeDetector] = None,
+                 ticker_rollup: Optional[TickerRollup] = None):
+        self.database = database
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.change_detector = change_detector
+        self.ticker_rollup = ticker_rollup
+
+        self.condition = threading.Condition()
+        self.buffer: Dict[str, Dict[str, Tuple[Dict[str, Any], Optional[str]]]] = {kind: {} for kind in KINDS}
+        self.waiters: Dict[Tuple[str, str], List[WriteTicket]] = {}
+        self.depth = 0
+        self.oldest: Optional[float] = None
+        self.in_flight = 0
+        self.flush_requested = False
+        self.closed = False
+        self.flusher: Optional[threading.Thread] = None
+
+        self.stats = {
+            "accepted": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "rows_written": 0,
+            "rows_failed": 0,
+            "flushes": 0,
+            "last_flush_seconds": 0.0,
+            "max_flush_seconds": 0.0,
+            "total_flush_seconds": 0.0,
+            "backpressure_seconds": 0.0
+        }
+
+    def start(self) -> None:
+        """Start the background flusher; the buffer is flushed again at process exit"""
+        with self.condition:
+            if self.flusher is not None:
+                return
+            self.closed = False
+            self.flusher = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self.flusher.start()
+        atexit.register(self.close)
+
+    def submit(self, kind: str, records: List[Dict[str, Any]], subreddit: Optional[str] = None,
+               timeout: Optional[float] = None, on_written: Optional[Callable[[], None]] = None) -> int:
+        """
+        Buffer posts ("posts") or comments ("comments") for writing and return at once
+
+        Blocks only while the buffer is full, for at most timeout seconds (None
+        waits for room). on_written is called from the flusher once every record
+        of this call has been written, and never if any of them was dropped or
+        failed. Returns the number of records dropped.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown record kind: {kind}")
+
+        ticket = WriteTicket(on_written)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        dropped = 0
+
+        with self.condition:
+            for record in records:
+                record_id = record["id"]
+                waited = time.monotonic()
+                # Backpressure: a record that is not already buffered needs a free slot.
+                # The flusher swaps the buffer out while we wait, so look it up each time.
+                while record_id not in self.buffer[kind] and self.depth >= self.max_buffer and not self.closed:
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                self.stats["backpressure_seconds"] += time.monotonic() - waited
+
+                buffered = self.buffer[kind]
+                if record_id in buffered:
+                    self.stats["coalesced"] += 1
+                elif self.depth < self.max_buffer and not self.closed:
+                    self.depth += 1
+                    if self.oldest is None:
+                        self.oldest = time.monotonic()
+                else:
+                    dropped += 1
+                    ticket.failed = True
+                    continue
+
+                buffered[record_id] = (record, subreddit)
+                self.stats["accepted"] += 1
+                ticket.remaining.add((kind, record_id))
+                self.waiters.setdefault((kind, record_id), []).append(ticket)
+
+            self.stats["dropped"] += dropped
+            ticket.submitted = True
+            ready = not ticket.remaining
+            self.condition.notify_all()
+
+        if ready:
+            self._resolve(ticket)
+        return dropped
+
+    def _due(self) -> bool:
+        """Whether the buffer should be written now"""
+        if self.depth == 0:
+            return False
+        if self.closed or self.flush_requested or self.depth >= self.batch_size:
+            return True
+        return time.monotonic() - self.oldest >= self.flush_interval
+
+    def _take(self) -> Tuple[Dict[str, Dict[str, tuple]], Dict[Tuple[str, str], List[WriteTicket]]]:
+        """Move everything buffered, and the tickets waiting on it, out of the buffer"""
+        batch = self.buffer
+        self.buffer = {kind: {} for kind in KINDS}
+        # Tickets of records submitted from now on wait for the next flush
+        waiters = self.waiters
+        self.waiters = {}
+        self.depth = 0
+        self.oldest = None
+        self.flush_requested = False
+        self.in_flight += 1
+        # Producers blocked on a full buffer can go again
+        self.condition.notify_all()
+        return batch, waiters
+
+    def _run(self) -> None:
+        """Flusher loop: wait until the buffer is due, then write it"""
+        while True:
+            with self.condition:
+                while not self._due():
+                    if self.closed and self.depth == 0:
+                        return
+                    wait = None if self.oldest is None else max(0.0, self.oldest + self.flush_interval - time.monotonic())
+                    self.condition.wait(wait)
+                batch, waiters = self._take()
+
+            started = time.monotonic()
+            try:
+                failed = self._write(batch)
+            except Exception as e:
+                logger.error(f"Error flushing write-behind buffer: {str(e)}")
+                failed = {(kind, record_id) for kind in KINDS for record_id in batch[kind]}
+            elapsed = time.monotonic() - started
+
+            with self.condition:
+                self.in_flight -= 1
+                self.stats["flushes"] += 1
+                self.stats["last_flush_seconds"] = elapsed
+                self.stats["max_flush_seconds"] = max(self.stats["max_flush_seconds"], elapsed)
+                self.stats["total_flush_seconds"] += elapsed
+                ready = self._settle(waiters, failed)
+                self.condition.notify_all()
+
+            for ticket in ready:
+                self._resolve(ticket)
+
+    def _write(self, batch: Dict[str, Dict[str, tuple]]) -> set:
+        """Write a batch, posts before comments; returns the (kind, id) pairs that failed"""
+        failed = set()
+        for kind, store, update in (("posts", self.database.store_posts, self.database.update_posts),
+                                    ("comments", self.database.store_comments, self.database.update_comments)):
+            records = [record for record, _ in batch[kind].values()]
+            subreddits = {record["id"]: subreddit for record, subreddit in batch[kind].values() if subreddit}
+            rows, updates = records, []
+            if self.change_detector:
+                rows, updates = self.change_detector.filter(kind, rows)
+            if not rows and not updates:
+                continue
+
+            failed_ids = []
+            for result in store(rows, chunk_size=self.batch_size) + update(updates, chunk_size=self.batch_size):
+                if not result["success"]:
+                    failed_ids.extend(result["ids"])
+
+            written_ids = {record["id"] for record in rows + updates} - set(failed_ids)
+            if self.ticker_rollup and written_ids:
+                try:
+                    self.ticker_rollup.record(
+                        "post" if kind == "posts" else "comment",
+                        [record for record in records if record["id"] in written_ids],
+                        subreddits
+                    )
+                except Exception as e:
+                    # The rows are stored, but their mentions are not; let them be written again
+                    logger.error(f"Error updating ticker rollup for {kind}: {str(e)}")
+                    failed_ids.extend(written_ids)
+                    written_ids = set()
+
+            with self.condition:
+                self.stats["rows_written"] += len(written_ids)
+                self.stats["rows_failed"] += len(set(failed_ids))
+            if failed_ids and self.change_detector:
+                self.change_detector.forget(kind, failed_ids)
+            failed.update((kind, record_id) for record_id in failed_ids)
+        return failed
+
+    def _settle(self, waiters: Dict[Tuple[str, str], List[WriteTicket]], failed: set) -> List[WriteTicket]:
+        """Mark a written batch on the tickets waiting for it; returns the tickets now complete"""
+        ready = []
+        for key, tickets in waiters.items():
+            for ticket in tickets:
+                ticket.remaining.discard(key)
+                if key in failed:
+                    ticket.failed = True
+                if ticket.submitted and not ticket.remaining and ticket not in ready:
+                    ready.append(ticket)
+        return ready
+
+    def _resolve(self, ticket: WriteTicket) -> None:
+        """Run a ticket's callback if all of its records were written"""
+        if ticket.failed or not ticket.on_written:
+            return
+        try:
+            ticket.on_written()
+        except Exception as e:
+            logger.error(f"Error in write-behind callback: {str(e)}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything buffered now and wait for it; returns False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+            while self.depth or self.in_flight:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush what is buffered and stop the flusher; later submissions are dropped"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            flusher = self.flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join(timeout)
+        with self.condition:
+            self.flusher = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Buffer depth, flush latency and written, failed and dropped row counts"""
+        with self.condition:
+            flushes = self.stats["flushes"]
+            return {
+                **self.stats,
+                "buffer_depth": self.depth,
+                "max_buffer": self.max_buffer,
+                "in_flight": self.in_flight,
+                "avg_flush_seconds": self.stats["total_flush_seconds"] / flushes if flushes else 0.0
+            }